@@ -242,6 +242,61 @@ def multiple_bikers():
 def clear_cache():
     """Clear cache between tests"""
     from django.core.cache import cache
+    from deliveries.middleware import user_cache
     cache.clear()
+    user_cache.clear()
     yield
     cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_biker_index():
+    """Reset the in-memory biker index so it is rebuilt from each test's database"""
+    from deliveries.spatial import get_biker_index
+    get_biker_index().clear()
+    yield
+    get_biker_index().clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_live_locations():
+    """Reset the in-process live location store between tests"""
+    from deliveries.live_locations import get_live_location_store
+    get_live_location_store().clear()
+    yield
+    get_live_location_store().clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_presence():
+    """Reset the in-process presence store between tests"""
+    from deliveries.presence import get_presence_store
+    get_presence_store().clear()
+    yield
+    get_presence_store().clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_location_buffer():
+    """Drop location pings a previous test left in the process-wide write buffer"""
+    from deliveries.buffers import get_location_buffer
+    get_location_buffer().drain()
+    yield
+    get_location_buffer().drain()
+
+
+@pytest.fixture
+def query_budgets(settings):
+    """Fail requests that run more queries than their QUERY_BUDGETS entry (opt in per test)"""
+    settings.QUERY_BUDGET_ASSERT = True
+
+
+@pytest.fixture
+def metrics():
+    """The process-wide metrics registry, reset for the test"""
+    from force_backend.metrics import get_metrics_registry
+    registry = get_metrics_registry()
+    registry.clear()
+    yield registry
+    registry.clear()
@@ -4,11 +4,23 @@ from .models import (
     Delivery,
     DeliveryAssignment,
     DeliveryLog,
-    DeliveryLocation
+    DeliveryLocation,
+    DeliveryRoute
 )
 
-admin.site.register(Biker)
+
+# Change lists render each row with __str__, so load what it traverses up front
+@admin.register(Biker)
+class BikerAdmin(admin.ModelAdmin):
+    list_select_related = ("user",)
+
+
+@admin.register(DeliveryAssignment)
+class DeliveryAssignmentAdmin(admin.ModelAdmin):
+    list_select_related = ("biker__user",)
+
+
 admin.site.register(Delivery)
-admin.site.register(DeliveryAssignment)
 admin.site.register(DeliveryLog)
 admin.site.register(DeliveryLocation)
+admin.site.register(DeliveryRoute)
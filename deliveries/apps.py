@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DeliverisConfig(AppConfig):
     name = 'deliveries'
+
+    def ready(self):
+        # Register signal handlers (biker index, WebSocket user cache, stats cache)
+        from . import signals  # noqa: F401
@@ -0,0 +1,148 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DeliveryLocation
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------
+# LOCATION WRITE BUFFER
+# -------------------------
+class LocationWriteBuffer:
+    """
+    Per-process write-behind buffer for biker location pings.
+    - TrackingConsumer adds one DeliveryLocation per ping without touching the database.
+    - Pending rows are written with a single bulk_create when the buffer reaches
+      max_size, when the oldest row is older than flush_interval seconds, when
+      a biker disconnects, or when the worker process exits.
+    - The DB write rate therefore follows the flush interval, not the ping rate.
+    """
+
+    def __init__(self, max_size=None, flush_interval=None):
+        self._max_size = max_size
+        self._flush_interval = flush_interval
+        self._pending = []
+        self._oldest_at = None
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._flush_at_exit = False
+
+    @property
+    def max_size(self):
+        return self._max_size or settings.LOCATION_BUFFER_MAX_SIZE
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval or settings.LOCATION_BUFFER_FLUSH_SECONDS
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, delivery_id, biker_id, latitude, longitude):
+        """
+        Queue one location ping, stamped with the current time.
+        Returns True if the buffer is now due for a flush.
+        """
+        location = DeliveryLocation(
+            delivery_id=delivery_id,
+            biker_id=biker_id,
+            latitude=latitude,
+            longitude=longitude,
+            recorded_at=timezone.now()
+        )
+        with self._lock:
+            if not self._pending:
+                self._oldest_at = time.monotonic()
+            self._pending.append(location)
+
+        return self.should_flush()
+
+    def should_flush(self):
+        """True if the buffer is full or its oldest row has waited long enough."""
+        if not self._pending:
+            return False
+        if len(self._pending) >= self.max_size:
+            return True
+        return time.monotonic() - self._oldest_at >= self.flush_interval
+
+    def drain(self):
+        """Take every pending row out of the buffer."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._oldest_at = None
+        return pending
+
+    def flush(self):
+        """
+        Write every pending row with one bulk_create. Returns the number of rows written.
+        Runs in a sync context — async callers go through database_sync_to_async.
+        If the batch insert fails, the rows are retried one by one so a single bad
+        row only costs itself; rows that still fail are logged and dropped, so a
+        database outage cannot make the buffer grow without bound.
+        """
+        pending = self.drain()
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                DeliveryLocation.objects.bulk_create(pending)
+            return len(pending)
+        except Exception:
+            logger.warning("Bulk insert of %d location updates failed, retrying row by row", len(pending))
+
+        written = 0
+        for location in pending:
+            try:
+                with transaction.atomic():
+                    DeliveryLocation.objects.bulk_create([location])
+                written += 1
+            except Exception:
+                logger.exception(
+                    "Dropped location update for delivery %s (biker %s)",
+                    location.delivery_id, location.biker_id
+                )
+        return written
+
+    # =====================================
+    # PERIODIC FLUSH
+    # =====================================
+
+    def start_flusher(self):
+        """
+        Start the background task that flushes on the time threshold, so rows are
+        written even when no new ping arrives, and registers a final flush for
+        when the worker exits. Must be called from the event loop; does nothing if
+        the task is already running.
+        """
+        if not self._flush_at_exit:
+            atexit.register(self.flush)
+            self._flush_at_exit = True
+
+        if self._flusher is not None and not self._flusher.done():
+            return
+        self._flusher = asyncio.get_running_loop().create_task(self._run_flusher())
+
+    async def _run_flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.should_flush():
+                await database_sync_to_async(self.flush)()
+
+
+# Process-wide buffer shared by every TrackingConsumer
+location_buffer = LocationWriteBuffer()
+
+
+def get_location_buffer():
+    """Return the process-wide location write buffer."""
+    return location_buffer
@@ -1,8 +1,9 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
 
 from ..models import Biker
+from ..presence import amark_present, amark_absent
+from .metrics import ConsumerMetricsMixin, timed_database_sync_to_async
 
 
 # =====================================
@@ -10,13 +11,15 @@ from ..models import Biker
 # Used by: bikers to receive incoming delivery job notifications
 # URL: ws://biker/
 # =====================================
-class BikerConsumer(AsyncWebsocketConsumer):
+class BikerConsumer(ConsumerMetricsMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for bikers to receive delivery request notifications.
     - Biker connects once when they open the app and stays connected.
     - When a client creates a delivery, nearby bikers receive a delivery_request message here.
     - No delivery_id needed in the URL — the biker just listens on their personal channel.
+    - Connections, messages and DB hops are exported on /metrics.
     """
+    metrics_label = "biker"
 
     async def connect(self):
         """
@@ -25,6 +28,7 @@ class BikerConsumer(AsyncWebsocketConsumer):
         - Verifies the user has a biker profile.
         - Adds the biker to their personal group: biker_<id>
         - This group is what views.py sends delivery_request messages to.
+        - Marks the biker present, so proximity search considers them.
         """
         user = self.scope["user"]
 
@@ -51,6 +55,9 @@ class BikerConsumer(AsyncWebsocketConsumer):
         # Accept the connection
         await self.accept()
 
+        # The app is connected — the biker can be offered deliveries
+        await amark_present(self.biker.id, self.channel_name)
+
         # Confirm connection to the biker
         await self.send(json.dumps({
             "type": "connection_established",
@@ -61,13 +68,29 @@ class BikerConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         """
         Called when the biker disconnects.
-        Removes them from their personal group.
+        Removes them from their personal group and drops this connection from
+        their presence; another open connection (e.g. after a reconnect) keeps
+        them present.
         """
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(
                 self.group_name,
                 self.channel_name
             )
+            await amark_absent(self.biker.id, self.channel_name)
+
+    async def receive(self, text_data):
+        """
+        Called when the biker's app sends a message.
+        - 'heartbeat' renews the biker's presence; the app should send one well
+          within BIKER_PRESENCE_TTL_SECONDS (e.g. every 30 seconds).
+        """
+        data = json.loads(text_data)
+        self.record_message(data.get("type"))
+
+        if data.get("type") == "heartbeat":
+            await amark_present(self.biker.id, self.channel_name)
+            await self.send(json.dumps({"type": "heartbeat_ack"}))
 
     async def delivery_request(self, event):
         """
@@ -98,7 +121,7 @@ class BikerConsumer(AsyncWebsocketConsumer):
     # DATABASE HELPERS
     # =====================================
 
-    @database_sync_to_async
+    @timed_database_sync_to_async
     def get_biker(self, user):
         """Fetch the biker profile for this user. Returns None if not a biker."""
         try:
@@ -0,0 +1,99 @@
+"""
+WebSocket consumer metrics, exported on /metrics next to the HTTP metrics.
+- ConsumerMetricsMixin counts connections, rejections and disconnects by close
+  code, inbound messages by type (MESSAGE_TYPES, else "other") and group
+  events delivered to the consumer, and times group_send.
+- timed_database_sync_to_async replaces database_sync_to_async on consumer
+  helpers to time each DB hop, including the wait for the thread.
+"""
+import functools
+import time
+
+from channels.db import database_sync_to_async
+
+from force_backend.metrics import get_metrics_registry
+
+_registry = get_metrics_registry()
+CONNECTIONS = _registry.counter(
+    "ws_connections_total", "WebSocket handshakes by consumer, outcome and rejection close code")
+OPEN_CONNECTIONS = _registry.gauge(
+    "ws_connections_open", "WebSocket connections currently open in this process")
+DISCONNECTS = _registry.counter(
+    "ws_disconnects_total", "WebSocket disconnects by consumer and close code")
+MESSAGES_RECEIVED = _registry.counter(
+    "ws_messages_received_total", "Messages received from clients by consumer and message type")
+GROUP_EVENTS = _registry.counter(
+    "ws_group_events_total", "Channel-layer events delivered to a consumer, by event type (one per group member)")
+GROUP_SEND_DURATION = _registry.histogram(
+    "channel_layer_group_send_seconds", "Time spent in channel_layer.group_send by consumer and event type")
+DB_CALL_DURATION = _registry.histogram(
+    "ws_db_call_seconds", "Consumer DB helper latency, including the wait for a worker thread")
+
+# Client message types counted under their own label; anything else is "other",
+# so clients cannot grow the label set (or send unhashable values)
+MESSAGE_TYPES = frozenset({"location_update", "heartbeat"})
+
+
+class ConsumerMetricsMixin:
+    """
+    Mix into an AsyncWebsocketConsumer before the base class.
+    Subclasses set metrics_label, used as the "consumer" label of every metric.
+    """
+    metrics_label = None
+
+    async def accept(self, subprotocol=None):
+        await super().accept(subprotocol)
+        self._metrics_open = True
+        CONNECTIONS.inc(consumer=self.metrics_label, outcome="accepted", code="")
+        OPEN_CONNECTIONS.inc(consumer=self.metrics_label)
+
+    async def close(self, code=None):
+        if not getattr(self, "_metrics_open", False):
+            # Closing before accept() rejects the handshake
+            CONNECTIONS.inc(consumer=self.metrics_label, outcome="rejected", code=str(code or ""))
+        await super().close(code=code)
+
+    async def websocket_disconnect(self, message):
+        DISCONNECTS.inc(consumer=self.metrics_label, code=str(message.get("code", "")))
+        if getattr(self, "_metrics_open", False):
+            self._metrics_open = False
+            OPEN_CONNECTIONS.dec(consumer=self.metrics_label)
+        await super().websocket_disconnect(message)
+
+    async def dispatch(self, message):
+        if not message["type"].startswith("websocket."):
+            GROUP_EVENTS.inc(consumer=self.metrics_label, type=message["type"])
+        await super().dispatch(message)
+
+    def record_message(self, message_type):
+        """Count a message received from the client, by its "type" field if it is one of MESSAGE_TYPES."""
+        if not isinstance(message_type, str) or message_type not in MESSAGE_TYPES:
+            message_type = "other"
+        MESSAGES_RECEIVED.inc(consumer=self.metrics_label, type=message_type)
+
+    async def group_send(self, group_name, message):
+        """channel_layer.group_send, timed."""
+        started = time.perf_counter()
+        try:
+            await self.channel_layer.group_send(group_name, message)
+        finally:
+            GROUP_SEND_DURATION.observe(
+                time.perf_counter() - started, consumer=self.metrics_label, type=message["type"]
+            )
+
+
+def timed_database_sync_to_async(func):
+    """database_sync_to_async for consumer methods, recording ws_db_call_seconds per helper."""
+    call = database_sync_to_async(func)
+
+    @functools.wraps(func)
+    async def timed(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await call(self, *args, **kwargs)
+        finally:
+            DB_CALL_DURATION.observe(
+                time.perf_counter() - started, consumer=self.metrics_label, helper=func.__name__
+            )
+
+    return timed
@@ -1,15 +1,22 @@
+import asyncio
 import json
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
 
 from ..models import (
     Delivery,
     DeliveryAssignment,
-    Biker,
-    DeliveryLocation,
     DeliveryLog
 )
+from ..buffers import get_location_buffer
+from ..live_locations import get_live_location_store, record_biker_location
+from ..location import validate_coordinates
+from ..stats import invalidate_delivery_stats
+from ..throttling import LocationBroadcastThrottle
+from .metrics import ConsumerMetricsMixin, DB_CALL_DURATION, timed_database_sync_to_async
 
 
 # =====================================
@@ -17,20 +24,24 @@ from ..models import (
 # Used by: clients and admins to watch a delivery in real time
 # URL: ws://tracking/<delivery_id>/
 # =====================================
-class TrackingConsumer(AsyncWebsocketConsumer):
+class TrackingConsumer(ConsumerMetricsMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer that handles real-time delivery tracking.
     - Clients can watch the delivery location in real time.
     - Bikers send location updates which are broadcast to the group.
     - Admins can observe any delivery.
+    - Connections, messages, group sends and DB hops are exported on /metrics.
     """
+    metrics_label = "tracking"
 
     async def connect(self):
         """
         Called when a WebSocket connection is initiated.
         - Rejects anonymous users.
-        - Loads the delivery from the URL parameter.
-        - Determines the user's role (admin, biker, or client).
+        - Loads the delivery from the URL parameter, with its assignment and biker
+          joined in — the only query of the handshake.
+        - Takes the user's role (admin, biker, or client) and biker id from the
+          scope, where JWTAuthMiddleware resolved them.
         - For bikers, verifies they are the assigned biker and have accepted the delivery.
         - Adds the biker to their personal channel group so they can receive delivery requests.
         - Adds the connection to the delivery group and confirms the connection.
@@ -46,30 +57,45 @@ class TrackingConsumer(AsyncWebsocketConsumer):
         self.delivery_id = self.scope["url_route"]["kwargs"]["delivery_id"]
         self.group_name = f"delivery_{self.delivery_id}"
 
-        # Load the delivery from the database
+        # Load the delivery, its assignment and the assigned biker in one query
         self.delivery = await self.get_delivery(self.delivery_id)
         if not self.delivery:
             await self.close(code=4004)  # Delivery not found
             return
 
-        # Determine what role this user has (admin, biker, or client)
-        self.role = await self.get_user_role(user)
+        # Role (admin, biker, or client) as resolved by JWTAuthMiddleware
+        self.role = self.scope["role"]
 
         if self.role == "biker":
             # Bikers must have an accepted assignment to connect
-            assignment = await self.get_assignment(self.delivery_id)
+            assignment = self.get_assignment(self.delivery)
 
             if not assignment or not assignment.accepted:
                 await self.close(code=4003)  # No valid assignment
                 return
 
             # Ensure the biker connecting is the one actually assigned
-            if assignment.biker.user.id != user.id:
+            if assignment.biker_id != self.scope["biker_id"]:
                 await self.close(code=4003)  # Wrong biker
                 return
 
             self.biker = assignment.biker
 
+            # Tracked locally so only the first location update hops to the DB to start the delivery
+            self.delivery_started = self.delivery.status != "ASSIGNED"
+
+            # Limits how often this biker's position is re-broadcast to the delivery group
+            self.location_throttle = LocationBroadcastThrottle(
+                min_interval=settings.LOCATION_BROADCAST_MIN_INTERVAL,
+                min_distance_m=settings.LOCATION_BROADCAST_MIN_DISTANCE_M
+            )
+            self.trailing_broadcast = None
+
+            # Make sure buffered location pings are flushed on the time threshold,
+            # and live positions are written back to Biker rows periodically
+            get_location_buffer().start_flusher()
+            get_live_location_store().start_write_back()
+
             # Also add biker to their personal group so they receive delivery request notifications
             await self.channel_layer.group_add(
                 f"biker_{self.biker.id}",
@@ -95,7 +121,8 @@ class TrackingConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         """
         Called when the WebSocket connection is closed.
-        Removes this connection from the delivery group to stop receiving broadcasts.
+        - Removes this connection from the delivery group to stop receiving broadcasts.
+        - For bikers, flushes buffered location pings so the trail is complete.
         """
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(
@@ -103,35 +130,81 @@ class TrackingConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
 
+        if hasattr(self, "biker"):
+            # Stop any pending trailing broadcast and write out buffered pings
+            if self.trailing_broadcast is not None:
+                self.trailing_broadcast.cancel()
+            await self.flush_locations()
+
     async def receive(self, text_data):
         """
         Called when the client sends a message over the WebSocket.
         - Only bikers can send location updates.
-        - Saves the location to the database.
+        - Coordinates that are missing, not numbers or out of range are answered
+          with an error frame and go no further.
+        - Updates the biker's live position (written back to the Biker row in batches).
+        - Queues the location in the write-behind buffer (flushed in bulk).
         - Auto-starts the delivery if it is still in ASSIGNED status.
-        - Broadcasts the new location to everyone in the delivery group.
+        - Broadcasts the new location to everyone in the delivery group, throttled
+          by time and distance (the latest position is always sent on the trailing edge).
         """
         data = json.loads(text_data)
+        self.record_message(data.get("type"))
 
         if self.role == "biker" and data.get("type") == "location_update":
-            latitude = data.get("latitude")
-            longitude = data.get("longitude")
+            try:
+                latitude, longitude = validate_coordinates(data.get("latitude"), data.get("longitude"))
+            except ValueError as error:
+                await self.send(json.dumps({"type": "error", "message": str(error)}))
+                return
+
+            # Update the live position used for matching — no database write
+            await self.record_live_location(latitude, longitude)
 
-            # Persist the location update to the database
-            await self.save_location(latitude, longitude)
+            # Queue the location update; write the batch if the buffer is due
+            if get_location_buffer().add(self.delivery.id, self.biker.id, latitude, longitude):
+                await self.flush_locations()
 
             # If delivery hasn't started yet, automatically move it to IN_TRANSIT
-            await self.auto_start_delivery()
+            if not self.delivery_started:
+                await self.auto_start_delivery()
 
             # Broadcast the new location to all group members (client, admin, etc.)
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "broadcast_location",
-                    "latitude": latitude,
-                    "longitude": longitude,
-                }
-            )
+            await self.publish_location(latitude, longitude)
+
+    async def publish_location(self, latitude, longitude):
+        """
+        Broadcasts the biker's position to the delivery group, subject to the throttle.
+        - Sent immediately if the throttle allows it.
+        - Held back if it arrives too soon; a trailing broadcast is scheduled for
+          the end of the interval so the latest position still reaches watchers.
+        """
+        if self.location_throttle.offer(latitude, longitude):
+            await self.send_location_to_group(latitude, longitude)
+            return
+
+        if self.location_throttle.pending and self.trailing_broadcast is None:
+            self.trailing_broadcast = asyncio.ensure_future(self.send_trailing_location())
+
+    async def send_trailing_location(self):
+        """Waits out the throttle interval, then broadcasts the latest held-back position."""
+        try:
+            await asyncio.sleep(self.location_throttle.seconds_until_next())
+            position = self.location_throttle.take_pending()
+            if position:
+                await self.send_location_to_group(*position)
+        finally:
+            self.trailing_broadcast = None
+
+    async def send_location_to_group(self, latitude, longitude):
+        await self.group_send(
+            self.group_name,
+            {
+                "type": "broadcast_location",
+                "latitude": latitude,
+                "longitude": longitude,
+            }
+        )
 
     async def broadcast_location(self, event):
         """
@@ -179,73 +252,74 @@ class TrackingConsumer(AsyncWebsocketConsumer):
             "dropoff_address": event["dropoff_address"],
         }))
 
+    @staticmethod
+    def get_assignment(delivery):
+        """The delivery's assignment, from the joined row (no query). Returns None if unassigned."""
+        try:
+            return delivery.assignment
+        except DeliveryAssignment.DoesNotExist:
+            return None
+
     # =====================================
     # DATABASE HELPERS (sync -> async)
     # =====================================
 
-    @database_sync_to_async
+    @timed_database_sync_to_async
     def get_delivery(self, delivery_id):
-        """Fetch a delivery by ID. Returns None if not found."""
-        try:
-            return Delivery.objects.get(id=delivery_id)
-        except Delivery.DoesNotExist:
-            return None
-
-    @database_sync_to_async
-    def get_assignment(self, delivery_id):
         """
-        Fetch the assignment for a delivery, including the related biker and user.
-        Returns None if no assignment exists.
+        Fetch a delivery by ID with its assignment and assigned biker joined in.
+        Returns None if not found.
         """
         try:
-            return DeliveryAssignment.objects.select_related(
-                "biker__user"
-            ).get(delivery_id=delivery_id)
-        except DeliveryAssignment.DoesNotExist:
+            return Delivery.objects.select_related("assignment__biker").get(id=delivery_id)
+        except (Delivery.DoesNotExist, ValueError):
             return None
 
-    @database_sync_to_async
-    def get_user_role(self, user):
-        """
-        Determine the role of the connecting user:
-        - 'admin' if they are staff
-        - 'biker' if they have a linked Biker profile
-        - 'client' otherwise
-        """
-        if user.is_staff:
-            return "admin"
-
-        if Biker.objects.filter(user=user).exists():
-            return "biker"
-
-        return "client"
-
-    @database_sync_to_async
-    def save_location(self, latitude, longitude):
-        """Save a biker's location update to the DeliveryLocation table."""
-        DeliveryLocation.objects.create(
-            delivery=self.delivery,
-            biker=self.biker,
-            latitude=latitude,
-            longitude=longitude,
-            recorded_at=timezone.now()
+    async def record_live_location(self, latitude, longitude):
+        """Store the biker's latest position; off the event loop, as the store may be Redis."""
+        started = time.perf_counter()
+        await sync_to_async(record_biker_location, thread_sensitive=False)(
+            self.biker.id, latitude, longitude
+        )
+        DB_CALL_DURATION.observe(
+            time.perf_counter() - started, consumer=self.metrics_label, helper="record_live_location"
         )
 
-    @database_sync_to_async
+    @timed_database_sync_to_async
+    def flush_locations(self):
+        """Write buffered location updates to the DeliveryLocation table in one bulk insert."""
+        get_location_buffer().flush()
+
+    @timed_database_sync_to_async
     def auto_start_delivery(self):
         """
         Automatically transitions a delivery from ASSIGNED to IN_TRANSIT
         when the biker sends their first location update.
-        Also updates the biker's status to ON_DELIVERY and logs the event.
+        - Uses a conditional UPDATE so only one consumer performs the transition,
+          even if the biker is connected more than once.
+        - The winner also updates the biker's status to ON_DELIVERY and logs the event.
+        - Afterwards the delivery is marked as started locally, so later location
+          updates skip this DB hop entirely.
         """
-        if self.delivery.status == "ASSIGNED":
-            self.delivery.status = "IN_TRANSIT"
-            self.delivery.save()
+        with transaction.atomic():
+            started = Delivery.objects.filter(
+                id=self.delivery.id,
+                status="ASSIGNED"
+            ).update(status="IN_TRANSIT")
+
+            if started:
+                self.delivery.status = "IN_TRANSIT"
+
+                # The conditional UPDATE skips signals, so drop cached stats explicitly
+                invalidate_delivery_stats()
+
+                self.biker.status = "ON_DELIVERY"
+                self.biker.save(update_fields=["status"])
 
-            self.biker.status = "ON_DELIVERY"
-            self.biker.save()
+                DeliveryLog.objects.create(
+                    delivery=self.delivery,
+                    message="Delivery started (IN_TRANSIT)"
+                )
 
-            DeliveryLog.objects.create(
-                delivery=self.delivery,
-                message="Delivery started (IN_TRANSIT)"
-            )
\ No newline at end of file
+        # Either we started it or someone else already moved it past ASSIGNED
+        self.delivery_started = True
@@ -0,0 +1,130 @@
+"""
+Great-circle distance helpers shared by the whole deliveries app.
+- haversine() is the scalar formula used for single pairs of points.
+- haversine_many() and haversine_matrix() are NumPy-backed batch versions used
+  when ranking many bikers at once, so the math runs in C instead of a Python loop.
+- bounding_box() and in_bounding_box() give a cheap rectangular prefilter.
+- haversine_expression() is the same formula as a database expression, for
+  distance filters that must stay inside a queryset.
+"""
+import math
+
+import numpy as np
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371
+
+# Approximate length of one degree of latitude in kilometers
+KM_PER_DEGREE = 111.32
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Returns distance in kilometers between two points using the Haversine formula.
+    """
+    lat1 = math.radians(lat1)
+    lon1 = math.radians(lon1)
+    lat2 = math.radians(lat2)
+    lon2 = math.radians(lon2)
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = math.sin(dlat / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * \
+        math.sin(dlon / 2) ** 2
+
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_many(lat, lon, lats, lons):
+    """
+    Returns a NumPy array of distances in kilometers from one origin to N points.
+    lats and lons can be any sequence of equal length.
+    """
+    lat = math.radians(lat)
+    lon = math.radians(lon)
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+
+    a = np.sin((lats - lat) / 2) ** 2 + \
+        math.cos(lat) * np.cos(lats) * \
+        np.sin((lons - lon) / 2) ** 2
+
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2):
+    """
+    Returns an N×M NumPy array of distances in kilometers, where row i holds the
+    distances from point i of the first set to every point of the second set.
+    """
+    lats1 = np.radians(np.asarray(lats1, dtype=float))[:, np.newaxis]
+    lons1 = np.radians(np.asarray(lons1, dtype=float))[:, np.newaxis]
+    lats2 = np.radians(np.asarray(lats2, dtype=float))[np.newaxis, :]
+    lons2 = np.radians(np.asarray(lons2, dtype=float))[np.newaxis, :]
+
+    a = np.sin((lats2 - lats1) / 2) ** 2 + \
+        np.cos(lats1) * np.cos(lats2) * \
+        np.sin((lons2 - lons1) / 2) ** 2
+
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Returns (min_lat, max_lat, min_lon, max_lon) enclosing a circle of radius_km.
+    - Latitudes are clamped to [-90, 90].
+    - If the box touches a pole or crosses the antimeridian, the longitude
+      range is widened to the full [-180, 180] so the box is always a superset.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+
+    cos_lat = math.cos(math.radians(latitude))
+    if min_lat <= -90.0 or max_lat >= 90.0 or cos_lat <= 0:
+        return min_lat, max_lat, -180.0, 180.0
+
+    lon_delta = radius_km / (KM_PER_DEGREE * cos_lat)
+    min_lon = longitude - lon_delta
+    max_lon = longitude + lon_delta
+    if min_lon < -180.0 or max_lon > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def in_bounding_box(box, lats, lons):
+    """
+    Returns a boolean NumPy mask of the points that fall inside box,
+    where box is the tuple returned by bounding_box().
+    """
+    min_lat, max_lat, min_lon, max_lon = box
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+
+    return (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+
+
+def haversine_expression(lat_field, lon_field, latitude, longitude):
+    """
+    Returns a database expression for the distance in kilometers from
+    (latitude, longitude) to the point stored in lat_field/lon_field.
+    Evaluates in SQL on every supported backend (Django provides the math
+    functions on SQLite), so it can be used in filter() and annotate().
+    """
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    lats = Radians(F(lat_field))
+    lons = Radians(F(lon_field))
+
+    a = Power(Sin((lats - Value(lat)) / 2), 2) + \
+        Value(math.cos(lat)) * Cos(lats) * \
+        Power(Sin((lons - Value(lon)) / 2), 2)
+
+    # Rounding can push a just past 1 for near-antipodal points, outside ASIN's domain
+    return Value(EARTH_RADIUS_KM * 2) * ASin(Sqrt(Least(a, Value(1.0))), output_field=FloatField())
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import threading
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .models import Biker
+from .spatial import get_biker_index
+
+logger = logging.getLogger(__name__)
+
+# Redis keys: a GEO set of live positions, and a hash of positions not yet written to Biker rows
+REDIS_POSITIONS_KEY = "bikers:live:positions"
+REDIS_PENDING_KEY = "bikers:live:pending"
+
+# Rows per UPDATE when writing positions back to the Biker table
+WRITE_BACK_BATCH_SIZE = 500
+
+
+# -------------------------
+# LIVE LOCATION STORES
+# -------------------------
+class BaseLiveLocationStore:
+    """
+    Hot store of each biker's latest position, updated on every location ping.
+    - Reads and writes never touch the database; Biker.current_latitude/longitude
+      are refreshed from the store in batches by write_back().
+    - Subclasses implement update(), get_many(), drain_pending(), restore_pending()
+      and clear().
+    """
+
+    def __init__(self):
+        self._writer = None
+
+    def update(self, biker_id, latitude, longitude):
+        raise NotImplementedError
+
+    def get_many(self, biker_ids):
+        """Returns {biker_id: (latitude, longitude)} for the bikers with a live position."""
+        raise NotImplementedError
+
+    def drain_pending(self):
+        """Take every position changed since the last drain, as {biker_id: (latitude, longitude)}."""
+        raise NotImplementedError
+
+    def restore_pending(self, pending):
+        """
+        Put drained positions back for the next write-back, after a failed write.
+        A biker that pinged again since the drain keeps the newer position.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def write_back(self):
+        """
+        Copy changed positions to their Biker rows with batched bulk_update.
+        Runs in a sync context. Returns the number of bikers written.
+        bulk_update skips signals, so the biker index is not churned by write-backs.
+        If the write fails, the positions go back into the pending set and are
+        retried on the next write-back.
+        """
+        pending = self.drain_pending()
+        if not pending:
+            return 0
+
+        bikers = [
+            Biker(id=biker_id, current_latitude=latitude, current_longitude=longitude)
+            for biker_id, (latitude, longitude) in pending.items()
+        ]
+        try:
+            Biker.objects.bulk_update(
+                bikers,
+                ["current_latitude", "current_longitude"],
+                batch_size=WRITE_BACK_BATCH_SIZE
+            )
+        except Exception:
+            logger.exception("Failed to write back %d live biker positions; will retry", len(bikers))
+            self.restore_pending(pending)
+            return 0
+
+        return len(bikers)
+
+    # =====================================
+    # PERIODIC WRITE-BACK
+    # =====================================
+
+    def start_write_back(self):
+        """
+        Start the background task that writes positions back every
+        LIVE_LOCATION_WRITE_BACK_SECONDS. Must be called from the event loop;
+        does nothing if the task is already running.
+        """
+        if self._writer is not None and not self._writer.done():
+            return
+        self._writer = asyncio.get_running_loop().create_task(self._run_write_back())
+
+    async def _run_write_back(self):
+        while True:
+            await asyncio.sleep(settings.LIVE_LOCATION_WRITE_BACK_SECONDS)
+            try:
+                await database_sync_to_async(self.write_back)()
+            except Exception:
+                # e.g. Redis unreachable while draining; keep the task alive for the next round
+                logger.exception("Live location write-back failed")
+
+
+class MemoryLiveLocationStore(BaseLiveLocationStore):
+    """Per-process live store. Used in tests and single-process deployments."""
+
+    def __init__(self):
+        super().__init__()
+        self._positions = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def update(self, biker_id, latitude, longitude):
+        with self._lock:
+            self._positions[biker_id] = (latitude, longitude)
+            self._pending[biker_id] = (latitude, longitude)
+
+    def get_many(self, biker_ids):
+        with self._lock:
+            return {
+                biker_id: self._positions[biker_id]
+                for biker_id in biker_ids
+                if biker_id in self._positions
+            }
+
+    def drain_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def restore_pending(self, pending):
+        with self._lock:
+            self._pending = {**pending, **self._pending}
+
+    def clear(self):
+        with self._lock:
+            self._positions = {}
+            self._pending = {}
+
+
+class RedisLiveLocationStore(BaseLiveLocationStore):
+    """
+    Live store shared by every process, kept in a Redis GEO set.
+    Pending write-backs live in a Redis hash, so whichever process drains it
+    writes every biker's latest position exactly once.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def update(self, biker_id, latitude, longitude):
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.geoadd(REDIS_POSITIONS_KEY, (longitude, latitude, biker_id))
+        pipe.hset(REDIS_PENDING_KEY, biker_id, f"{latitude},{longitude}")
+        pipe.execute()
+
+    def get_many(self, biker_ids):
+        biker_ids = list(biker_ids)
+        if not biker_ids:
+            return {}
+        positions = self._redis.geopos(REDIS_POSITIONS_KEY, *biker_ids)
+        return {
+            biker_id: (position[1], position[0])
+            for biker_id, position in zip(biker_ids, positions)
+            if position is not None
+        }
+
+    def drain_pending(self):
+        # Read and delete atomically so pings arriving meanwhile wait for the next drain
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hgetall(REDIS_PENDING_KEY)
+        pipe.delete(REDIS_PENDING_KEY)
+        pending, _ = pipe.execute()
+
+        drained = {}
+        for biker_id, value in pending.items():
+            latitude, longitude = value.decode().split(",")
+            drained[int(biker_id)] = (float(latitude), float(longitude))
+        return drained
+
+    def restore_pending(self, pending):
+        # HSETNX leaves positions from pings that arrived since the drain in place
+        pipe = self._redis.pipeline(transaction=False)
+        for biker_id, (latitude, longitude) in pending.items():
+            pipe.hsetnx(REDIS_PENDING_KEY, biker_id, f"{latitude},{longitude}")
+        pipe.execute()
+
+    def clear(self):
+        self._redis.delete(REDIS_POSITIONS_KEY, REDIS_PENDING_KEY)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_live_location_store():
+    """
+    Return the process-wide live location store for LIVE_LOCATION_BACKEND:
+    'memory' (default) or 'redis' (shared between processes, uses REDIS_URL).
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.LIVE_LOCATION_BACKEND == "redis":
+                    _store = RedisLiveLocationStore(settings.REDIS_URL)
+                elif settings.LIVE_LOCATION_BACKEND == "memory":
+                    _store = MemoryLiveLocationStore()
+                else:
+                    raise ValueError(
+                        f"Unsupported live location backend: {settings.LIVE_LOCATION_BACKEND}"
+                    )
+    return _store
+
+
+def record_biker_location(biker_id, latitude, longitude):
+    """
+    Record a biker's position from a location ping.
+    - Updates the live store (no database write).
+    - Moves the biker in this process's grid index if it is indexed (AVAILABLE).
+    """
+    get_live_location_store().update(biker_id, latitude, longitude)
+
+    index = get_biker_index()
+    if biker_id in index:
+        index.update(biker_id, latitude, longitude)
+
@@ -0,0 +1,284 @@
+"""
+WebSocket load generator for the tracking and biker channels.
+- Drives the real ASGI application in-process (JWT middleware, routing, consumers)
+  through channels' WebsocketCommunicator, so no server or sockets are needed.
+- Simulates N bikers, each assigned one delivery, pinging their location while
+  M watchers per delivery receive the broadcasts, plus a heartbeat per biker
+  on the biker channel.
+- Reports messages/sec, end-to-end broadcast latency percentiles, DB writes/sec
+  and process memory. Used by the ws_load_test management command.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .buffers import get_location_buffer
+from .live_locations import get_live_location_store
+from .models import Biker, Delivery, DeliveryAssignment, DeliveryLocation
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+User = get_user_model()
+
+# Latitude step used to make every ping of a run unique, so a received broadcast
+# can be matched to the moment it was sent
+PING_LATITUDE_STEP = 1e-6
+
+# Channel layer used for the run: in-process, with room for every queued broadcast
+LOAD_TEST_CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "CONFIG": {"capacity": 10000},
+    },
+}
+
+# Extra time watchers wait for trailing broadcasts once every biker has finished
+DRAIN_SECONDS = 2.0
+
+
+@dataclass
+class LoadTestResult:
+    bikers: int
+    watchers_per_delivery: int
+    pings_sent: int = 0
+    broadcasts_received: int = 0
+    heartbeats_acked: int = 0
+    duration: float = 0.0
+    latencies_ms: list = field(default_factory=list)
+    db_writes: int = 0
+    rows_written: int = 0
+    peak_rss_mb: float = None
+
+    @property
+    def messages_per_second(self):
+        if not self.duration:
+            return 0.0
+        return (self.pings_sent + self.broadcasts_received) / self.duration
+
+    @property
+    def db_writes_per_second(self):
+        return self.db_writes / self.duration if self.duration else 0.0
+
+    def latency_percentile(self, percentile):
+        if not self.latencies_ms:
+            return None
+        return round(float(np.percentile(self.latencies_ms, percentile)), 2)
+
+    def as_dict(self):
+        return {
+            "bikers": self.bikers,
+            "watchers_per_delivery": self.watchers_per_delivery,
+            "duration_s": round(self.duration, 3),
+            "pings_sent": self.pings_sent,
+            "broadcasts_received": self.broadcasts_received,
+            "heartbeats_acked": self.heartbeats_acked,
+            "messages_per_s": round(self.messages_per_second, 1),
+            "latency_p50_ms": self.latency_percentile(50),
+            "latency_p99_ms": self.latency_percentile(99),
+            "db_writes": self.db_writes,
+            "db_writes_per_s": round(self.db_writes_per_second, 1),
+            "location_rows_written": self.rows_written,
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+
+
+# =====================================
+# FIXTURES
+# =====================================
+def create_load_test_data(bikers, prefix="loadtest"):
+    """
+    Create one client and `bikers` bikers, each with an accepted ASSIGNED delivery.
+    Returns (client_token, [(biker_token, delivery_id), ...]).
+    """
+    client = User.objects.create_user(email=f"{prefix}-client@example.com", password=None, role="CLIENT")
+    client_token = str(RefreshToken.for_user(client).access_token)
+
+    pairs = []
+    for i in range(bikers):
+        user = User.objects.create_user(email=f"{prefix}-biker{i}@example.com", password=None, role="BIKER")
+        biker = Biker.objects.create(user=user, status="ON_DELIVERY")
+        delivery = Delivery.objects.create(
+            client=client,
+            pickup_address=f"Pickup {i}",
+            dropoff_address=f"Dropoff {i}",
+            package_description="Load test",
+            status="ASSIGNED",
+        )
+        DeliveryAssignment.objects.create(delivery=delivery, biker=biker, accepted=True)
+        pairs.append((str(RefreshToken.for_user(user).access_token), delivery.id))
+
+    return client_token, pairs
+
+
+# =====================================
+# SIMULATION
+# =====================================
+class WebSocketLoadTest:
+    """
+    One load test run against an ASGI application.
+    pings per biker are sent every `interval` seconds.
+    """
+
+    def __init__(self, application, bikers, watchers, pings, interval, timeout=10.0):
+        self.application = application
+        self.bikers = bikers
+        self.watchers = watchers
+        self.pings = pings
+        self.interval = interval
+        self.timeout = timeout
+        self._sent_at = {}          # (delivery_id, latitude) -> perf_counter at send
+        self._last_latitude = {}    # delivery_id -> latitude of that biker's final ping
+        self._last_received = 0.0   # perf_counter of the latest broadcast received
+
+    def run(self, client_token, pairs):
+        """Run the simulation synchronously. Returns a LoadTestResult."""
+        result = LoadTestResult(bikers=self.bikers, watchers_per_delivery=self.watchers)
+        rows_before = DeliveryLocation.objects.count()
+
+        writes = [0]
+
+        def count_writes(execute, sql, params, many, context):
+            if not sql.lstrip().upper().startswith("SELECT"):
+                writes[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_writes):
+            async_to_sync(self._simulate)(client_token, pairs, result)
+
+        result.db_writes = writes[0]
+        result.rows_written = DeliveryLocation.objects.count() - rows_before
+        result.peak_rss_mb = _peak_rss_mb()
+        return result
+
+    async def _simulate(self, client_token, pairs, result):
+        watchers = []
+        bikers = []
+        try:
+            for biker_token, delivery_id in pairs:
+                for _ in range(self.watchers):
+                    watchers.append((delivery_id, await self._connect(f"/ws/tracking/{delivery_id}/", client_token)))
+                tracking = await self._connect(f"/ws/tracking/{delivery_id}/", biker_token)
+                channel = await self._connect("/ws/biker/", biker_token)
+                bikers.append((delivery_id, tracking, channel))
+                self._last_latitude[delivery_id] = _ping_latitude(len(bikers) - 1, self.pings - 1)
+
+            started = time.perf_counter()
+            listeners = [
+                asyncio.ensure_future(self._listen(delivery_id, communicator, result))
+                for delivery_id, communicator in watchers
+            ]
+            await asyncio.gather(*[
+                self._drive_biker(index, delivery_id, tracking, channel, result)
+                for index, (delivery_id, tracking, channel) in enumerate(bikers)
+            ])
+            finished = time.perf_counter()
+            # Throttled runs may never deliver the final ping, so listeners can end on a timeout;
+            # the run lasts until the bikers finished or the last broadcast arrived
+            await asyncio.gather(*listeners)
+            result.duration = max(finished, self._last_received) - started
+        finally:
+            communicators = [communicator for _, communicator in watchers]
+            for _, tracking, channel in bikers:
+                communicators += [tracking, channel]
+            for communicator in communicators:
+                # A receive timeout already shut that connection's consumer down
+                if not communicator.future.done():
+                    await communicator.disconnect()
+            # Stop the per-process background writers started by the consumers
+            _cancel(get_location_buffer()._flusher)
+            _cancel(get_live_location_store()._writer)
+
+    async def _connect(self, path, token):
+        communicator = WebsocketCommunicator(self.application, f"{path}?token={token}")
+        connected, code = await communicator.connect(timeout=self.timeout)
+        if not connected:
+            raise RuntimeError(f"WebSocket connection to {path} rejected with code {code}")
+        await communicator.receive_json_from(timeout=self.timeout)   # connection_established
+        return communicator
+
+    async def _drive_biker(self, index, delivery_id, tracking, channel, result):
+        for seq in range(self.pings):
+            latitude = _ping_latitude(index, seq)
+            self._sent_at[(delivery_id, latitude)] = time.perf_counter()
+            await tracking.send_json_to({
+                "type": "location_update",
+                "latitude": latitude,
+                "longitude": 28.0,
+            })
+            result.pings_sent += 1
+            await asyncio.sleep(self.interval)
+
+        await channel.send_json_to({"type": "heartbeat"})
+        message = await channel.receive_json_from(timeout=self.timeout)
+        if message.get("type") == "heartbeat_ack":
+            result.heartbeats_acked += 1
+
+    async def _listen(self, delivery_id, communicator, result):
+        """Collect broadcasts until the last ping arrives or nothing comes for DRAIN_SECONDS."""
+        while True:
+            try:
+                message = json.loads(await communicator.receive_from(timeout=self.interval * self.pings + DRAIN_SECONDS))
+            except asyncio.TimeoutError:
+                return
+            if message.get("type") != "location_update":
+                continue
+
+            received_at = self._last_received = time.perf_counter()
+            sent_at = self._sent_at.get((delivery_id, message["latitude"]))
+            if sent_at is not None:
+                result.latencies_ms.append((received_at - sent_at) * 1000)
+            result.broadcasts_received += 1
+            if message["latitude"] == self._last_latitude[delivery_id]:
+                return
+
+
+def run_load_test(bikers, watchers, pings, interval, keep_throttle=False, application=None):
+    """
+    Seed the data for a run and execute it against the in-memory channel layer.
+    - The broadcast throttle is disabled unless keep_throttle is set, so every
+      ping is fanned out and the numbers measure the full pipeline.
+    - Writes to the current database; the ws_load_test command runs this against
+      a throwaway test database.
+    Returns a LoadTestResult.
+    """
+    overrides = {"CHANNEL_LAYERS": LOAD_TEST_CHANNEL_LAYERS}
+    if not keep_throttle:
+        overrides.update(LOCATION_BROADCAST_MIN_INTERVAL=0, LOCATION_BROADCAST_MIN_DISTANCE_M=0)
+
+    if application is None:
+        from force_backend.asgi import application
+
+    with override_settings(**overrides):
+        client_token, pairs = create_load_test_data(bikers)
+        load_test = WebSocketLoadTest(application, bikers, watchers, pings, interval)
+        return load_test.run(client_token, pairs)
+
+
+def _ping_latitude(biker_index, seq):
+    """Unique latitude of a biker's seq-th ping; bikers are spread 0.01° (~1 km) apart."""
+    return round(-26.2 + biker_index * 0.01 + seq * PING_LATITUDE_STEP, 7)
+
+
+def _cancel(task):
+    if task is not None and not task.done():
+        task.cancel()
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where unsupported."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
@@ -1,24 +1,15 @@
-from math import radians, sin, cos, sqrt, atan2
+import math
 from typing import Tuple
 
+from .distance import haversine
+
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate distance between two coordinates using Haversine formula.
     Returns distance in kilometers.
     """
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad, lon1_rad = radians(lat1), radians(lon1)
-    lat2_rad, lon2_rad = radians(lat2), radians(lon2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    a = sin(dlat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    
-    return R * c
+    return haversine(lat1, lon1, lat2, lon2)
 
 
 def estimate_eta(distance_km: float, avg_speed_kmh: float = 30) -> int:
@@ -43,3 +34,21 @@ def parse_coordinates(location_str: str) -> Tuple[float, float]:
     except (ValueError, AttributeError):
         raise ValueError(f"Invalid location format: {location_str}")
 
+
+def validate_coordinates(latitude, longitude) -> Tuple[float, float]:
+    """
+    Coerce a latitude/longitude pair received from a client to floats.
+    Raises ValueError if either is missing, not a finite number, or out of range.
+    """
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("latitude and longitude must be numbers")
+
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError("latitude and longitude must be finite")
+    if not -90 <= lat <= 90:
+        raise ValueError("latitude must be between -90 and 90")
+    if not -180 <= lon <= 180:
+        raise ValueError("longitude must be between -180 and 180")
+    return lat, lon
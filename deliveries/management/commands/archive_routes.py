@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from deliveries.models import DeliveryLocation
+from deliveries.routes import archive_delivery_route
+
+
+class Command(BaseCommand):
+    """
+    Archives the location history of every DELIVERED delivery that still has raw
+    DeliveryLocation rows — deliveries completed before archiving was enabled,
+    failed on-delivery archives, and pings flushed after the delivery was archived.
+    """
+    help = "Pack the location history of delivered deliveries into compact routes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Archive at most this many deliveries in this run",
+        )
+        parser.add_argument(
+            "--tolerance-m",
+            type=float,
+            default=None,
+            help="Override ROUTE_SIMPLIFY_TOLERANCE_M for this run (0 keeps every point)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the deliveries that would be archived without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        delivery_ids = (
+            DeliveryLocation.objects.filter(delivery__status="DELIVERED")
+            .values_list("delivery_id", flat=True)
+            .order_by("delivery_id")
+            .distinct()
+        )
+        if options["limit"] is not None:
+            delivery_ids = delivery_ids[:options["limit"]]
+        delivery_ids = list(delivery_ids)
+
+        if options["dry_run"]:
+            self.stdout.write(f"Would archive {len(delivery_ids)} delivery routes")
+            return
+
+        archived = 0
+        for delivery_id in delivery_ids:
+            route = archive_delivery_route(delivery_id, tolerance_m=options["tolerance_m"])
+            if route is not None:
+                archived += 1
+                self.stdout.write(
+                    f"Delivery {delivery_id}: {route.raw_point_count} pings → {route.point_count} points"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} delivery routes"))
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from deliveries.models import DeliveryLocation
+from deliveries.partitions import (
+    add_months,
+    DEFAULT_PARTITION,
+    convert_to_partitioned,
+    count_expired_in_default_partition,
+    create_partitions,
+    drop_partitions,
+    expired_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    prune_default_partition,
+    prune_expired_locations,
+    retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    """
+    Maintains DeliveryLocation history storage. Meant to run daily (cron / scheduler).
+    - On a partitioned PostgreSQL table: creates the coming months' partitions,
+      drops partitions entirely older than LOCATION_RETENTION_DAYS and deletes
+      expired rows from the default partition.
+    - Otherwise: deletes expired rows in batches.
+    - --convert partitions an existing PostgreSQL table by month (one-off).
+    """
+    help = "Create/drop monthly DeliveryLocation partitions and apply the retention policy"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Convert the location table to a monthly partitioned table (PostgreSQL only)",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=None,
+            help="Partitions to keep ready beyond the current month "
+                 "(default: LOCATION_PARTITION_MONTHS_AHEAD)",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help="Override LOCATION_RETENTION_DAYS for this run (0 keeps everything)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be created or removed without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        months_ahead = options["months_ahead"]
+        if months_ahead is None:
+            months_ahead = settings.LOCATION_PARTITION_MONTHS_AHEAD
+        cutoff = retention_cutoff(retention_days=options["retention_days"])
+        dry_run = options["dry_run"]
+
+        if options["convert"]:
+            self._convert(months_ahead, dry_run)
+
+        if is_partitioned():
+            self._maintain_partitions(months_ahead, cutoff, dry_run)
+        else:
+            self._prune_rows(cutoff, dry_run)
+
+    def _convert(self, months_ahead, dry_run):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning requires PostgreSQL (DB_ENGINE=postgresql)")
+        if is_partitioned():
+            self.stdout.write("Location table is already partitioned")
+            return
+        if dry_run:
+            self.stdout.write("Would convert the location table to monthly partitions")
+            return
+
+        convert_to_partitioned(months_ahead)
+        self.stdout.write(self.style.SUCCESS("Converted the location table to monthly partitions"))
+
+    def _maintain_partitions(self, months_ahead, cutoff, dry_run):
+        current = month_start(timezone.now())
+        last = add_months(current, months_ahead)
+
+        if dry_run:
+            self.stdout.write(f"Would ensure partitions from {current:%Y-%m} to {last:%Y-%m}")
+        else:
+            for name in create_partitions(current, last):
+                self.stdout.write(f"Created partition {name}")
+
+        if cutoff is None:
+            return
+
+        expired = expired_partitions(list_partitions(), cutoff)
+        for name in expired:
+            self.stdout.write(f"{'Would drop' if dry_run else 'Dropping'} partition {name}")
+        if not dry_run:
+            drop_partitions(expired)
+
+        if DEFAULT_PARTITION not in list_partitions():
+            return
+        if dry_run:
+            count = count_expired_in_default_partition(cutoff)
+            self.stdout.write(f"Would delete {count} rows from {DEFAULT_PARTITION} recorded before {cutoff:%Y-%m-%d}")
+            return
+        deleted = prune_default_partition(cutoff)
+        self.stdout.write(f"Deleted {deleted} rows from {DEFAULT_PARTITION} recorded before {cutoff:%Y-%m-%d}")
+
+    def _prune_rows(self, cutoff, dry_run):
+        if cutoff is None:
+            self.stdout.write("Retention disabled (LOCATION_RETENTION_DAYS=0); nothing to prune")
+            return
+
+        if dry_run:
+            count = DeliveryLocation.objects.filter(recorded_at__lt=cutoff).count()
+            self.stdout.write(f"Would delete {count} location rows recorded before {cutoff:%Y-%m-%d}")
+            return
+
+        deleted = prune_expired_locations(cutoff)
+        self.stdout.write(f"Deleted {deleted} location rows recorded before {cutoff:%Y-%m-%d}")
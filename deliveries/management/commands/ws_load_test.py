@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from deliveries.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    """
+    Load-tests the tracking and biker WebSocket channels in-process.
+    Runs the real ASGI application against the in-memory channel layer, on a
+    throwaway test database that is created for the run and destroyed afterwards,
+    so it never touches real data and needs neither Redis nor a running server.
+    """
+    help = "Simulate bikers pinging locations to delivery watchers and report throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bikers",
+            type=int,
+            default=20,
+            help="Bikers pinging at the same time, each on its own delivery",
+        )
+        parser.add_argument(
+            "--watchers",
+            type=int,
+            default=2,
+            help="Watcher connections per delivery",
+        )
+        parser.add_argument(
+            "--pings",
+            type=int,
+            default=50,
+            help="Location pings sent by each biker",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.1,
+            help="Seconds between a biker's pings",
+        )
+        parser.add_argument(
+            "--keep-throttle",
+            action="store_true",
+            help="Keep the configured broadcast throttle instead of fanning out every ping",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the report as JSON",
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            result = run_load_test(
+                bikers=options["bikers"],
+                watchers=options["watchers"],
+                pings=options["pings"],
+                interval=options["interval"],
+                keep_throttle=options["keep_throttle"],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = result.as_dict()
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for key, value in report.items():
+            self.stdout.write(f"{key:>24}: {value}")
@@ -1,50 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
 from urllib.parse import parse_qs
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# How long a resolved user is reused for new WebSocket connections (seconds)
+USER_CACHE_TTL = 60
 
-@database_sync_to_async
-def get_user_from_token(token_str: str):
+# Maximum number of users kept in the cache per process
+USER_CACHE_MAX_SIZE = 10000
+
+# The only user fields consumers need — everything else is loaded lazily if touched.
+# The biker profile id is joined in, so consumers know a connection's role without a query
+USER_CACHE_FIELDS = ("id", "email", "role", "is_active", "is_staff", "is_superuser", "biker_profile__id")
+
+
+# -------------------------
+# USER CACHE
+# -------------------------
+class UserCache:
+    """
+    Small per-process TTL + LRU cache of user_id → user.
+    - Saves a database round trip per WebSocket connect during reconnect storms.
+    - Entries expire after ttl seconds; the least recently used entry is evicted
+      once max_size is reached.
+    - deliveries.signals invalidates an entry whenever the user is saved or deleted,
+      so deactivated users are rejected immediately in this process.
+    - Keys are normalised to strings, since JWT claims carry the user id as text.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_size=USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()   # user_id -> (expires_at, user)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Returns the cached user, or None if missing or expired."""
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, user_id, user):
+        key = str(user_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide cache shared by every WebSocket connection
+user_cache = UserCache()
+
+
+async def get_user_from_token(token_str: str):
     """
     Validate JWT token and return the matching user.
-    - Uses UntypedToken to validate the token signature and expiry.
-    - Uses TokenBackend with the project SECRET_KEY to decode the payload.
-    - Returns the user if found, otherwise returns AnonymousUser.
+    - Uses UntypedToken to validate the signature and expiry; the token is decoded
+      once, with simplejwt's shared token backend, and the user_id read from it.
+    - Reuses a recently resolved user from the cache, so only cache misses
+      hop to the database thread.
+    - Returns the user if found and active, otherwise returns AnonymousUser.
     """
     try:
-        # Validate token signature and expiry first
-        UntypedToken(token_str)
+        # Validate token signature and expiry, decoding the payload
+        token = UntypedToken(token_str)
+    except (InvalidToken, TokenError):
+        # Any token issue — treat as anonymous
+        return AnonymousUser()
 
-        # Decode the payload using the project's SECRET_KEY
-        from rest_framework_simplejwt.backends import TokenBackend
-        backend = TokenBackend(algorithm='HS256', signing_key=settings.SECRET_KEY)
-        payload = backend.decode(token_str, verify=True)
+    # Extract user_id from the decoded payload
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if not user_id:
+        return AnonymousUser()
 
-        # Extract user_id from the decoded payload
-        user_id = payload.get('user_id')
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await get_active_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        user_cache.set(user_id, user)
 
-        if user_id:
-            return User.objects.get(id=user_id)
+    return user
 
-    except (InvalidToken, TokenError, User.DoesNotExist):
-        # Any token or user issue — treat as anonymous
-        pass
 
-    return AnonymousUser()
+@database_sync_to_async
+def get_active_user(user_id):
+    """
+    Load the minimal user record for an active user, with their biker profile id
+    in the same query. Returns None if not found.
+    """
+    try:
+        return (
+            User.objects.select_related("biker_profile")
+            .only(*USER_CACHE_FIELDS)
+            .get(id=user_id, is_active=True)
+        )
+    except (User.DoesNotExist, ValueError):
+        return None
+
+
+def get_biker_id(user):
+    """The user's biker profile id, or None. Free for users from get_active_user (joined in)."""
+    if user.is_anonymous:
+        return None
+    try:
+        return user.biker_profile.id
+    except ObjectDoesNotExist:
+        return None
+
+
+def get_connection_role(user, biker_id):
+    """
+    The role a WebSocket connection acts in:
+    'admin' for staff, 'biker' for users with a biker profile, 'client' otherwise.
+    """
+    if user.is_staff:
+        return "admin"
+    if biker_id is not None:
+        return "biker"
+    return "client"
 
 
 class JWTAuthMiddleware(BaseMiddleware):
     """
     WebSocket middleware for JWT authentication.
     Expects token in query string: ws://...?token=<jwt_token>
-    Attaches the authenticated user to the scope so consumers can access it via self.scope['user'].
+    Attaches the authenticated user to the scope so consumers can access it via self.scope['user'],
+    along with scope['biker_id'] and scope['role'] (see get_connection_role), resolved
+    once here — from the user cache on reconnects — so consumers need no query for them.
     """
     async def __call__(self, scope, receive, send):
         # Parse the WebSocket query string to extract the token
@@ -58,4 +168,7 @@ class JWTAuthMiddleware(BaseMiddleware):
             # No token provided — treat as anonymous
             scope["user"] = AnonymousUser()
 
-        return await super().__call__(scope, receive, send)
\ No newline at end of file
+        scope["biker_id"] = get_biker_id(scope["user"])
+        scope["role"] = None if scope["user"].is_anonymous else get_connection_role(scope["user"], scope["biker_id"])
+
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-17 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0005_rename_pickup_latitude_deliverylocation_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='biker',
+            index=models.Index(fields=['status', 'current_latitude', 'current_longitude'], name='biker_status_location_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.8 on 2026-10-17 12:38
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0006_biker_status_location_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deliverylocation',
+            name='recorded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
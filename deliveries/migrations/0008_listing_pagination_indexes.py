@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-17 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0007_deliverylocation_recorded_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['-created_at'], name='delivery_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverylocation',
+            index=models.Index(fields=['-recorded_at'], name='location_recorded_at_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-17 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0008_listing_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['status', 'pickup_latitude', 'pickup_longitude'], name='delivery_status_pickup_idx'),
+        ),
+    ]
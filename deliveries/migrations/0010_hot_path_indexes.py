@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-17 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0009_delivery_status_pickup_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['client', '-created_at'], name='delivery_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(condition=models.Q(('status', 'SEARCHING')), fields=['-created_at'], name='delivery_searching_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverylocation',
+            index=models.Index(fields=['delivery', '-recorded_at'], name='location_delivery_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverylog',
+            index=models.Index(fields=['delivery', '-timestamp'], name='log_delivery_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.8 on 2026-10-17 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryRoute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('polyline', models.TextField()),
+                ('timestamps', models.TextField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('raw_point_count', models.PositiveIntegerField()),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('delivery', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='route', to='deliveries.delivery')),
+            ],
+        ),
+    ]
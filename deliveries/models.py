@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -36,6 +37,15 @@ class Biker(models.Model):
     current_latitude = models.FloatField(null=True, blank=True)
     current_longitude = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Backs the bounding-box query in find_nearby_bikers
+            models.Index(
+                fields=["status", "current_latitude", "current_longitude"],
+                name="biker_status_location_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"Biker: {self.user.email} ({self.status})"
 
@@ -80,6 +90,25 @@ class Delivery(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Backs cursor pagination of delivery listings (newest first)
+            models.Index(fields=["-created_at"], name="delivery_created_at_idx"),
+            # A client's own deliveries, newest first (client listing and my_deliveries)
+            models.Index(fields=["client", "-created_at"], name="delivery_client_created_idx"),
+            # Partial index over open jobs only — stays small however many deliveries are completed
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(status="SEARCHING"),
+                name="delivery_searching_idx"
+            ),
+            # Backs the distance-scoped SEARCHING feed for bikers
+            models.Index(
+                fields=["status", "pickup_latitude", "pickup_longitude"],
+                name="delivery_status_pickup_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"Delivery {self.id} - {self.status}"
 
@@ -108,7 +137,7 @@ class DeliveryAssignment(models.Model):
     assigned_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Assignment: Delivery {self.delivery.id} → {self.biker.user.email}"
+        return f"Assignment: Delivery {self.delivery_id} → {self.biker.user.email}"
 
 # -------------------------
 # DELIVERY LOCATION
@@ -134,10 +163,52 @@ class DeliveryLocation(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
 
-    recorded_at = models.DateTimeField(auto_now_add=True)
+    # Set when the ping is received (not when it is written), since pings are buffered
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Backs cursor pagination of location history (newest first)
+            models.Index(fields=["-recorded_at"], name="location_recorded_at_idx"),
+            # One delivery's route, in order (tracking history and route building)
+            models.Index(fields=["delivery", "-recorded_at"], name="location_delivery_recorded_idx"),
+        ]
+
+    def __str__(self):
+        return f"Location for Delivery {self.delivery_id}"
+
+# -------------------------
+# DELIVERY ROUTE
+# -------------------------
+class DeliveryRoute(models.Model):
+    """
+    Compact archive of a completed delivery's GPS trail.
+    - Replaces the delivery's DeliveryLocation rows once it is DELIVERED (see deliveries.routes).
+    - Coordinates are stored as an encoded polyline, timestamps as delta-encoded
+      milliseconds since started_at, so a whole trail fits in one row.
+    - The trail may be simplified (Douglas–Peucker) before storage; raw_point_count
+      keeps the number of pings that were archived.
+    """
+    delivery = models.OneToOneField(
+        Delivery,
+        on_delete=models.CASCADE,
+        related_name="route"
+    )
+
+    # Encoded polyline of (latitude, longitude) pairs, 1e-5 degree precision
+    polyline = models.TextField()
+    # Delta-encoded milliseconds since started_at, one per point in the polyline
+    timestamps = models.TextField()
+
+    point_count = models.PositiveIntegerField()
+    raw_point_count = models.PositiveIntegerField()
+
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Location for Delivery {self.delivery.id}"
+        return f"Route for Delivery {self.delivery_id} ({self.point_count} points)"
 
 # -------------------------
 # DELIVERY LOG
@@ -156,5 +227,11 @@ class DeliveryLog(models.Model):
     message = models.CharField(max_length=255)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # One delivery's audit trail, in order
+            models.Index(fields=["delivery", "-timestamp"], name="log_delivery_timestamp_idx"),
+        ]
+
     def __str__(self):
-        return f"Log: Delivery {self.delivery.id} - {self.message}"
\ No newline at end of file
+        return f"Log: Delivery {self.delivery_id} - {self.message}"
\ No newline at end of file
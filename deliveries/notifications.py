@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+from force_backend.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of fan-out batches delivered at the same time per process
+FANOUT_WORKERS = 4
+
+# How long the list of bikers notified about a delivery is kept (seconds)
+NOTIFIED_BIKERS_TTL = 60 * 60
+
+# Bucket bounds for the number of groups in one fan-out batch
+FANOUT_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+FANOUT_SIZE = get_metrics_registry().histogram(
+    "channel_layer_fanout_groups", "Groups sent to per fan-out batch, by event type", FANOUT_SIZE_BUCKETS)
+FANOUT_DURATION = get_metrics_registry().histogram(
+    "channel_layer_fanout_seconds", "Time to deliver a fan-out batch through the channel layer, by event type")
+
+# Background workers that deliver fan-out batches off the request thread
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+
+def send_to_groups(messages, channel_layer=None):
+    """
+    Sends a batch of (group_name, message) pairs through the channel layer.
+    - All group_send calls run concurrently inside a single event-loop hop,
+      instead of one async_to_sync round trip per group.
+    - Failures are logged per group so one bad send does not drop the rest.
+    """
+    if not messages:
+        return
+
+    if channel_layer is None:
+        channel_layer = get_channel_layer()
+
+    async_to_sync(_send_all)(channel_layer, messages)
+
+
+async def _send_all(channel_layer, messages):
+    event_type = messages[0][1].get("type", "unknown")
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(channel_layer.group_send(group_name, message) for group_name, message in messages),
+        return_exceptions=True
+    )
+    FANOUT_DURATION.observe(time.perf_counter() - started, type=event_type)
+    FANOUT_SIZE.observe(len(messages), type=event_type)
+    for (group_name, _), result in zip(messages, results):
+        if isinstance(result, Exception):
+            logger.error("group_send to %s failed: %s", group_name, result)
+
+
+def send_to_groups_in_background(messages):
+    """
+    Queues a batch for send_to_groups on the fan-out workers once the current
+    transaction commits, so the caller never waits on the channel layer and
+    bikers are never told about a delivery that was rolled back.
+    """
+    if not messages:
+        return
+
+    def dispatch():
+        future = _executor.submit(send_to_groups, messages)
+        future.add_done_callback(_log_failure)
+
+    transaction.on_commit(dispatch)
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error("Fan-out batch failed: %s", future.exception())
+
+
+def notify_delivery_request(delivery, bikers):
+    """
+    Sends a delivery_request notification to each biker's personal group
+    (biker_<id>) as one batch, after the delivery has been committed.
+    The notified biker ids are recorded so delivery_taken can reach the same bikers.
+    """
+    record_notified_bikers(delivery.id, [biker.id for biker in bikers])
+
+    send_to_groups_in_background([
+        (
+            f"biker_{biker.id}",  # Each biker listens on their own group channel
+            {
+                "type": "delivery_request",  # Maps to a consumer handler method
+                "delivery_id": delivery.id,
+                "pickup_address": delivery.pickup_address,
+                "dropoff_address": delivery.dropoff_address,
+            }
+        )
+        for biker in bikers
+    ])
+
+
+# =====================================
+# NOTIFIED BIKERS
+# =====================================
+
+def _notified_bikers_key(delivery_id):
+    return f"delivery:{delivery_id}:notified_bikers"
+
+
+def record_notified_bikers(delivery_id, biker_ids):
+    """Remember which bikers were sent a delivery_request for this delivery."""
+    cache.set(_notified_bikers_key(delivery_id), list(biker_ids), NOTIFIED_BIKERS_TTL)
+
+
+def get_notified_bikers(delivery_id):
+    """
+    Returns the biker ids recorded for this delivery, or None if nothing is
+    recorded (expired, or notified by a process that does not share the cache).
+    """
+    return cache.get(_notified_bikers_key(delivery_id))
+
+
+def forget_notified_bikers(delivery_id):
+    """Drop the recorded biker ids once they are no longer needed."""
+    cache.delete(_notified_bikers_key(delivery_id))
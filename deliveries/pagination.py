@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DeliveryCursorPagination(CursorPagination):
+    """
+    Keyset pagination for delivery listings, newest first.
+    - Pages are fetched with WHERE created_at < <cursor> instead of OFFSET, so
+      every page costs the same no matter how deep the client scrolls.
+    - Clients follow the 'next' / 'previous' links; page_size is adjustable up to max_page_size.
+    """
+    ordering = "-created_at"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class LocationCursorPagination(CursorPagination):
+    """Keyset pagination for location history, newest point first."""
+    ordering = "-recorded_at"
+    page_size = 200
+    page_size_query_param = "page_size"
+    max_page_size = 1000
@@ -0,0 +1,324 @@
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.migrations.operations import AddIndex, RemoveIndex, RunPython, RunSQL
+from django.utils import timezone
+
+from .models import DeliveryLocation
+
+# Parent table of the partitioned location history
+LOCATION_TABLE = DeliveryLocation._meta.db_table
+
+# Monthly partitions are named <table>_pYYYYMM, e.g. deliveries_deliverylocation_p202610
+PARTITION_NAME_RE = re.compile(rf"^{LOCATION_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+# Catch-all partition for rows outside every monthly range, so a missed
+# "create partitions" run never makes location inserts fail
+DEFAULT_PARTITION = f"{LOCATION_TABLE}_default"
+
+# Rows removed per DELETE when pruning without partitions
+PRUNE_BATCH_SIZE = 5000
+
+# Migration operations that still work once the table is partitioned: index DDL
+# on the parent cascades to every partition, and data migrations go through the ORM
+PARTITION_SAFE_OPERATIONS = (AddIndex, RemoveIndex, RunPython, RunSQL)
+
+
+# -------------------------
+# MONTH HELPERS
+# -------------------------
+def month_start(value):
+    """First day of the month containing value (a date or datetime)."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """First day of the month `count` months after `month` (negative goes back)."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{LOCATION_TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name):
+    """The month a partition covers, or None if name is not a monthly partition."""
+    match = PARTITION_NAME_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def retention_cutoff(now=None, retention_days=None):
+    """
+    Location rows recorded before the returned datetime are expired.
+    Returns None when retention is disabled (LOCATION_RETENTION_DAYS = 0).
+    """
+    if retention_days is None:
+        retention_days = settings.LOCATION_RETENTION_DAYS
+    if not retention_days:
+        return None
+    return (now or timezone.now()) - timedelta(days=retention_days)
+
+
+def expired_partitions(names, cutoff):
+    """
+    Monthly partitions whose whole range ends on or before cutoff, oldest first.
+    A partition still holding any unexpired row is kept.
+    """
+    expired = []
+    for name in names:
+        month = partition_month(name)
+        if month is None:
+            continue
+        if add_months(month, 1) <= cutoff.date():
+            expired.append((month, name))
+    return [name for month, name in sorted(expired)]
+
+
+# -------------------------
+# POSTGRESQL PARTITIONS
+# -------------------------
+def is_partitioned():
+    """True if the location table is a PostgreSQL partitioned table."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [LOCATION_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Names of the partitions currently attached to the location table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+            [LOCATION_TABLE]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partitions(start_month, end_month):
+    """
+    Create every missing monthly partition from start_month to end_month (inclusive).
+    Returns the names of the partitions that were created.
+    - PostgreSQL refuses to create a partition while the default partition holds
+      rows in its range (e.g. after the daily run lapsed past the months created
+      ahead). Those rows are moved into the new partition: the default is
+      detached, the partition created and filled, and the default re-attached,
+      all in one transaction per month.
+    """
+    existing = set(list_partitions())
+    has_default = DEFAULT_PARTITION in existing
+    created = []
+    month = start_month
+    while month <= end_month:
+        name = partition_name(month)
+        if name not in existing:
+            bounds = [_month_bound(month), _month_bound(add_months(month, 1))]
+            with transaction.atomic(), connection.cursor() as cursor:
+                if has_default and _default_has_rows(cursor, bounds):
+                    _create_partition_from_default(cursor, name, bounds)
+                else:
+                    cursor.execute(
+                        f'CREATE TABLE "{name}" PARTITION OF "{LOCATION_TABLE}" '
+                        f"FOR VALUES FROM (%s) TO (%s)",
+                        bounds
+                    )
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def drop_partitions(names):
+    """Detach and drop the given partitions — instant, unlike a bulk DELETE."""
+    with connection.cursor() as cursor:
+        for name in names:
+            cursor.execute(f'ALTER TABLE "{LOCATION_TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+
+
+def convert_to_partitioned(months_ahead):
+    """
+    One-off conversion of the location table to a table partitioned by month on recorded_at.
+    - The existing table is renamed, its rows copied into monthly partitions, then dropped.
+    - The primary key becomes (id, recorded_at), as PostgreSQL requires the
+      partition key in every unique constraint; ids keep coming from a sequence.
+    - Indexes declared on DeliveryLocation are recreated on the parent, so every
+      partition gets them.
+    Runs in one transaction; location writes should be paused while it runs.
+    """
+    legacy = f"{LOCATION_TABLE}_legacy"
+    # Not <table>_id_seq: that name belongs to the legacy table's identity column
+    sequence = f"{LOCATION_TABLE}_partitioned_id_seq"
+    delivery_table = DeliveryLocation._meta.get_field("delivery").related_model._meta.db_table
+    biker_table = DeliveryLocation._meta.get_field("biker").related_model._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # The primary key's name depends on the table's history (it was created as
+        # delivery_locations), so look it up; the new table's key takes <table>_pkey
+        primary_key = _primary_key_name(cursor, LOCATION_TABLE)
+        cursor.execute(f'ALTER TABLE "{LOCATION_TABLE}" RENAME TO "{legacy}"')
+        cursor.execute(f'ALTER TABLE "{legacy}" RENAME CONSTRAINT "{primary_key}" TO "{legacy}_pkey"')
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{sequence}"')
+        cursor.execute(
+            f'CREATE TABLE "{LOCATION_TABLE}" ('
+            f"id bigint NOT NULL DEFAULT nextval('{sequence}'), "
+            f"latitude double precision NOT NULL, "
+            f"longitude double precision NOT NULL, "
+            f"recorded_at timestamp with time zone NOT NULL, "
+            f'biker_id bigint NOT NULL REFERENCES "{biker_table}" (id) DEFERRABLE INITIALLY DEFERRED, '
+            f'delivery_id bigint NOT NULL REFERENCES "{delivery_table}" (id) DEFERRABLE INITIALLY DEFERRED, '
+            f'CONSTRAINT "{LOCATION_TABLE}_pkey" PRIMARY KEY (id, recorded_at)'
+            f") PARTITION BY RANGE (recorded_at)"
+        )
+        cursor.execute(f'ALTER SEQUENCE "{sequence}" OWNED BY "{LOCATION_TABLE}".id')
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{LOCATION_TABLE}" DEFAULT')
+
+        # Monthly partitions from the oldest stored row up to months_ahead from now
+        cursor.execute(f'SELECT MIN(recorded_at) FROM "{legacy}"')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        current = month_start(timezone.now())
+        create_partitions(month_start(oldest), add_months(current, months_ahead))
+
+        columns = "id, latitude, longitude, recorded_at, biker_id, delivery_id"
+        cursor.execute(f'INSERT INTO "{LOCATION_TABLE}" ({columns}) SELECT {columns} FROM "{legacy}"')
+        cursor.execute(
+            f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM \"{LOCATION_TABLE}\"), 0) + 1, false)"
+        )
+        cursor.execute(f'DROP TABLE "{legacy}"')
+
+        # Recreate the foreign key and Meta indexes on the partitioned parent
+        cursor.execute(f'CREATE INDEX "{LOCATION_TABLE}_biker_id" ON "{LOCATION_TABLE}" (biker_id)')
+        cursor.execute(f'CREATE INDEX "{LOCATION_TABLE}_delivery_id" ON "{LOCATION_TABLE}" (delivery_id)')
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in DeliveryLocation._meta.indexes:
+                schema_editor.add_index(DeliveryLocation, index)
+
+
+def check_migration_plan(plan):
+    """
+    Refuse to migrate a partitioned location table with Django's schema operations.
+    --convert changes the table behind Django's back: the primary key becomes
+    (id, recorded_at) and the table is a partitioned parent, while the migration
+    state still describes the original single-column key. Operations generated
+    from that state (AlterField, RemoveField, ...) would emit DDL for a table
+    that no longer exists in that shape, so they must be applied by hand and
+    recorded with `migrate --fake`. Raises CommandError naming the migrations.
+    Disabled by LOCATION_PARTITION_MIGRATION_GUARD=False, for that --fake run.
+    """
+    if not plan or not settings.LOCATION_PARTITION_MIGRATION_GUARD or not is_partitioned():
+        return
+
+    app_label = DeliveryLocation._meta.app_label
+    model_name = DeliveryLocation._meta.model_name
+    blocked = [
+        migration
+        for migration, _ in plan
+        if any(
+            operation.references_model(model_name, migration.app_label)
+            and not isinstance(operation, PARTITION_SAFE_OPERATIONS)
+            for operation in migration.operations
+        )
+    ]
+    if blocked:
+        names = ", ".join(f"{migration.app_label}.{migration.name}" for migration in blocked)
+        raise CommandError(
+            f"{names} alter {app_label}.DeliveryLocation, but {LOCATION_TABLE} is partitioned "
+            f"(location_partitions --convert) and no longer matches the migration state. "
+            f"Apply the change to the partitioned table by hand, then record it with "
+            f"`manage.py migrate <app> <migration> --fake` and LOCATION_PARTITION_MIGRATION_GUARD=False."
+        )
+
+
+def _default_has_rows(cursor, bounds):
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE recorded_at >= %s AND recorded_at < %s)',
+        bounds
+    )
+    return cursor.fetchone()[0]
+
+
+def _create_partition_from_default(cursor, name, bounds):
+    """Create partition `name` for bounds, moving its rows out of the default partition."""
+    cursor.execute(f'ALTER TABLE "{LOCATION_TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"')
+    cursor.execute(
+        f'CREATE TABLE "{name}" PARTITION OF "{LOCATION_TABLE}" FOR VALUES FROM (%s) TO (%s)',
+        bounds
+    )
+    columns = "id, latitude, longitude, recorded_at, biker_id, delivery_id"
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE recorded_at >= %s AND recorded_at < %s '
+        f"RETURNING {columns}) "
+        f'INSERT INTO "{LOCATION_TABLE}" ({columns}) SELECT {columns} FROM moved',
+        bounds
+    )
+    cursor.execute(f'ALTER TABLE "{LOCATION_TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT')
+
+
+def _primary_key_name(cursor, table):
+    constraints = connection.introspection.get_constraints(cursor, table)
+    return next(name for name, constraint in constraints.items() if constraint["primary_key"])
+
+
+def _month_bound(month):
+    """Partition bounds are midnight UTC on the first of the month."""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+# -------------------------
+# RETENTION
+# -------------------------
+def prune_expired_locations(cutoff, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Delete unpartitioned location rows recorded before cutoff.
+    Deletes in batches of batch_size so no single statement locks the whole table.
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    while True:
+        batch = list(
+            DeliveryLocation.objects.filter(recorded_at__lt=cutoff)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        deleted += DeliveryLocation.objects.filter(id__in=batch).delete()[0]
+
+
+def prune_default_partition(cutoff, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Delete rows recorded before cutoff from the default partition of a partitioned
+    table. Rows there sit outside every monthly range, so dropping expired
+    partitions never removes them. Deletes in batches of batch_size.
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f'DELETE FROM "{DEFAULT_PARTITION}" WHERE ctid IN ('
+                f'SELECT ctid FROM "{DEFAULT_PARTITION}" WHERE recorded_at < %s LIMIT %s)',
+                [cutoff, batch_size]
+            )
+            if not cursor.rowcount:
+                return deleted
+            deleted += cursor.rowcount
+
+
+def count_expired_in_default_partition(cutoff):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM "{DEFAULT_PARTITION}" WHERE recorded_at < %s', [cutoff])
+        return cursor.fetchone()[0]
@@ -0,0 +1,175 @@
+"""
+Biker presence — which bikers currently have the app connected.
+- BikerConsumer marks a biker present on connect and on every heartbeat, and
+  absent on disconnect.
+- Presence is tracked per connection (channel_name), and disconnect only
+  removes its own connection. A reconnect, where the new socket connects
+  before the old one has closed, therefore keeps the biker present.
+- Each connection expires BIKER_PRESENCE_TTL_SECONDS after its last heartbeat,
+  so a phone that drops off the network without closing its socket stops
+  counting as present.
+- BIKER_PRESENCE_BACKEND picks the store: 'memory' (per process) or 'redis'
+  (shared by every worker). In Redis each biker has a sorted set of
+  channel_name scored by expiry time, so every update is one atomic command
+  and concurrent connects/disconnects cannot overwrite each other.
+"""
+import threading
+import time
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# Redis sorted set of a biker's live connections, scored by expiry (unix time)
+REDIS_PRESENCE_KEY = "biker:{biker_id}:present"
+
+
+# -------------------------
+# PRESENCE STORES
+# -------------------------
+class BasePresenceStore:
+    """Per-connection presence entries. Subclasses implement every method."""
+
+    def add(self, biker_id, channel_name, expires_at, ttl):
+        """Record (or renew) one connection until expires_at; ttl is the same in seconds."""
+        raise NotImplementedError
+
+    def remove(self, biker_id, channel_name):
+        raise NotImplementedError
+
+    def present(self, biker_ids, now):
+        """The subset of biker_ids with at least one connection expiring after now."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryPresenceStore(BasePresenceStore):
+    """Per-process presence. Used in tests and single-process deployments."""
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def add(self, biker_id, channel_name, expires_at, ttl):
+        now = time.time()
+        with self._lock:
+            channels = self._connections.get(biker_id, {})
+            # Drop connections that stopped heartbeating
+            channels = {channel: expiry for channel, expiry in channels.items() if expiry > now}
+            channels[channel_name] = expires_at
+            self._connections[biker_id] = channels
+
+    def remove(self, biker_id, channel_name):
+        with self._lock:
+            channels = self._connections.get(biker_id)
+            if channels is not None:
+                channels.pop(channel_name, None)
+                if not channels:
+                    del self._connections[biker_id]
+
+    def present(self, biker_ids, now):
+        with self._lock:
+            return {
+                biker_id for biker_id in biker_ids
+                if any(expires_at > now for expires_at in self._connections.get(biker_id, {}).values())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._connections = {}
+
+
+class RedisPresenceStore(BasePresenceStore):
+    """Presence shared by every process, one sorted set per biker."""
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def add(self, biker_id, channel_name, expires_at, ttl):
+        key = REDIS_PRESENCE_KEY.format(biker_id=biker_id)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.zadd(key, {channel_name: expires_at})
+        # Drop connections that stopped heartbeating; the set itself goes once all have
+        pipe.zremrangebyscore(key, "-inf", time.time())
+        pipe.expire(key, max(1, int(ttl + 0.999)))
+        pipe.execute()
+
+    def remove(self, biker_id, channel_name):
+        self._redis.zrem(REDIS_PRESENCE_KEY.format(biker_id=biker_id), channel_name)
+
+    def present(self, biker_ids, now):
+        biker_ids = list(biker_ids)
+        pipe = self._redis.pipeline(transaction=False)
+        for biker_id in biker_ids:
+            pipe.zcount(REDIS_PRESENCE_KEY.format(biker_id=biker_id), f"({now}", "+inf")
+        return {biker_id for biker_id, live in zip(biker_ids, pipe.execute()) if live}
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(REDIS_PRESENCE_KEY.format(biker_id="*")))
+        if keys:
+            self._redis.delete(*keys)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_presence_store():
+    """
+    Return the process-wide presence store for BIKER_PRESENCE_BACKEND:
+    'memory' or 'redis' (shared between processes, uses REDIS_URL).
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.BIKER_PRESENCE_BACKEND == "redis":
+                    _store = RedisPresenceStore(settings.REDIS_URL)
+                elif settings.BIKER_PRESENCE_BACKEND == "memory":
+                    _store = MemoryPresenceStore()
+                else:
+                    raise ValueError(
+                        f"Unsupported presence backend: {settings.BIKER_PRESENCE_BACKEND}"
+                    )
+    return _store
+
+
+# -------------------------
+# PRESENCE API
+# -------------------------
+def mark_present(biker_id, channel_name):
+    """Mark one of a biker's connections present for the next BIKER_PRESENCE_TTL_SECONDS."""
+    ttl = settings.BIKER_PRESENCE_TTL_SECONDS
+    get_presence_store().add(biker_id, channel_name, time.time() + ttl, ttl)
+
+
+def mark_absent(biker_id, channel_name):
+    """Forget one of a biker's connections; the biker stays present while any other is live."""
+    get_presence_store().remove(biker_id, channel_name)
+
+
+amark_present = sync_to_async(mark_present, thread_sensitive=False)
+amark_absent = sync_to_async(mark_absent, thread_sensitive=False)
+
+
+def present_biker_ids(biker_ids):
+    """Returns the subset of biker_ids that are present, in one store round trip."""
+    biker_ids = list(biker_ids)
+    if not biker_ids:
+        return set()
+    return get_presence_store().present(biker_ids, time.time())
+
+
+def only_present(items, biker_id=itemgetter(1)):
+    """
+    Filter items down to those of present bikers; biker_id(item) gives each
+    item's biker id (by default the second element of a (distance, biker_id) pair).
+    Returns items unchanged when BIKER_PRESENCE_REQUIRED is off.
+    """
+    if not settings.BIKER_PRESENCE_REQUIRED or not items:
+        return items
+    present = present_biker_ids([biker_id(item) for item in items])
+    return [item for item in items if biker_id(item) in present]
@@ -0,0 +1,377 @@
+"""
+Route archiving for completed deliveries.
+- A delivery's DeliveryLocation rows are packed into one DeliveryRoute row:
+  coordinates as an encoded polyline, timestamps as delta-encoded milliseconds.
+- Trails can be simplified with Douglas–Peucker before they are stored.
+- route_points() returns the same (latitude, longitude, recorded_at) trail
+  whether the delivery is archived or still has raw rows.
+"""
+import heapq
+import logging
+import math
+from datetime import timedelta
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .buffers import get_location_buffer
+from .distance import KM_PER_DEGREE
+from .models import DeliveryLocation, DeliveryRoute
+
+logger = logging.getLogger(__name__)
+
+# Decimal places kept in the encoded polyline (5 ≈ 1.1 m, as used by map providers)
+POLYLINE_PRECISION = 5
+
+METERS_PER_DEGREE = KM_PER_DEGREE * 1000
+
+# Point budget for route replay when the client does not ask for one, and the most it may ask for
+ROUTE_DEFAULT_MAX_POINTS = 1000
+ROUTE_MAX_POINTS_LIMIT = 10000
+
+# How long a delivered route's replay is cached. Keys include the archive time
+# (or, before archiving, the newest raw row), so late pings never serve a stale trail
+ROUTE_CACHE_SECONDS = 60 * 60 * 24
+
+
+# =====================================
+# POLYLINE ENCODING
+# =====================================
+def _encode_value(value):
+    """Zig-zag encode one signed integer, 5 bits per printable character."""
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def _decode_values(encoded):
+    """Yield every signed integer in an encoded string, as written by _encode_value()."""
+    index = 0
+    while index < len(encoded):
+        result = 0
+        shift = 0
+        while True:
+            byte = ord(encoded[index]) - 63
+            index += 1
+            result |= (byte & 0x1f) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        yield ~(result >> 1) if result & 1 else result >> 1
+
+
+def encode_integers(values):
+    """Delta-encode a sequence of integers using the polyline varint scheme."""
+    chunks = []
+    previous = 0
+    for value in values:
+        chunks.append(_encode_value(value - previous))
+        previous = value
+    return "".join(chunks)
+
+
+def decode_integers(encoded):
+    """Inverse of encode_integers(). Returns a list of integers."""
+    values = []
+    value = 0
+    for delta in _decode_values(encoded):
+        value += delta
+        values.append(value)
+    return values
+
+
+def encode_polyline(points, precision=POLYLINE_PRECISION):
+    """Encode (latitude, longitude) pairs as a standard encoded polyline string."""
+    factor = 10 ** precision
+    chunks = []
+    previous_lat = previous_lon = 0
+    for latitude, longitude in points:
+        lat_value = round(latitude * factor)
+        lon_value = round(longitude * factor)
+        # Standard polylines interleave latitude and longitude deltas
+        chunks.append(_encode_value(lat_value - previous_lat))
+        chunks.append(_encode_value(lon_value - previous_lon))
+        previous_lat, previous_lon = lat_value, lon_value
+    return "".join(chunks)
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    """Inverse of encode_polyline(). Returns a list of (latitude, longitude) pairs."""
+    factor = 10 ** precision
+    deltas = list(_decode_values(encoded))
+
+    points = []
+    latitude = longitude = 0
+    for index in range(0, len(deltas) - 1, 2):
+        latitude += deltas[index]
+        longitude += deltas[index + 1]
+        points.append((latitude / factor, longitude / factor))
+    return points
+
+
+# =====================================
+# SIMPLIFICATION
+# =====================================
+def _project(points):
+    """
+    Project (latitude, longitude) pairs to x/y meters with a local equirectangular
+    projection, which is accurate at trail scale. Returns two NumPy arrays.
+    """
+    coords = np.asarray(points, dtype=float)
+    reference_lat = math.radians(coords[:, 0].mean())
+    y = coords[:, 0] * METERS_PER_DEGREE
+    x = coords[:, 1] * METERS_PER_DEGREE * math.cos(reference_lat)
+    return x, y
+
+
+def _farthest_from_segment(x, y, start, end):
+    """
+    Returns (distance_m, index) of the point strictly between start and end that is
+    farthest from the start→end segment, computed in one vectorized pass.
+    """
+    dx = x[end] - x[start]
+    dy = y[end] - y[start]
+    px = x[start + 1:end] - x[start]
+    py = y[start + 1:end] - y[start]
+    length = math.hypot(dx, dy)
+
+    if length == 0:
+        # Start and end coincide — use the distance to that point
+        distances = np.hypot(px, py)
+    else:
+        distances = np.abs(dx * py - dy * px) / length
+
+    farthest = int(np.argmax(distances))
+    return float(distances[farthest]), start + 1 + farthest
+
+
+def simplify(points, tolerance_m):
+    """
+    Douglas–Peucker line simplification.
+    Returns the sorted indices of the points to keep; the first and last points
+    are always kept. Points closer than tolerance_m to the simplified line are dropped.
+    """
+    count = len(points)
+    if count <= 2 or tolerance_m <= 0:
+        return list(range(count))
+
+    x, y = _project(points)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Iterative, so long trails cannot hit the recursion limit
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        distance, split = _farthest_from_segment(x, y, start, end)
+        if distance > tolerance_m:
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return [int(index) for index in np.flatnonzero(keep)]
+
+
+def simplify_to_budget(points, max_points):
+    """
+    Douglas–Peucker bounded by a point budget instead of a tolerance.
+    Always splits the segment with the largest deviation next, so the kept
+    max_points are the most significant ones. Returns sorted indices.
+    """
+    count = len(points)
+    if count <= max_points:
+        return list(range(count))
+    if max_points <= 2:
+        return [0, count - 1][:max(max_points, 1)]
+
+    x, y = _project(points)
+    kept = [0, count - 1]
+
+    # Max-heap of segments by deviation (heapq is a min-heap, so distances are negated)
+    heap = []
+
+    def push(start, end):
+        if end - start >= 2:
+            distance, split = _farthest_from_segment(x, y, start, end)
+            heapq.heappush(heap, (-distance, start, end, split))
+
+    push(0, count - 1)
+    while heap and len(kept) < max_points:
+        _, start, end, split = heapq.heappop(heap)
+        kept.append(split)
+        push(start, split)
+        push(split, end)
+
+    return sorted(kept)
+
+
+def downsample(points, max_points=None, tolerance_m=None):
+    """
+    Reduce a (latitude, longitude, recorded_at) trail for display.
+    tolerance_m drops points within that distance of the simplified line, then
+    max_points caps what is left. Either can be None to skip that step.
+    """
+    if tolerance_m:
+        points = [points[index] for index in simplify([point[:2] for point in points], tolerance_m)]
+    if max_points:
+        points = [points[index] for index in simplify_to_budget([point[:2] for point in points], max_points)]
+    return points
+
+
+# =====================================
+# ARCHIVING
+# =====================================
+def archive_delivery_route(delivery_id, tolerance_m=None):
+    """
+    Pack a delivery's DeliveryLocation rows into its DeliveryRoute and delete the rows.
+    - Rows that arrive after a route was archived (e.g. late buffer flushes) are
+      merged into the existing route on the next call.
+    - tolerance_m defaults to ROUTE_SIMPLIFY_TOLERANCE_M (0 keeps every point).
+    Returns the route, or None if the delivery has no location history.
+    """
+    if tolerance_m is None:
+        tolerance_m = settings.ROUTE_SIMPLIFY_TOLERANCE_M
+
+    with transaction.atomic():
+        rows = list(
+            DeliveryLocation.objects.filter(delivery_id=delivery_id)
+            .order_by("recorded_at", "id")
+            .values_list("id", "latitude", "longitude", "recorded_at")
+        )
+        route = DeliveryRoute.objects.select_for_update().filter(delivery_id=delivery_id).first()
+        if not rows:
+            return route
+
+        trail = [(latitude, longitude, recorded_at) for _, latitude, longitude, recorded_at in rows]
+        raw_point_count = len(rows)
+        if route is not None:
+            trail = sorted(decode_route(route) + trail, key=itemgetter(2))
+            raw_point_count += route.raw_point_count
+
+        kept = downsample(trail, tolerance_m=tolerance_m)
+        started_at = kept[0][2]
+
+        fields = {
+            "polyline": encode_polyline([point[:2] for point in kept]),
+            "timestamps": encode_integers([
+                round((recorded_at - started_at).total_seconds() * 1000)
+                for _, _, recorded_at in kept
+            ]),
+            "point_count": len(kept),
+            "raw_point_count": raw_point_count,
+            "started_at": started_at,
+            "ended_at": kept[-1][2],
+        }
+        route, _ = DeliveryRoute.objects.update_or_create(delivery_id=delivery_id, defaults=fields)
+
+        # Ids only grow, so rows inserted after the read above are left for the next run
+        DeliveryLocation.objects.filter(
+            delivery_id=delivery_id,
+            id__lte=max(row[0] for row in rows)
+        ).delete()
+
+    return route
+
+
+def archive_on_delivery(delivery_id):
+    """
+    mark_delivered hook: archive the route once the DELIVERED status is committed.
+    Failures are logged, not raised — the archive_routes command retries later.
+    """
+    if not settings.ROUTE_ARCHIVE_ON_DELIVERY:
+        return
+
+    def archive():
+        try:
+            # Write this process's buffered pings first so they are archived too
+            get_location_buffer().flush()
+            archive_delivery_route(delivery_id)
+        except Exception:
+            logger.exception("Failed to archive route for delivery %s", delivery_id)
+
+    transaction.on_commit(archive)
+
+
+# =====================================
+# REPLAY
+# =====================================
+def decode_route(route):
+    """Decode a DeliveryRoute into a list of (latitude, longitude, recorded_at)."""
+    offsets = decode_integers(route.timestamps)
+    return [
+        (latitude, longitude, route.started_at + timedelta(milliseconds=offset))
+        for (latitude, longitude), offset in zip(decode_polyline(route.polyline), offsets)
+    ]
+
+
+def route_points(delivery):
+    """
+    The delivery's trail as (latitude, longitude, recorded_at), oldest first.
+    Combines the archived route with any raw rows not archived yet.
+    """
+    try:
+        trail = decode_route(delivery.route)
+    except DeliveryRoute.DoesNotExist:
+        trail = []
+
+    raw = DeliveryLocation.objects.filter(delivery=delivery).values_list(
+        "latitude", "longitude", "recorded_at"
+    )
+    return sorted(trail + list(raw), key=itemgetter(2))
+
+
+def _trail_version(delivery):
+    """
+    Part of the replay cache key that changes whenever a delivered trail does.
+    Archived: the archive time. Not archived yet (ROUTE_ARCHIVE_ON_DELIVERY off,
+    or archiving failed): the newest raw row, in case a late buffered ping lands.
+    """
+    route = getattr(delivery, "route", None)
+    if route is not None:
+        return route.archived_at.timestamp()
+    newest = DeliveryLocation.objects.filter(delivery=delivery).aggregate(newest=Max("id"))["newest"]
+    return f"raw-{newest}"
+
+
+def route_replay(delivery, max_points=ROUTE_DEFAULT_MAX_POINTS, tolerance_m=None):
+    """
+    The route endpoint payload: the trail downsampled to max_points (and tolerance_m),
+    as points plus an encoded polyline.
+    Trails of DELIVERED deliveries no longer change, so their payload is cached
+    per delivery and downsampling parameters, whether or not the route was archived.
+    """
+    key = None
+    if delivery.status == "DELIVERED":
+        key = f"delivery_route:{delivery.id}:{_trail_version(delivery)}:{max_points}:{tolerance_m}"
+        payload = cache.get(key)
+        if payload is not None:
+            return payload
+
+    trail = route_points(delivery)
+    points = downsample(trail, max_points=max_points, tolerance_m=tolerance_m)
+
+    payload = {
+        "delivery": delivery.id,
+        "archived": hasattr(delivery, "route"),
+        "total_points": len(trail),
+        "point_count": len(points),
+        "polyline": encode_polyline([point[:2] for point in points]),
+        "points": [
+            {"latitude": latitude, "longitude": longitude, "recorded_at": recorded_at}
+            for latitude, longitude, recorded_at in points
+        ],
+    }
+    if key is not None:
+        cache.set(key, payload, ROUTE_CACHE_SECONDS)
+    return payload
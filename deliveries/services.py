@@ -1,7 +1,18 @@
+import heapq
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
 from .models import Biker, DeliveryAssignment, Delivery
-from .utils import calculate_distance
+from .distance import bounding_box, haversine_expression, haversine_many
+from .spatial import get_biker_index, MAX_RADIUS_KM
+from .live_locations import get_live_location_store
+from .presence import only_present
+from .stats import invalidate_delivery_stats
+from .notifications import send_to_groups, get_notified_bikers, forget_notified_bikers
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 
 # Maximum distance in kilometers to search for nearby bikers
 SEARCH_RADIUS_KM = 5
@@ -9,83 +20,247 @@ SEARCH_RADIUS_KM = 5
 # Minimum number of bikers to notify even if fewer are within radius
 MIN_BIKERS_TO_NOTIFY = 3
 
-def find_nearby_bikers(delivery):
+def find_nearby_bikers(delivery, limit=None):
     """
     Finds available bikers to notify about a new delivery.
     Strategy:
     - First finds all bikers within SEARCH_RADIUS_KM of the pickup location.
-    - If fewer than MIN_BIKERS_TO_NOTIFY are found, expands to the closest bikers
-      regardless of distance so at least MIN_BIKERS_TO_NOTIFY bikers are always notified.
-    - Only considers bikers with status AVAILABLE and a known location.
+    - If fewer than MIN_BIKERS_TO_NOTIFY are found, widens the search ring by ring
+      until at least MIN_BIKERS_TO_NOTIFY of the closest bikers are found.
+    - Only considers bikers with status AVAILABLE and a known location; positions
+      come from the live location store, which every location ping updates.
+    - With BIKER_PRESENCE_REQUIRED, only bikers whose app is connected (see
+      deliveries.presence) are considered, so offline bikers are not notified.
+    - Candidates come from the in-memory grid index when BIKER_SPATIAL_INDEX is on,
+      otherwise from a bounding-box query so the database only returns nearby rows.
+    - If limit is given, only the closest `limit` bikers are returned.
     - Returns a list of biker objects sorted by distance (closest first).
     """
-    # Only consider bikers who are available and have a recorded location
-    bikers = Biker.objects.filter(
+    if delivery.pickup_latitude is None or delivery.pickup_longitude is None:
+        return []
+
+    if settings.BIKER_SPATIAL_INDEX:
+        ranked = _rank_from_index(delivery.pickup_latitude, delivery.pickup_longitude, limit)
+
+        # Load only the candidate bikers, re-checking status in case the index is behind
+        ranked_ids = [biker_id for distance, biker_id in ranked]
+        bikers = Biker.objects.in_bulk(ranked_ids)
+        return [
+            bikers[biker_id] for biker_id in ranked_ids
+            if biker_id in bikers and bikers[biker_id].status == "AVAILABLE"
+        ]
+
+    ranked = _rank_from_database(delivery.pickup_latitude, delivery.pickup_longitude, limit)
+    return [biker for distance, biker in ranked]
+
+
+def _closest(candidates, limit):
+    """
+    Sort (distance, item) pairs closest first.
+    With a limit, a bounded heap picks the top `limit` without sorting everything.
+    """
+    if limit is not None:
+        return heapq.nsmallest(limit, candidates, key=itemgetter(0))
+    return sorted(candidates, key=itemgetter(0))
+
+
+def _rank_from_index(latitude, longitude, limit):
+    """Rank available bikers using the in-memory grid index. Returns (distance, biker_id) pairs."""
+    index = get_biker_index()
+    _refresh_biker_index(index)
+
+    candidates = only_present(index.within(latitude, longitude, SEARCH_RADIUS_KM))
+
+    if len(candidates) < MIN_BIKERS_TO_NOTIFY:
+        # Not enough bikers within radius — widen the search to the closest available
+        return index.nearest(
+            latitude,
+            longitude,
+            MIN_BIKERS_TO_NOTIFY,
+            start_radius_km=SEARCH_RADIUS_KM,
+            accept=only_present
+        )
+
+    return _closest(candidates, limit)
+
+
+def _rank_from_database(latitude, longitude, limit):
+    """
+    Rank available bikers straight from the database. Returns (distance, biker) pairs.
+    - Each query is limited to the bounding box of the current search ring.
+    - The ring doubles until MIN_BIKERS_TO_NOTIFY bikers are found or it covers the globe.
+    """
+    radius_km = SEARCH_RADIUS_KM
+    candidates = _available_bikers_within(latitude, longitude, radius_km)
+
+    if len(candidates) >= MIN_BIKERS_TO_NOTIFY:
+        return _closest(candidates, limit)
+
+    # Not enough bikers within radius — widen the ring instead of scanning the whole table
+    while len(candidates) < MIN_BIKERS_TO_NOTIFY and radius_km < MAX_RADIUS_KM:
+        radius_km = min(radius_km * 2, MAX_RADIUS_KM)
+        candidates = _available_bikers_within(latitude, longitude, radius_km)
+
+    return _closest(candidates, MIN_BIKERS_TO_NOTIFY)
+
+
+def _available_bikers_within(latitude, longitude, radius_km):
+    """
+    Returns (distance, biker) pairs for AVAILABLE bikers within radius_km.
+    The bounding box is pushed into SQL (backed by the status/location index),
+    then exact distances are computed in one vectorized call.
+    Distances use each biker's live position when the live store has one, since
+    the Biker row is only refreshed on the next write-back.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+
+    bikers = list(Biker.objects.filter(
         status="AVAILABLE",
-        current_latitude__isnull=False,
-        current_longitude__isnull=False
-    )
+        current_latitude__range=(min_lat, max_lat),
+        current_longitude__range=(min_lon, max_lon)
+    ))
+    if not bikers:
+        return []
 
-    # Calculate distance for every available biker
-    bikers_with_distance = []
+    live = get_live_location_store().get_many([biker.id for biker in bikers])
     for biker in bikers:
-        distance = calculate_distance(
-            delivery.pickup_latitude,
-            delivery.pickup_longitude,
-            biker.current_latitude,
-            biker.current_longitude
+        if biker.id in live:
+            biker.current_latitude, biker.current_longitude = live[biker.id]
+
+    distances = haversine_many(
+        latitude,
+        longitude,
+        [biker.current_latitude for biker in bikers],
+        [biker.current_longitude for biker in bikers]
+    )
+    return only_present(
+        [
+            (float(distance), biker)
+            for distance, biker in zip(distances, bikers)
+            if distance <= radius_km
+        ],
+        biker_id=lambda pair: pair[1].id
+    )
+
+
+def _refresh_biker_index(index):
+    """
+    Rebuild the biker index from the database when it is missing or too old.
+    Positions come from the live store where available, falling back to the Biker row.
+    Signals and location pings keep it current between rebuilds for changes made in this process.
+    """
+    if not index.is_stale():
+        return
+
+    rows = list(
+        Biker.objects.filter(status="AVAILABLE")
+        .values_list("id", "current_latitude", "current_longitude")
+    )
+    live = get_live_location_store().get_many([biker_id for biker_id, _, _ in rows])
+
+    positions = []
+    for biker_id, latitude, longitude in rows:
+        latitude, longitude = live.get(biker_id, (latitude, longitude))
+        if latitude is not None and longitude is not None:
+            positions.append((biker_id, latitude, longitude))
+
+    index.rebuild(positions)
+
+
+def biker_delivery_feed(biker, radius_km=None):
+    """
+    Returns the deliveries a biker should see: open (SEARCHING) jobs plus the
+    deliveries assigned to them.
+    - The two id sets come from their own indexed lookups (the partial SEARCHING
+      index and DeliveryAssignment.biker) and are combined with UNION, then
+      deliveries are fetched by primary key. Unlike an OR of the two predicates,
+      this never needs a scan of the whole Delivery table, so the cost follows
+      the number of open and assigned jobs, not the delivery history.
+    - With radius_km, SEARCHING jobs are limited to those whose pickup is within
+      radius_km of the biker's position (live store first, then the Biker row).
+      The bounding box and the exact distance are both checked in SQL, so the
+      feed stays a single query however many jobs are nearby. Jobs without
+      pickup coordinates are always kept, and bikers without a position see every job.
+    - The result is a plain Delivery queryset, so it can still be filtered,
+      aggregated and paginated like any other.
+    """
+    searching_ids = Delivery.objects.filter(status="SEARCHING")
+
+    position = _biker_position(biker) if radius_km is not None else None
+    if position is not None:
+        latitude, longitude = position
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        searching_ids = searching_ids.annotate(
+            pickup_distance_km=haversine_expression("pickup_latitude", "pickup_longitude", latitude, longitude)
+        ).filter(
+            Q(
+                pickup_latitude__range=(min_lat, max_lat),
+                pickup_longitude__range=(min_lon, max_lon),
+                pickup_distance_km__lte=radius_km
+            )
+            | Q(pickup_latitude__isnull=True)
+            | Q(pickup_longitude__isnull=True)
         )
-        bikers_with_distance.append((distance, biker))
 
-    # Sort all bikers by distance — closest first
-    bikers_with_distance.sort(key=lambda x: x[0])
+    assigned_ids = DeliveryAssignment.objects.filter(biker=biker).values("delivery_id")
 
-    # Get bikers within the search radius
-    nearby = [biker for distance, biker in bikers_with_distance
-              if distance <= SEARCH_RADIUS_KM]
+    return Delivery.objects.filter(pk__in=searching_ids.values("id").union(assigned_ids))
 
-    # If we don't have enough bikers within radius, expand to closest available
-    if len(nearby) < MIN_BIKERS_TO_NOTIFY:
-        nearby = [biker for distance, biker in bikers_with_distance[:MIN_BIKERS_TO_NOTIFY]]
 
-    return nearby
+def _biker_position(biker):
+    """
+    The biker's latest (latitude, longitude): from the live location store when
+    it has one, else from the Biker row. Returns None if the position is unknown.
+    """
+    live = get_live_location_store().get_many([biker.id])
+    if biker.id in live:
+        return live[biker.id]
+    if biker.current_latitude is None or biker.current_longitude is None:
+        return None
+    return biker.current_latitude, biker.current_longitude
 
 
 def accept_delivery(delivery_id, biker):
     """
     Allows a biker to accept a delivery.
-    - Checks that the delivery exists and is still in SEARCHING status.
-    - Ensures no other biker has already been assigned (prevents race conditions).
-    - Creates a DeliveryAssignment and marks it as accepted.
-    - Updates the delivery status to ASSIGNED.
-    - Updates the biker's status to ON_DELIVERY.
+    - Claims the delivery with a single conditional UPDATE (SEARCHING → ASSIGNED);
+      the row count decides the winner, so losers fail fast in one query.
+    - In the same transaction, creates the accepted DeliveryAssignment and
+      updates the biker's status to ON_DELIVERY.
     - Notifies all other nearby bikers that the delivery has been taken.
     - Returns the assignment if successful, or None if already taken.
     """
     try:
-        delivery = Delivery.objects.get(id=delivery_id, status="SEARCHING")
-    except Delivery.DoesNotExist:
-        # Delivery not found or already assigned/completed
-        return None
+        with transaction.atomic():
+            # Only one concurrent UPDATE can move the delivery out of SEARCHING
+            claimed = Delivery.objects.filter(
+                id=delivery_id,
+                status="SEARCHING"
+            ).update(status="ASSIGNED")
 
-    # Check if an assignment already exists — another biker got there first
-    if DeliveryAssignment.objects.filter(delivery=delivery).exists():
-        return None
+            if not claimed:
+                # Delivery not found or already assigned/completed
+                return None
 
-    # Create the assignment and mark it as accepted
-    assignment = DeliveryAssignment.objects.create(
-        delivery=delivery,
-        biker=biker,
-        accepted=True
-    )
+            # Create the assignment and mark it as accepted
+            assignment = DeliveryAssignment.objects.create(
+                delivery_id=delivery_id,
+                biker=biker,
+                accepted=True
+            )
+
+            # Mark the accepting biker as busy
+            biker.status = "ON_DELIVERY"
+            biker.save(update_fields=["status"])
+    except IntegrityError:
+        # A stale assignment already exists for this delivery — the claim is rolled back
+        return None
 
-    # Update delivery status to ASSIGNED
-    delivery.status = "ASSIGNED"
-    delivery.save()
+    # The conditional UPDATE skips signals, so drop cached stats explicitly
+    invalidate_delivery_stats()
 
-    # Mark the accepting biker as busy
-    biker.status = "ON_DELIVERY"
-    biker.save()
+    delivery = Delivery.objects.get(id=delivery_id)
+    assignment.delivery = delivery
 
     # Notify all other nearby bikers that this delivery has been taken
     # so they can remove it from their available jobs list
@@ -96,26 +271,35 @@ def accept_delivery(delivery_id, biker):
 
 def _notify_delivery_taken(delivery, accepted_by_biker):
     """
-    After a biker accepts a delivery, notify all other nearby bikers
+    After a biker accepts a delivery, notify all other bikers
     that the delivery is no longer available.
-    - Finds all bikers near the pickup location.
+    - Uses the bikers recorded when the delivery_request was sent, so exactly the
+      bikers who saw the request are told, without another proximity search.
+    - Falls back to finding bikers near the pickup location if nothing is recorded.
     - Skips the biker who accepted it.
-    - Sends a 'delivery_taken' message to all others via WebSocket.
-    """
-    nearby_bikers = find_nearby_bikers(delivery)
-    channel_layer = get_channel_layer()
-
-    for biker in nearby_bikers:
-        # Don't notify the biker who just accepted it
-        if biker.id == accepted_by_biker.id:
-            continue
-
-        # Send delivery_taken message so their UI can remove it
-        async_to_sync(channel_layer.group_send)(
-            f"biker_{biker.id}",
-            {
-                "type": "delivery_taken",
-                "delivery_id": delivery.id,
-                "message": "This delivery has been accepted by another biker"
-            }
-        )
\ No newline at end of file
+    - Sends a 'delivery_taken' message to all others via WebSocket in one batch.
+    """
+    biker_ids = get_notified_bikers(delivery.id)
+    if biker_ids is None:
+        biker_ids = [biker.id for biker in find_nearby_bikers(delivery)]
+
+    # Send delivery_taken to everyone except the biker who just accepted it,
+    # as one batch so their UI can remove it
+    send_to_groups(
+        [
+            (
+                f"biker_{biker_id}",
+                {
+                    "type": "delivery_taken",
+                    "delivery_id": delivery.id,
+                    "message": "This delivery has been accepted by another biker"
+                }
+            )
+            for biker_id in biker_ids
+            if biker_id != accepted_by_biker.id
+        ],
+        channel_layer=get_channel_layer()
+    )
+
+    # The delivery is taken — nobody else needs to be told about it again
+    forget_notified_bikers(delivery.id)
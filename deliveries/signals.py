@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_migrate
+from django.dispatch import receiver
+
+from .live_locations import get_live_location_store
+from .middleware import user_cache
+from .models import Biker, Delivery
+from .partitions import check_migration_plan
+from .spatial import get_biker_index
+from .stats import invalidate_delivery_stats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Biker)
+def sync_biker_index(sender, instance, **kwargs):
+    """
+    Keep the in-memory biker index in step with status and location changes.
+    A live position from location pings is newer than the row's columns, so it wins.
+    """
+    live_position = get_live_location_store().get_many([instance.id]).get(instance.id)
+    get_biker_index().sync_biker(instance, position=live_position)
+
+
+@receiver(post_delete, sender=Biker)
+def remove_biker_from_index(sender, instance, **kwargs):
+    """Drop deleted bikers from the in-memory biker index."""
+    get_biker_index().remove(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the WebSocket auth cache entry so deactivations and role changes apply at once."""
+    user_cache.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Biker)
+@receiver(post_delete, sender=Biker)
+def invalidate_cached_biker_user(sender, instance, created=False, **kwargs):
+    """
+    A new or deleted biker profile changes the user's WebSocket role, which is
+    cached with the user. Status and location saves leave the cache alone.
+    """
+    if created or kwargs["signal"] is post_delete:
+        user_cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Delivery)
+@receiver(post_delete, sender=Delivery)
+def invalidate_stats_on_delivery_change(sender, instance, **kwargs):
+    """Status transitions change dashboard counts — drop cached stats snapshots."""
+    invalidate_delivery_stats()
+
+
+@receiver(pre_migrate)
+def guard_partitioned_location_table(sender, plan=None, **kwargs):
+    """Stop migrations that would alter the location table after it was partitioned."""
+    if sender.label == "deliveries":
+        check_migration_plan(plan)
@@ -0,0 +1,198 @@
+import heapq
+import math
+import threading
+import time
+
+from .distance import bounding_box, haversine_many
+
+# Size of one grid cell in degrees (~5.5 km of latitude)
+CELL_SIZE_DEG = 0.05
+
+# Rebuild the index from the database after this many seconds, so changes made
+# by other processes (or by queryset.update(), which skips signals) are picked up
+INDEX_MAX_AGE_SECONDS = 60
+
+# Half the Earth's circumference — any radius beyond this covers the whole globe
+MAX_RADIUS_KM = 20038
+
+
+# -------------------------
+# BIKER GRID INDEX
+# -------------------------
+class BikerGridIndex:
+    """
+    In-memory grid index of AVAILABLE bikers with a known location.
+    - The world is split into square cells of cell_size degrees.
+    - Each cell holds the ids of the bikers currently inside it, so a radius
+      query only has to look at the cells overlapping the search area.
+    - Kept in sync with Biker saves/deletes by deliveries.signals, and rebuilt
+      from the database once it is older than max_age seconds.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE_DEG, max_age=INDEX_MAX_AGE_SECONDS):
+        self.cell_size = cell_size
+        self.max_age = max_age
+        self._cells = {}        # (row, col) -> set of biker ids
+        self._positions = {}    # biker id -> (latitude, longitude, cell)
+        self._built_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, biker_id):
+        return biker_id in self._positions
+
+    def _cell_for(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    # =====================================
+    # MAINTENANCE
+    # =====================================
+
+    def update(self, biker_id, latitude, longitude):
+        """Insert or move a biker to the given position."""
+        cell = self._cell_for(latitude, longitude)
+        with self._lock:
+            previous = self._positions.get(biker_id)
+            if previous and previous[2] != cell:
+                self._discard_from_cell(biker_id, previous[2])
+            self._cells.setdefault(cell, set()).add(biker_id)
+            self._positions[biker_id] = (latitude, longitude, cell)
+
+    def remove(self, biker_id):
+        """Remove a biker from the index. No-op if the biker is not indexed."""
+        with self._lock:
+            previous = self._positions.pop(biker_id, None)
+            if previous:
+                self._discard_from_cell(biker_id, previous[2])
+
+    def sync_biker(self, biker, position=None):
+        """
+        Reflect a Biker row in the index:
+        - AVAILABLE bikers with a location are inserted or moved.
+        - Everyone else is removed.
+        position, if given, is a (latitude, longitude) that overrides the row's columns.
+        """
+        latitude, longitude = position or (biker.current_latitude, biker.current_longitude)
+        if biker.status == "AVAILABLE" and latitude is not None and longitude is not None:
+            self.update(biker.id, latitude, longitude)
+        else:
+            self.remove(biker.id)
+
+    def rebuild(self, rows):
+        """
+        Replace the whole index with the given (biker_id, latitude, longitude) rows
+        and reset its age.
+        """
+        cells = {}
+        positions = {}
+        for biker_id, latitude, longitude in rows:
+            cell = self._cell_for(latitude, longitude)
+            cells.setdefault(cell, set()).add(biker_id)
+            positions[biker_id] = (latitude, longitude, cell)
+
+        with self._lock:
+            self._cells = cells
+            self._positions = positions
+            self._built_at = time.monotonic()
+
+    def clear(self):
+        """Empty the index and mark it as needing a rebuild."""
+        with self._lock:
+            self._cells = {}
+            self._positions = {}
+            self._built_at = None
+
+    def is_stale(self):
+        """True if the index was never built or is older than max_age."""
+        if self._built_at is None:
+            return True
+        return time.monotonic() - self._built_at > self.max_age
+
+    def _discard_from_cell(self, biker_id, cell):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(biker_id)
+            if not members:
+                del self._cells[cell]
+
+    # =====================================
+    # QUERIES
+    # =====================================
+
+    def within(self, latitude, longitude, radius_km):
+        """
+        Returns a list of (distance_km, biker_id) for every indexed biker within
+        radius_km of the given point. The list is not sorted.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        min_row, min_col = self._cell_for(min_lat, min_lon)
+        max_row, max_col = self._cell_for(max_lat, max_lon)
+
+        biker_ids, lats, lons = [], [], []
+        with self._lock:
+            cell_count = (max_row - min_row + 1) * (max_col - min_col + 1)
+
+            if cell_count <= len(self._cells):
+                # Small search area — visit only the overlapping cells
+                cells = (
+                    self._cells.get((row, col), ())
+                    for row in range(min_row, max_row + 1)
+                    for col in range(min_col, max_col + 1)
+                )
+            else:
+                # Search area covers more cells than are occupied — walk the occupied ones
+                cells = (
+                    members for (row, col), members in self._cells.items()
+                    if min_row <= row <= max_row and min_col <= col <= max_col
+                )
+
+            for members in cells:
+                for biker_id in members:
+                    biker_lat, biker_lon, _ = self._positions[biker_id]
+                    biker_ids.append(biker_id)
+                    lats.append(biker_lat)
+                    lons.append(biker_lon)
+
+        if not biker_ids:
+            return []
+
+        # One vectorized distance computation for every candidate
+        distances = haversine_many(latitude, longitude, lats, lons)
+        return [
+            (float(distance), biker_id)
+            for distance, biker_id in zip(distances, biker_ids)
+            if distance <= radius_km
+        ]
+
+    def nearest(self, latitude, longitude, k, start_radius_km, accept=None):
+        """
+        Returns the k closest indexed bikers as a sorted list of (distance_km, biker_id).
+        - Searches rings of doubling radius starting at start_radius_km, so only
+          nearby cells are visited when bikers are dense.
+        - Anything within the final radius is guaranteed to include the true k nearest.
+        - accept, if given, filters each ring's (distance_km, biker_id) pairs
+          (e.g. to present bikers) before counting them.
+        """
+        radius_km = start_radius_km
+        while True:
+            found = self.within(latitude, longitude, radius_km)
+            covered_everyone = len(found) >= len(self)
+            if accept is not None:
+                found = accept(found)
+            if len(found) >= k or covered_everyone or radius_km >= MAX_RADIUS_KM:
+                return heapq.nsmallest(k, found)
+            radius_km *= 2
+
+
+# Process-wide index shared by services and signal handlers
+biker_index = BikerGridIndex()
+
+
+def get_biker_index():
+    """Return the process-wide biker index."""
+    return biker_index
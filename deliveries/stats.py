@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Delivery
+
+# Bumped on every delivery status change; part of every cached stats key
+STATS_VERSION_KEY = "delivery_stats:version"
+
+
+def delivery_stats(queryset):
+    """
+    Returns delivery counts for the queryset in a single conditional-aggregation query:
+    'total' plus one key per status in Delivery.STATUS_CHOICES (e.g. 'in_transit').
+    """
+    aggregates = {"total": Count("id")}
+    for status, _ in Delivery.STATUS_CHOICES:
+        aggregates[status.lower()] = Count("id", filter=Q(status=status))
+
+    return queryset.aggregate(**aggregates)
+
+
+def cached_delivery_stats(user, queryset):
+    """
+    Returns delivery_stats(queryset), reusing a per-user snapshot for
+    DELIVERY_STATS_CACHE_SECONDS (0 disables caching).
+    Snapshots are keyed by a global version that invalidate_delivery_stats() bumps,
+    because a single status change can move counts for the client, the assigned
+    biker and every biker who sees SEARCHING deliveries.
+    """
+    timeout = settings.DELIVERY_STATS_CACHE_SECONDS
+    if not timeout:
+        return delivery_stats(queryset)
+
+    version = cache.get_or_set(STATS_VERSION_KEY, 1, timeout=None)
+    key = f"delivery_stats:{version}:{user.id}"
+
+    stats = cache.get(key)
+    if stats is None:
+        stats = delivery_stats(queryset)
+        cache.set(key, stats, timeout)
+    return stats
+
+
+def invalidate_delivery_stats():
+    """Invalidate every cached stats snapshot. Called on delivery status transitions."""
+    try:
+        cache.incr(STATS_VERSION_KEY)
+    except ValueError:
+        # No version stored yet (or it expired) — nothing cached under it
+        cache.set(STATS_VERSION_KEY, 1, timeout=None)
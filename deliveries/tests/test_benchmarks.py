@@ -0,0 +1,211 @@
+"""
+Benchmarks for the delivery matching hot path.
+Deselected by default; run with `make bench` (see DEVELOPMENT.md), which
+compares against the stored baseline and fails on a regression.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from deliveries import notifications
+from deliveries.distance import KM_PER_DEGREE
+from deliveries.models import Biker, Delivery, DeliveryAssignment
+from deliveries.services import accept_delivery, find_nearby_bikers
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+User = get_user_model()
+
+# City centers bikers are clustered around, with the share of the fleet in each
+CITIES = [
+    ((-26.2041, 28.0473), 0.6),   # Johannesburg
+    ((-25.7479, 28.2293), 0.25),  # Pretoria
+    ((-29.8587, 31.0218), 0.15),  # Durban
+]
+
+# Standard deviation of biker positions around their city center, in km
+CITY_SPREAD_KM = 8
+
+# Share of the fleet busy on a delivery (excluded from matching)
+ON_DELIVERY_SHARE = 0.1
+
+# Fleet sizes benchmarked
+FLEET_SIZES = [1_000, 10_000, 100_000]
+
+# Bikers racing to accept the same delivery
+CONTENDERS = 8
+
+# Pickup used by every benchmark: central Johannesburg, the densest cluster
+PICKUP = (-26.2041, 28.0473)
+
+
+def seed_bikers(count, seed=0):
+    """Bulk-create `count` bikers clustered around CITIES, reproducibly."""
+    rng = np.random.default_rng(seed)
+
+    User.objects.bulk_create(
+        [User(email=f"bench-biker{i}@example.com", role="BIKER") for i in range(count)],
+        batch_size=5000
+    )
+    user_ids = list(
+        User.objects.filter(email__startswith="bench-biker").order_by("id").values_list("id", flat=True)
+    )
+
+    centers = np.array([center for center, _ in CITIES])
+    city = rng.choice(len(CITIES), size=count, p=[share for _, share in CITIES])
+    north_km, east_km = rng.normal(0, CITY_SPREAD_KM, size=(2, count))
+    latitudes = centers[city, 0] + north_km / KM_PER_DEGREE
+    longitudes = centers[city, 1] + east_km / (KM_PER_DEGREE * np.cos(np.radians(centers[city, 0])))
+    busy = rng.random(count) < ON_DELIVERY_SHARE
+
+    Biker.objects.bulk_create(
+        [
+            Biker(
+                user_id=user_id,
+                status="ON_DELIVERY" if busy[i] else "AVAILABLE",
+                current_latitude=float(latitudes[i]),
+                current_longitude=float(longitudes[i]),
+            )
+            for i, user_id in enumerate(user_ids)
+        ],
+        batch_size=5000
+    )
+
+
+def make_delivery(client, status="SEARCHING"):
+    return Delivery.objects.create(
+        client=client,
+        pickup_address="Benchmark pickup",
+        dropoff_address="Benchmark dropoff",
+        package_description="Benchmark",
+        pickup_latitude=PICKUP[0],
+        pickup_longitude=PICKUP[1],
+        status=status,
+    )
+
+
+@pytest.fixture
+def in_memory_channel_layer(settings):
+    """Send fan-out through a real (in-process) channel layer instead of Redis."""
+    settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@pytest.mark.django_db
+class TestFindNearbyBikersBenchmark:
+    """Proximity search over a clustered fleet."""
+
+    @pytest.fixture(autouse=True, params=[True, False], ids=["grid_index", "database"])
+    def search_backend(self, request, settings):
+        settings.BIKER_SPATIAL_INDEX = request.param
+
+    @pytest.mark.parametrize("fleet_size", FLEET_SIZES, ids=["1k", "10k", "100k"])
+    def test_find_nearby_bikers(self, benchmark, client_user, fleet_size):
+        seed_bikers(fleet_size)
+        delivery = make_delivery(client_user)
+
+        # Build the grid index outside the measurement; it is rebuilt only when stale
+        find_nearby_bikers(delivery)
+
+        nearby = benchmark(find_nearby_bikers, delivery)
+
+        assert nearby
+        assert all(biker.status == "AVAILABLE" for biker in nearby)
+
+
+@pytest.mark.django_db
+class TestPerformCreateBenchmark:
+    """POST /api/deliveries/ end-to-end: save, match and fan out delivery_request."""
+
+    @pytest.mark.parametrize("fleet_size", FLEET_SIZES, ids=["1k", "10k", "100k"])
+    def test_create_delivery(
+        self, benchmark, monkeypatch, in_memory_channel_layer,
+        django_capture_on_commit_callbacks, client_api_client, fleet_size
+    ):
+        api_client, _ = client_api_client
+        seed_bikers(fleet_size)
+
+        # One fan-out worker, so waiting on a no-op waits for the batch queued before it
+        fanout = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(notifications, "_executor", fanout)
+
+        payload = {
+            "pickup_address": "Benchmark pickup",
+            "dropoff_address": "Benchmark dropoff",
+            "package_description": "Benchmark",
+            "pickup_latitude": PICKUP[0],
+            "pickup_longitude": PICKUP[1],
+        }
+
+        def create():
+            with django_capture_on_commit_callbacks(execute=True):
+                response = api_client.post("/api/deliveries/", payload, format="json")
+            fanout.submit(lambda: None).result()
+            return response
+
+        response = benchmark(create)
+        fanout.shutdown()
+
+        assert response.status_code == 201
+        assert notifications.get_notified_bikers(response.data["id"])
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAcceptDeliveryBenchmark:
+    """Bikers racing to accept the same delivery."""
+
+    @pytest.fixture
+    def contenders(self):
+        users = [
+            User.objects.create_user(email=f"bench-racer{i}@example.com", password=None, role="BIKER")
+            for i in range(CONTENDERS)
+        ]
+        return [
+            Biker.objects.create(user=user, current_latitude=PICKUP[0], current_longitude=PICKUP[1])
+            for user in users
+        ]
+
+    def test_accept_delivery_under_contention(self, benchmark, in_memory_channel_layer, client_user, contenders):
+        def setup():
+            Biker.objects.filter(id__in=[biker.id for biker in contenders]).update(status="AVAILABLE")
+            for biker in contenders:
+                biker.status = "AVAILABLE"
+            delivery = make_delivery(client_user)
+            notifications.record_notified_bikers(delivery.id, [biker.id for biker in contenders])
+            return (delivery.id,), {}
+
+        races = []
+
+        def race(delivery_id):
+            start = threading.Barrier(CONTENDERS)
+            results = [None] * CONTENDERS
+
+            def attempt(index):
+                try:
+                    start.wait()
+                    results[index] = accept_delivery(delivery_id, contenders[index])
+                finally:
+                    connection.close()
+
+            threads = [threading.Thread(target=attempt, args=(i,)) for i in range(CONTENDERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            races.append((delivery_id, results))
+            return results
+
+        benchmark.pedantic(race, setup=setup, rounds=20)
+
+        # --benchmark-disable runs a single round, so check every race that actually ran
+        assert races
+        for delivery_id, results in races:
+            winners = [result for result in results if result is not None]
+            assert len(winners) == 1
+            assert results.count(None) == CONTENDERS - 1
+            assert DeliveryAssignment.objects.filter(delivery_id=delivery_id).count() == 1
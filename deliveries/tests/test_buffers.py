@@ -0,0 +1,111 @@
+"""
+Tests for the deliveries buffers module.
+Tests the LocationWriteBuffer used by TrackingConsumer for location pings.
+"""
+import pytest
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from deliveries.buffers import LocationWriteBuffer
+from deliveries.models import DeliveryLocation
+
+
+@pytest.mark.django_db
+class TestLocationWriteBuffer:
+    """Tests for the LocationWriteBuffer class."""
+
+    def test_add_does_not_touch_database(self, delivery_with_assignment, biker):
+        """Queued pings are held in memory until flushed."""
+        buffer = LocationWriteBuffer(max_size=10, flush_interval=60)
+
+        with CaptureQueriesContext(connection) as queries:
+            due = buffer.add(delivery_with_assignment.id, biker.id, -26.2041, 28.0473)
+
+        assert due is False
+        assert len(buffer) == 1
+        assert len(queries) == 0
+
+    def test_flush_writes_all_rows_in_one_insert(self, delivery_with_assignment, biker):
+        """flush() writes every pending ping with a single INSERT and empties the buffer."""
+        buffer = LocationWriteBuffer(max_size=10, flush_interval=60)
+        for i in range(5):
+            buffer.add(delivery_with_assignment.id, biker.id, -26.2041 + i * 0.001, 28.0473)
+
+        with CaptureQueriesContext(connection) as queries:
+            written = buffer.flush()
+
+        assert written == 5
+        assert len(buffer) == 0
+        assert len([q for q in queries if q["sql"].startswith("INSERT")]) == 1
+        assert DeliveryLocation.objects.filter(delivery=delivery_with_assignment).count() == 5
+
+    def test_rows_keep_ping_time(self, delivery_with_assignment, biker):
+        """recorded_at is the time of the ping, not the time of the flush."""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        buffer = LocationWriteBuffer(max_size=10, flush_interval=60)
+        ping_time = timezone.now() - timedelta(seconds=30)
+        with patch('deliveries.buffers.timezone.now', return_value=ping_time):
+            buffer.add(delivery_with_assignment.id, biker.id, -26.2041, 28.0473)
+
+        buffer.flush()
+
+        assert DeliveryLocation.objects.get().recorded_at == ping_time
+
+    def test_due_when_full(self, delivery_with_assignment, biker):
+        """The buffer asks for a flush once it holds max_size rows."""
+        buffer = LocationWriteBuffer(max_size=3, flush_interval=60)
+
+        results = [buffer.add(delivery_with_assignment.id, biker.id, -26.2, 28.0) for _ in range(3)]
+
+        assert results == [False, False, True]
+
+    def test_due_when_oldest_row_is_old_enough(self, delivery_with_assignment, biker):
+        """The buffer asks for a flush once its oldest row has waited flush_interval seconds."""
+        buffer = LocationWriteBuffer(max_size=100, flush_interval=5)
+
+        with patch('deliveries.buffers.time.monotonic', return_value=100.0):
+            buffer.add(delivery_with_assignment.id, biker.id, -26.2, 28.0)
+        with patch('deliveries.buffers.time.monotonic', return_value=104.0):
+            assert buffer.should_flush() is False
+        with patch('deliveries.buffers.time.monotonic', return_value=105.0):
+            assert buffer.should_flush() is True
+
+    def test_failed_flush_drops_batch(self, biker):
+        """Rows that cannot be written are dropped instead of growing the buffer."""
+        buffer = LocationWriteBuffer(max_size=10, flush_interval=60)
+        buffer.add(99999, biker.id, -26.2, 28.0)
+
+        with patch.object(DeliveryLocation.objects, 'bulk_create', side_effect=RuntimeError("db down")):
+            assert buffer.flush() == 0
+
+        assert len(buffer) == 0
+
+    def test_bad_row_does_not_drop_the_batch(self, delivery_with_assignment, biker):
+        """A row the database rejects is dropped on its own; the rest of the batch is written."""
+        buffer = LocationWriteBuffer(max_size=10, flush_interval=60)
+        buffer.add(delivery_with_assignment.id, biker.id, -26.2, 28.0)
+        buffer.add(delivery_with_assignment.id, biker.id, None, 28.0)   # NOT NULL violation
+        buffer.add(delivery_with_assignment.id, biker.id, -26.3, 28.1)
+
+        assert buffer.flush() == 2
+
+        assert len(buffer) == 0
+        assert sorted(DeliveryLocation.objects.values_list("latitude", flat=True)) == [-26.3, -26.2]
+
+    def test_start_flusher_registers_exit_flush_once(self):
+        """Rows still buffered when the worker exits are flushed by an atexit hook."""
+        from asgiref.sync import async_to_sync
+
+        buffer = LocationWriteBuffer(max_size=10, flush_interval=60)
+
+        async def start_twice():
+            buffer.start_flusher()
+            buffer.start_flusher()
+            buffer._flusher.cancel()
+
+        with patch('deliveries.buffers.atexit.register') as register:
+            async_to_sync(start_twice)()
+
+        register.assert_called_once_with(buffer.flush)
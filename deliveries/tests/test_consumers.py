@@ -0,0 +1,205 @@
+"""
+Tests for the deliveries WebSocket consumers.
+Tests the TrackingConsumer handshake and the helpers that run after it.
+"""
+import pytest
+from asgiref.sync import async_to_sync
+from deliveries.consumers import TrackingConsumer
+from deliveries.models import Delivery, DeliveryLog
+
+
+def _tracking_consumer(delivery, biker):
+    """Build a TrackingConsumer in the state connect() leaves it in for the assigned biker."""
+    consumer = TrackingConsumer()
+    consumer.delivery = delivery
+    consumer.biker = biker
+    consumer.role = "biker"
+    consumer.delivery_started = delivery.status != "ASSIGNED"
+    return consumer
+
+
+@pytest.mark.django_db
+class TestAutoStartDelivery:
+    """Tests for TrackingConsumer.auto_start_delivery."""
+
+    def test_first_update_starts_delivery(self, delivery_with_assignment, biker):
+        """The ASSIGNED → IN_TRANSIT transition is applied and logged once."""
+        consumer = _tracking_consumer(delivery_with_assignment, biker)
+
+        async_to_sync(consumer.auto_start_delivery)()
+
+        delivery_with_assignment.refresh_from_db()
+        assert delivery_with_assignment.status == "IN_TRANSIT"
+        assert consumer.delivery_started is True
+        assert DeliveryLog.objects.filter(delivery=delivery_with_assignment).count() == 1
+
+    def test_second_consumer_does_not_log_again(self, delivery_with_assignment, biker):
+        """A consumer holding a stale ASSIGNED copy loses the conditional update."""
+        first = _tracking_consumer(delivery_with_assignment, biker)
+        stale = _tracking_consumer(Delivery.objects.get(id=delivery_with_assignment.id), biker)
+
+        async_to_sync(first.auto_start_delivery)()
+        async_to_sync(stale.auto_start_delivery)()
+
+        assert stale.delivery_started is True
+        assert DeliveryLog.objects.filter(delivery=delivery_with_assignment).count() == 1
+
+    def test_already_started_delivery_skips_transition(self, delivery_with_location, biker):
+        """Consumers connecting to an IN_TRANSIT delivery start out as already started."""
+        consumer = _tracking_consumer(delivery_with_location, biker)
+
+        assert consumer.delivery_started is True
+
+
+@pytest.mark.django_db
+class TestPublishLocation:
+    """Tests for TrackingConsumer.publish_location broadcast throttling."""
+
+    def _consumer(self, delivery, biker, min_interval):
+        from unittest.mock import MagicMock, AsyncMock
+        from deliveries.throttling import LocationBroadcastThrottle
+
+        consumer = _tracking_consumer(delivery, biker)
+        consumer.group_name = f"delivery_{delivery.id}"
+        consumer.channel_layer = MagicMock()
+        consumer.channel_layer.group_send = AsyncMock()
+        consumer.location_throttle = LocationBroadcastThrottle(min_interval, min_distance_m=0)
+        consumer.trailing_broadcast = None
+        return consumer
+
+    def test_burst_sends_first_and_last_position(self, delivery_with_location, biker):
+        """A burst of updates is collapsed to the first one plus a trailing broadcast of the last."""
+        consumer = self._consumer(delivery_with_location, biker, min_interval=0.05)
+
+        async def burst():
+            for i in range(5):
+                await consumer.publish_location(-26.2 + i * 0.01, 28.0)
+            await consumer.trailing_broadcast
+
+        async_to_sync(burst)()
+
+        sent = [call.args[1] for call in consumer.channel_layer.group_send.call_args_list]
+        assert [message["latitude"] for message in sent] == [-26.2, -26.2 + 4 * 0.01]
+        assert consumer.trailing_broadcast is None
+
+
+@pytest.mark.django_db
+class TestReceiveLocation:
+    """Tests for TrackingConsumer.receive handling of location pings."""
+
+    def test_ping_updates_live_position(self, delivery_with_location, biker):
+        """Each ping updates the biker's live position, not the Biker row."""
+        import json
+        from unittest.mock import MagicMock, AsyncMock
+        from deliveries.live_locations import get_live_location_store
+        from deliveries.throttling import LocationBroadcastThrottle
+
+        consumer = _tracking_consumer(delivery_with_location, biker)
+        consumer.group_name = f"delivery_{delivery_with_location.id}"
+        consumer.channel_layer = MagicMock()
+        consumer.channel_layer.group_send = AsyncMock()
+        consumer.location_throttle = LocationBroadcastThrottle(0, min_distance_m=0)
+        consumer.trailing_broadcast = None
+
+        async_to_sync(consumer.receive)(json.dumps({
+            "type": "location_update", "latitude": -26.3, "longitude": 28.1
+        }))
+
+        assert get_live_location_store().get_many([biker.id]) == {biker.id: (-26.3, 28.1)}
+        biker.refresh_from_db()
+        assert biker.current_latitude != -26.3
+
+    @pytest.mark.parametrize("payload", [
+        {"latitude": -26.3},
+        {"latitude": "north", "longitude": 28.1},
+        {"latitude": 95, "longitude": 28.1},
+    ])
+    def test_invalid_ping_gets_error_frame(self, delivery_with_location, biker, payload):
+        """Bad coordinates are answered with an error and never reach the buffer or the live store."""
+        import json
+        from unittest.mock import AsyncMock
+        from deliveries.buffers import get_location_buffer
+        from deliveries.live_locations import get_live_location_store
+
+        consumer = _tracking_consumer(delivery_with_location, biker)
+        consumer.send = AsyncMock()
+
+        async_to_sync(consumer.receive)(json.dumps({"type": "location_update", **payload}))
+
+        frame = json.loads(consumer.send.call_args.args[0])
+        assert frame["type"] == "error"
+        assert len(get_location_buffer()) == 0
+        assert get_live_location_store().get_many([biker.id]) == {}
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConnect:
+    """Tests for the TrackingConsumer handshake, through the ASGI app."""
+
+    @pytest.fixture(autouse=True)
+    def in_memory_channel_layer(self, settings):
+        settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+    def _connect(self, delivery_id, user):
+        from channels.testing import WebsocketCommunicator
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from force_backend.asgi import application
+
+        token = RefreshToken.for_user(user).access_token
+
+        async def handshake():
+            communicator = WebsocketCommunicator(application, f"/ws/tracking/{delivery_id}/?token={token}")
+            connected, code = await communicator.connect()
+            message = await communicator.receive_json_from() if connected else None
+            await communicator.disconnect()
+            return connected, code, message
+
+        return async_to_sync(handshake)()
+
+    def test_assigned_biker_connects(self, assigned_delivery, biker_user):
+        user, _ = biker_user
+
+        connected, _, message = self._connect(assigned_delivery.id, user)
+
+        assert connected
+        assert message["role"] == "biker"
+
+    def test_reconnect_is_a_single_query(self, assigned_delivery, biker_user):
+        """With the user cached, the handshake only loads the delivery, assignment and biker."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        user, _ = biker_user
+        self._connect(assigned_delivery.id, user)
+
+        with CaptureQueriesContext(connection) as queries:
+            connected, _, _ = self._connect(assigned_delivery.id, user)
+
+        assert connected
+        selects = [q for q in queries if q["sql"].startswith("SELECT")]
+        assert len(selects) == 1
+
+    def test_other_biker_is_rejected(self, assigned_delivery, multiple_bikers):
+        connected, code, _ = self._connect(assigned_delivery.id, multiple_bikers[0].user)
+
+        assert not connected
+        assert code == 4003
+
+    def test_biker_without_assignment_is_rejected(self, delivery, biker_user):
+        user, _ = biker_user
+
+        connected, code, _ = self._connect(delivery.id, user)
+
+        assert not connected
+        assert code == 4003
+
+    def test_missing_delivery_is_rejected(self, client_user):
+        connected, code, _ = self._connect(99999, client_user)
+
+        assert not connected
+        assert code == 4004
+
+    def test_client_connects_as_watcher(self, assigned_delivery, client_user):
+        connected, _, message = self._connect(assigned_delivery.id, client_user)
+
+        assert connected
+        assert message["role"] == "client"
@@ -0,0 +1,79 @@
+"""
+Tests for the deliveries distance module.
+Tests the scalar and vectorized Haversine helpers and the bounding-box prefilter.
+"""
+import numpy as np
+from deliveries.distance import (
+    haversine,
+    haversine_many,
+    haversine_matrix,
+    bounding_box,
+    in_bounding_box,
+)
+
+# Johannesburg, Pretoria, Cape Town
+JNB = (-26.2041, 28.0473)
+PTA = (-25.7479, 28.2293)
+CPT = (-33.9249, 18.4241)
+
+
+class TestHaversineMany:
+    """Tests for the one-to-many haversine_many function."""
+
+    def test_matches_scalar_haversine(self):
+        """Batch results match the scalar formula point by point."""
+        lats = [JNB[0], PTA[0], CPT[0]]
+        lons = [JNB[1], PTA[1], CPT[1]]
+
+        distances = haversine_many(JNB[0], JNB[1], lats, lons)
+
+        expected = [haversine(JNB[0], JNB[1], lat, lon) for lat, lon in zip(lats, lons)]
+        np.testing.assert_allclose(distances, expected, atol=1e-9)
+        assert distances[0] == 0.0
+
+    def test_empty_input(self):
+        """No points gives an empty array."""
+        assert haversine_many(JNB[0], JNB[1], [], []).shape == (0,)
+
+
+class TestHaversineMatrix:
+    """Tests for the many-to-many haversine_matrix function."""
+
+    def test_shape_and_values(self):
+        """Row i holds the distances from origin i to every destination."""
+        matrix = haversine_matrix([JNB[0], CPT[0]], [JNB[1], CPT[1]], [PTA[0]], [PTA[1]])
+
+        assert matrix.shape == (2, 1)
+        assert abs(matrix[0, 0] - haversine(*JNB, *PTA)) < 1e-9
+        assert abs(matrix[1, 0] - haversine(*CPT, *PTA)) < 1e-9
+
+
+class TestBoundingBox:
+    """Tests for the bounding_box and in_bounding_box helpers."""
+
+    def test_box_contains_radius(self):
+        """Points on the circle edge fall inside the box."""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(*JNB, 5)
+
+        assert min_lat < JNB[0] < max_lat
+        assert min_lon < JNB[1] < max_lon
+        # Roughly 5 km north/south of the centre
+        assert 4.9 < haversine(JNB[0], JNB[1], max_lat, JNB[1]) < 5.1
+
+    def test_box_crossing_antimeridian_covers_all_longitudes(self):
+        """Boxes that cross ±180 widen to the full longitude range."""
+        _, _, min_lon, max_lon = bounding_box(-17.7, 179.99, 10)
+        assert (min_lon, max_lon) == (-180.0, 180.0)
+
+    def test_box_touching_pole_covers_all_longitudes(self):
+        """Boxes that reach a pole widen to the full longitude range."""
+        _, max_lat, min_lon, max_lon = bounding_box(89.99, 10.0, 50)
+        assert max_lat == 90.0
+        assert (min_lon, max_lon) == (-180.0, 180.0)
+
+    def test_in_bounding_box_mask(self):
+        """Only points inside the box are flagged."""
+        box = bounding_box(*JNB, 5)
+        mask = in_bounding_box(box, [JNB[0], PTA[0]], [JNB[1], PTA[1]])
+
+        assert mask.tolist() == [True, False]
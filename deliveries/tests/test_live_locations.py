@@ -0,0 +1,213 @@
+"""
+Tests for the live biker location store, its write-back to Biker rows, and its
+use by find_nearby_bikers.
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from deliveries.live_locations import (
+    MemoryLiveLocationStore,
+    RedisLiveLocationStore,
+    get_live_location_store,
+    record_biker_location,
+)
+from deliveries.models import Biker
+from deliveries.services import find_nearby_bikers
+from deliveries.spatial import get_biker_index
+
+User = get_user_model()
+
+# Cape Town — far outside the search radius of the Johannesburg fixtures
+FAR_AWAY = (-33.9249, 18.4241)
+
+
+def _biker(email, latitude, longitude, status="AVAILABLE"):
+    user = User.objects.create_user(email=email, password="test123", role="biker")
+    return Biker.objects.create(
+        user=user, status=status, current_latitude=latitude, current_longitude=longitude
+    )
+
+
+class TestMemoryLiveLocationStore:
+    """Tests for the in-process store."""
+
+    def test_latest_position_wins(self):
+        store = MemoryLiveLocationStore()
+        store.update(1, -26.2, 28.0)
+        store.update(1, -26.3, 28.1)
+
+        assert store.get_many([1, 2]) == {1: (-26.3, 28.1)}
+
+    def test_drain_pending_empties_it(self):
+        store = MemoryLiveLocationStore()
+        store.update(1, -26.2, 28.0)
+        store.update(2, -26.3, 28.1)
+
+        assert store.drain_pending() == {1: (-26.2, 28.0), 2: (-26.3, 28.1)}
+        assert store.drain_pending() == {}
+        # Positions stay readable after being drained
+        assert store.get_many([1]) == {1: (-26.2, 28.0)}
+
+
+@pytest.mark.django_db
+class TestWriteBack:
+    """Tests for the batched write-back to Biker rows."""
+
+    def test_write_back_updates_biker_rows(self, multiple_bikers, django_assert_max_num_queries):
+        store = get_live_location_store()
+        for biker in multiple_bikers:
+            store.update(biker.id, *FAR_AWAY)
+
+        with django_assert_max_num_queries(2):
+            written = store.write_back()
+
+        assert written == len(multiple_bikers)
+        for biker in multiple_bikers:
+            biker.refresh_from_db()
+            assert (biker.current_latitude, biker.current_longitude) == FAR_AWAY
+
+    def test_write_back_without_changes_skips_database(self, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert get_live_location_store().write_back() == 0
+
+    def test_failed_write_back_keeps_positions_pending(self, multiple_bikers):
+        store = MemoryLiveLocationStore()
+        biker = multiple_bikers[0]
+        store.update(biker.id, *FAR_AWAY)
+
+        with patch.object(Biker.objects, "bulk_update", side_effect=RuntimeError("db down")):
+            assert store.write_back() == 0
+
+        assert store.write_back() == 1
+        biker.refresh_from_db()
+        assert (biker.current_latitude, biker.current_longitude) == FAR_AWAY
+
+    def test_restore_keeps_newer_pings(self):
+        store = MemoryLiveLocationStore()
+        store.update(1, -26.2, 28.0)
+        drained = store.drain_pending()
+        store.update(1, -26.3, 28.1)
+
+        store.restore_pending(drained)
+
+        assert store.drain_pending() == {1: (-26.3, 28.1)}
+
+    def test_write_back_task_survives_errors(self, settings):
+        settings.LIVE_LOCATION_WRITE_BACK_SECONDS = 0
+        store = MemoryLiveLocationStore()
+        calls = []
+
+        def write_back():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("redis unreachable")
+
+        async def run():
+            with patch.object(store, "write_back", write_back):
+                store.start_write_back()
+                while len(calls) < 2:
+                    await asyncio.sleep(0.01)
+                store._writer.cancel()
+
+        asyncio.run(run())
+
+        assert len(calls) >= 2
+
+    def test_pings_do_not_touch_database(self, biker_with_location, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            record_biker_location(biker_with_location.id, *FAR_AWAY)
+
+
+@pytest.mark.django_db
+class TestNearbyBikersUseLivePositions:
+    """find_nearby_bikers ranks bikers by their live position, not the stale row."""
+
+    @pytest.fixture(autouse=True, params=[True, False], ids=["grid_index", "database"])
+    def search_backend(self, request, settings):
+        settings.BIKER_SPATIAL_INDEX = request.param
+
+    def test_biker_who_moved_away_ranks_last(self, searching_delivery, multiple_bikers):
+        moved = multiple_bikers[0]
+        record_biker_location(moved.id, *FAR_AWAY)
+
+        nearby = find_nearby_bikers(searching_delivery)
+
+        assert moved.id not in [biker.id for biker in nearby]
+        assert len(nearby) == len(multiple_bikers) - 1
+
+    def test_live_position_is_used_for_ordering(self, searching_delivery, multiple_bikers):
+        # The farthest fixture biker is now standing at the pickup; the one
+        # whose row is at the pickup has moved a little away
+        closest = multiple_bikers[-1]
+        record_biker_location(closest.id, searching_delivery.pickup_latitude, searching_delivery.pickup_longitude)
+        record_biker_location(multiple_bikers[0].id, -26.2141, 28.0573)
+
+        nearby = find_nearby_bikers(searching_delivery)
+
+        assert nearby[0].id == closest.id
+
+
+@pytest.mark.django_db
+class TestBikerIndexFollowsPings:
+    """Pings move indexed bikers immediately, and saves keep their live position."""
+
+    def test_ping_moves_indexed_biker(self, biker_with_location):
+        index = get_biker_index()
+        index.sync_biker(biker_with_location)
+
+        record_biker_location(biker_with_location.id, *FAR_AWAY)
+
+        assert index.within(*FAR_AWAY, radius_km=1) == [(pytest.approx(0, abs=1e-6), biker_with_location.id)]
+
+    def test_status_save_keeps_live_position(self, biker_with_location):
+        record_biker_location(biker_with_location.id, *FAR_AWAY)
+
+        # e.g. mark_delivered making the biker AVAILABLE again
+        biker_with_location.status = "AVAILABLE"
+        biker_with_location.save(update_fields=["status"])
+
+        assert [biker_id for _, biker_id in get_biker_index().within(*FAR_AWAY, radius_km=1)] == [biker_with_location.id]
+
+
+@pytest.fixture
+def redis_store(settings):
+    """A RedisLiveLocationStore against REDIS_URL; skipped when no Redis server is reachable."""
+    import redis
+    store = RedisLiveLocationStore(settings.REDIS_URL)
+    try:
+        store.clear()
+    except redis.ConnectionError:
+        pytest.skip("Redis server not available")
+    yield store
+    store.clear()
+
+
+class TestRedisLiveLocationStore:
+    """Tests for the Redis GEO store (need a running Redis server)."""
+
+    def test_positions_round_trip(self, redis_store):
+        redis_store.update(1, -26.2041, 28.0473)
+
+        latitude, longitude = redis_store.get_many([1, 2])[1]
+        assert latitude == pytest.approx(-26.2041, abs=1e-5)
+        assert longitude == pytest.approx(28.0473, abs=1e-5)
+
+    def test_drain_pending(self, redis_store):
+        redis_store.update(1, -26.2, 28.0)
+        redis_store.update(1, -26.3, 28.1)
+
+        assert redis_store.drain_pending() == {1: (-26.3, 28.1)}
+        assert redis_store.drain_pending() == {}
+
+    def test_restore_pending_keeps_newer_pings(self, redis_store):
+        redis_store.update(1, -26.2, 28.0)
+        redis_store.update(2, -26.4, 28.2)
+        drained = redis_store.drain_pending()
+        redis_store.update(1, -26.3, 28.1)
+
+        redis_store.restore_pending(drained)
+
+        assert redis_store.drain_pending() == {1: (-26.3, 28.1), 2: (-26.4, 28.2)}
@@ -0,0 +1,34 @@
+import pytest
+
+from deliveries.loadtest import run_load_test
+from deliveries.models import Delivery, DeliveryLocation
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWebSocketLoadTest:
+    """Tests for the in-process WebSocket load generator"""
+
+    def test_small_run_delivers_every_ping(self):
+        """Without the throttle, every ping reaches every watcher and is stored"""
+        result = run_load_test(bikers=2, watchers=2, pings=3, interval=0)
+
+        assert result.pings_sent == 6
+        assert result.broadcasts_received == 12
+        assert result.heartbeats_acked == 2
+        assert len(result.latencies_ms) == 12
+        assert result.rows_written == 6
+        assert DeliveryLocation.objects.count() == 6
+        assert result.db_writes > 0
+
+    def test_first_ping_starts_deliveries(self):
+        run_load_test(bikers=2, watchers=1, pings=1, interval=0)
+
+        assert set(Delivery.objects.values_list("status", flat=True)) == {"IN_TRANSIT"}
+
+    def test_report(self):
+        result = run_load_test(bikers=1, watchers=1, pings=2, interval=0)
+        report = result.as_dict()
+
+        assert report["messages_per_s"] > 0
+        assert report["latency_p50_ms"] <= report["latency_p99_ms"]
+        assert report["location_rows_written"] == 2
@@ -1,5 +1,5 @@
 import pytest
-from deliveries.location import calculate_distance, estimate_eta, parse_coordinates
+from deliveries.location import calculate_distance, estimate_eta, parse_coordinates, validate_coordinates
 
 
 class TestLocationUtilities:
@@ -55,3 +55,20 @@ class TestLocationUtilities:
         
         with pytest.raises(ValueError):
             parse_coordinates("40.7128")
+
+    def test_validate_coordinates_coerces_numbers(self):
+        """Numeric strings and ints are accepted and returned as floats"""
+        assert validate_coordinates("-26.2041", 28) == (-26.2041, 28.0)
+
+    @pytest.mark.parametrize("latitude, longitude", [
+        (None, 28.0),
+        ("north", 28.0),
+        (float("nan"), 28.0),
+        (-26.2, float("inf")),
+        (91, 28.0),
+        (-26.2, -181),
+    ])
+    def test_validate_coordinates_invalid(self, latitude, longitude):
+        """Missing, non-numeric, non-finite and out-of-range values raise ValueError"""
+        with pytest.raises(ValueError):
+            validate_coordinates(latitude, longitude)
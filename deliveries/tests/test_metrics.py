@@ -0,0 +1,237 @@
+"""
+Tests for instrumentation: the metrics registry, RequestMetricsMiddleware,
+the /metrics endpoint and WebSocket consumer metrics.
+"""
+import pytest
+
+from force_backend.metrics import MetricsRegistry
+from force_backend.middleware import QueryBudgetExceeded
+
+
+class TestMetricsRegistry:
+    """Tests for the Prometheus text registry"""
+
+    def test_counter_renders_per_label_set(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs run")
+        counter.inc(queue="fast")
+        counter.inc(2, queue="fast")
+        counter.inc(queue="slow")
+
+        text = registry.render()
+
+        assert "# TYPE jobs_total counter" in text
+        assert 'jobs_total{queue="fast"} 3' in text
+        assert 'jobs_total{queue="slow"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = registry.render()
+
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert "latency_seconds_count 3" in text
+        assert "latency_seconds_sum 5.55" in text
+
+    def test_gauge_and_label_escaping(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge("connections", "Open connections")
+        gauge.inc(path='a"b')
+        gauge.inc(path='a"b')
+        gauge.dec(path='a"b')
+
+        assert 'connections{path="a\\"b"} 1' in registry.render()
+
+    def test_reregistering_returns_same_family(self):
+        registry = MetricsRegistry()
+        assert registry.counter("x_total", "X") is registry.counter("x_total", "X")
+        with pytest.raises(ValueError):
+            registry.gauge("x_total", "X")
+
+
+@pytest.mark.django_db
+class TestRequestMetricsMiddleware:
+    """Tests for per-request query, timing and size instrumentation"""
+
+    def test_records_queries_render_time_and_size(self, client_api_client, delivery, metrics):
+        api_client, _ = client_api_client
+
+        response = api_client.get('/api/deliveries/')
+
+        labels = {"view": "deliveries-list", "method": "GET"}
+        assert metrics.get("http_requests_total").value(status=200, **labels) == 1
+        assert metrics.get("http_request_db_queries").sum(**labels) > 0
+        assert metrics.get("http_request_db_duration_seconds").count(**labels) == 1
+        assert metrics.get("http_response_render_seconds").sum(**labels) > 0
+        assert metrics.get("http_response_size_bytes").sum(**labels) == len(response.content)
+
+    def test_unresolved_urls_share_one_label(self, api_client, metrics):
+        api_client.get('/no-such-page/')
+
+        assert metrics.get("http_requests_total").value(view="unmatched", method="GET", status=404) == 1
+
+    def test_logs_structured_line(self, client_api_client, caplog):
+        api_client, _ = client_api_client
+
+        with caplog.at_level("INFO", logger="force_backend.requests"):
+            api_client.get('/api/deliveries/')
+
+        record = next(r for r in caplog.records if r.name == "force_backend.requests")
+        assert record.request_metrics["view"] == "deliveries-list"
+        assert record.request_metrics["queries"] > 0
+
+    def test_over_budget_request_fails_in_assert_mode(self, client_api_client, settings, query_budgets):
+        api_client, _ = client_api_client
+        settings.QUERY_BUDGETS = {**settings.QUERY_BUDGETS, "deliveries-list": 0}
+
+        with pytest.raises(QueryBudgetExceeded, match="deliveries-list ran"):
+            api_client.get('/api/deliveries/')
+
+    def test_over_budget_request_warns_otherwise(self, client_api_client, settings, metrics, caplog):
+        api_client, _ = client_api_client
+        settings.QUERY_BUDGETS = {**settings.QUERY_BUDGETS, "deliveries-list": 0}
+
+        with caplog.at_level("WARNING", logger="force_backend.requests"):
+            response = api_client.get('/api/deliveries/')
+
+        assert response.status_code == 200
+        assert metrics.get("http_request_query_budget_exceeded_total").value(view="deliveries-list") == 1
+        assert any("budget 0" in r.getMessage() for r in caplog.records)
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+    """Tests for GET /metrics"""
+
+    def test_serves_prometheus_text(self, api_client, metrics, settings):
+        settings.DEBUG = True
+        api_client.get('/health/')
+
+        response = api_client.get('/metrics')
+
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'http_requests_total{method="GET",status="200",view="health_check"} 1' in response.content.decode()
+
+    def test_requires_token_when_configured(self, api_client, settings):
+        settings.METRICS_TOKEN = "scrape-secret"
+
+        assert api_client.get('/metrics').status_code == 401
+        response = api_client.get('/metrics', HTTP_AUTHORIZATION="Bearer scrape-secret")
+        assert response.status_code == 200
+
+    def test_closed_without_token_when_not_debug(self, api_client, settings):
+        settings.DEBUG = False
+        settings.METRICS_TOKEN = ""
+
+        assert api_client.get('/metrics').status_code == 403
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConsumerMetrics:
+    """Tests for WebSocket consumer metrics, driven through the ASGI app"""
+
+    @pytest.fixture(autouse=True)
+    def in_memory_channel_layer(self, settings):
+        settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+    def _run(self, path, messages=()):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from force_backend.asgi import application
+
+        async def session():
+            communicator = WebsocketCommunicator(application, path)
+            connected, code = await communicator.connect()
+            if connected:
+                await communicator.receive_json_from()
+                for message in messages:
+                    await communicator.send_json_to(message)
+                    await communicator.receive_json_from()
+                await communicator.disconnect(code=1000)
+            return connected, code
+
+        return async_to_sync(session)()
+
+    def test_biker_session_is_recorded(self, biker_user, metrics):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        user, _ = biker_user
+        token = RefreshToken.for_user(user).access_token
+
+        connected, _ = self._run(f"/ws/biker/?token={token}", [{"type": "heartbeat"}])
+
+        assert connected
+        assert metrics.get("ws_connections_total").value(consumer="biker", outcome="accepted", code="") == 1
+        assert metrics.get("ws_messages_received_total").value(consumer="biker", type="heartbeat") == 1
+        assert metrics.get("ws_disconnects_total").value(consumer="biker", code="1000") == 1
+        assert metrics.get("ws_connections_open").value(consumer="biker") == 0
+        assert metrics.get("ws_db_call_seconds").count(consumer="biker", helper="get_biker") == 1
+
+    def test_unknown_and_non_string_types_share_one_label(self, biker, metrics):
+        """Client-chosen types never become label values, and unhashable ones don't break receive()"""
+        import json
+        from unittest.mock import AsyncMock
+        from asgiref.sync import async_to_sync
+        from deliveries.consumers import BikerConsumer
+
+        consumer = BikerConsumer()
+        consumer.biker = biker
+        consumer.send = AsyncMock()
+
+        for message_type in ({}, [], "made-up-type"):
+            async_to_sync(consumer.receive)(json.dumps({"type": message_type}))
+
+        assert metrics.get("ws_messages_received_total").value(consumer="biker", type="other") == 3
+        assert metrics.get("ws_messages_received_total").value(consumer="biker", type="made-up-type") == 0
+        consumer.send.assert_not_awaited()
+
+    def test_rejected_handshake_is_recorded_with_close_code(self, metrics):
+        connected, code = self._run("/ws/biker/")
+
+        assert not connected
+        assert metrics.get("ws_connections_total").value(consumer="biker", outcome="rejected", code="4001") == 1
+
+    def test_location_broadcast_times_group_send_and_counts_deliveries(self, assigned_delivery, biker_user, client_user, metrics, settings):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from force_backend.asgi import application
+        from rest_framework_simplejwt.tokens import RefreshToken
+        settings.LOCATION_BROADCAST_MIN_INTERVAL = 0
+        user, _ = biker_user
+        path = f"/ws/tracking/{assigned_delivery.id}/?token="
+
+        async def session():
+            watcher = WebsocketCommunicator(application, path + str(RefreshToken.for_user(client_user).access_token))
+            biker = WebsocketCommunicator(application, path + str(RefreshToken.for_user(user).access_token))
+            for communicator in (watcher, biker):
+                await communicator.connect()
+                await communicator.receive_json_from()
+            await biker.send_json_to({"type": "location_update", "latitude": -26.2, "longitude": 28.0})
+            await watcher.receive_json_from()
+            await biker.receive_json_from()
+            await watcher.disconnect()
+            await biker.disconnect()
+
+        async_to_sync(session)()
+
+        assert metrics.get("channel_layer_group_send_seconds").count(consumer="tracking", type="broadcast_location") == 1
+        assert metrics.get("ws_group_events_total").value(consumer="tracking", type="broadcast_location") == 2
+        assert metrics.get("ws_db_call_seconds").count(consumer="tracking", helper="auto_start_delivery") == 1
+        assert metrics.get("ws_db_call_seconds").count(consumer="tracking", helper="record_live_location") == 1
+
+    def test_batch_fan_out_records_size(self, metrics):
+        from unittest.mock import AsyncMock, MagicMock
+        from deliveries.notifications import send_to_groups
+        layer = MagicMock()
+        layer.group_send = AsyncMock()
+
+        send_to_groups([(f"biker_{i}", {"type": "delivery_request"}) for i in range(3)], channel_layer=layer)
+
+        assert metrics.get("channel_layer_fanout_groups").sum(type="delivery_request") == 3
+        assert metrics.get("channel_layer_fanout_seconds").count(type="delivery_request") == 1
@@ -0,0 +1,131 @@
+"""
+Tests for the deliveries WebSocket middleware.
+Tests get_user_from_token and the UserCache used by JWTAuthMiddleware.
+"""
+import pytest
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+from deliveries.middleware import UserCache, get_user_from_token, user_cache
+
+
+def _resolve(token):
+    return async_to_sync(get_user_from_token)(str(token))
+
+
+@pytest.mark.django_db
+class TestGetUserFromToken:
+    """Tests for the get_user_from_token function."""
+
+    def test_valid_token_returns_user(self, client_user):
+        user = _resolve(RefreshToken.for_user(client_user).access_token)
+
+        assert user.id == client_user.id
+        assert user.email == client_user.email
+
+    def test_invalid_token_returns_anonymous(self):
+        assert _resolve("not-a-token").is_anonymous
+
+    def test_second_connect_is_served_from_cache(self, client_user):
+        """A reconnect with the same user does not hit the database."""
+        token = RefreshToken.for_user(client_user).access_token
+        _resolve(token)
+
+        with CaptureQueriesContext(connection) as queries:
+            user = _resolve(token)
+
+        assert user.id == client_user.id
+        assert len(queries) == 0
+
+    def test_deactivated_user_is_rejected_immediately(self, client_user):
+        """Saving a user drops them from the cache, so deactivation applies at once."""
+        token = RefreshToken.for_user(client_user).access_token
+        _resolve(token)
+
+        client_user.is_active = False
+        client_user.save()
+
+        assert _resolve(token).is_anonymous
+
+    def test_token_for_deleted_user_returns_anonymous(self, client_user):
+        token = RefreshToken.for_user(client_user).access_token
+        client_user.delete()
+
+        assert _resolve(token).is_anonymous
+        assert user_cache.get(client_user.id) is None
+
+
+class TestUserCache:
+    """Tests for the UserCache class."""
+
+    def test_entries_expire(self):
+        cache = UserCache(ttl=10)
+        with patch('deliveries.middleware.time.monotonic', return_value=100.0):
+            cache.set(1, "user")
+        with patch('deliveries.middleware.time.monotonic', return_value=109.0):
+            assert cache.get(1) == "user"
+        with patch('deliveries.middleware.time.monotonic', return_value=110.0):
+            assert cache.get(1) is None
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = UserCache(max_size=2)
+        cache.set(1, "a")
+        cache.set(2, "b")
+        cache.get(1)
+        cache.set(3, "c")
+
+        assert cache.get(1) == "a"
+        assert cache.get(2) is None
+        assert cache.get(3) == "c"
+
+
+@pytest.mark.django_db
+class TestJWTAuthMiddlewareScope:
+    """Tests for the role and biker id JWTAuthMiddleware puts on the scope."""
+
+    def _scope(self, user):
+        from deliveries.middleware import JWTAuthMiddleware
+        captured = {}
+
+        async def inner(scope, receive, send):
+            captured.update(scope)
+
+        token = RefreshToken.for_user(user).access_token
+        middleware = JWTAuthMiddleware(inner)
+        async_to_sync(middleware)({"type": "websocket", "query_string": f"token={token}".encode()}, None, None)
+        return captured
+
+    def test_biker_scope(self, biker_user):
+        user, biker = biker_user
+
+        scope = self._scope(user)
+
+        assert scope["role"] == "biker"
+        assert scope["biker_id"] == biker.id
+
+    def test_client_and_admin_scope(self, client_user, admin_user):
+        assert self._scope(client_user)["role"] == "client"
+        assert self._scope(client_user)["biker_id"] is None
+        assert self._scope(admin_user)["role"] == "admin"
+
+    def test_biker_id_is_loaded_with_the_user(self, biker_user):
+        """A cache miss loads the user and their biker id in one query."""
+        user, biker = biker_user
+
+        with CaptureQueriesContext(connection) as queries:
+            scope = self._scope(user)
+
+        assert scope["biker_id"] == biker.id
+        assert len(queries) == 1
+
+    def test_new_biker_profile_refreshes_cached_role(self, client_user):
+        from deliveries.models import Biker
+        assert self._scope(client_user)["role"] == "client"
+
+        biker = Biker.objects.create(user=client_user)
+
+        scope = self._scope(client_user)
+        assert scope["role"] == "biker"
+        assert scope["biker_id"] == biker.id
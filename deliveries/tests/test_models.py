@@ -3,8 +3,9 @@ Tests for deliveries app models and views
 """
 import pytest
 from django.contrib.auth import get_user_model
+from django.db import connection
 from rest_framework import status
-from deliveries.models import Delivery, Biker, DeliveryAssignment, DeliveryLocation
+from deliveries.models import Delivery, Biker, DeliveryAssignment, DeliveryLocation, DeliveryLog
 
 User = get_user_model()
 
@@ -147,7 +148,7 @@ class TestDeliveryViewSet:
         
         response = api_client.get('/api/deliveries/')
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
+        assert len(response.data['results']) == 1
     
     def test_create_delivery_as_client(self, client_api_client):
         """Test creating a delivery as client"""
@@ -185,3 +186,45 @@ class TestDeliveryViewSet:
         
         delivery.refresh_from_db()
         assert delivery.status == 'ASSIGNED'
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite',
+    reason="Query plan text is backend-specific; these assertions target SQLite"
+)
+class TestQueryPlans:
+    """Test that the hot lookup paths are served by the declared indexes"""
+
+    def test_client_listing_uses_client_created_index(self, client_user):
+        plan = Delivery.objects.filter(client=client_user).order_by('-created_at').explain()
+        assert 'delivery_client_created_idx' in plan
+
+    def test_searching_lookup_uses_an_index(self):
+        plan = Delivery.objects.filter(status='SEARCHING').explain()
+        assert 'USING INDEX' in plan
+        assert 'SCAN deliveries_delivery' not in plan
+
+    def test_available_bikers_use_status_index(self):
+        plan = Biker.objects.filter(status='AVAILABLE').explain()
+        assert 'biker_status_location_idx' in plan
+
+    def test_location_history_uses_delivery_recorded_index(self):
+        plan = DeliveryLocation.objects.filter(delivery_id=1).order_by('-recorded_at').explain()
+        assert 'location_delivery_recorded_idx' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    def test_delivery_log_uses_delivery_timestamp_index(self):
+        plan = DeliveryLog.objects.filter(delivery_id=1).order_by('-timestamp').explain()
+        assert 'log_delivery_timestamp_idx' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    def test_searching_index_is_partial(self):
+        """The SEARCHING index only covers open jobs"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = %s",
+                ['delivery_searching_idx']
+            )
+            (sql,) = cursor.fetchone()
+        assert "WHERE \"status\" = 'SEARCHING'" in sql
@@ -0,0 +1,83 @@
+"""
+Tests for the deliveries notifications module.
+Tests batched group sends and the deferred delivery_request fan-out.
+"""
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from deliveries.notifications import send_to_groups, notify_delivery_request
+
+
+def _run_inline(fn, *args):
+    """Stand-in for the fan-out executor that runs the batch immediately."""
+    fn(*args)
+    return MagicMock()
+
+
+class TestSendToGroups:
+    """Tests for the send_to_groups function."""
+
+    def test_sends_every_message(self):
+        """Every (group, message) pair is passed to group_send."""
+        layer = MagicMock()
+        layer.group_send = AsyncMock()
+
+        send_to_groups([("biker_1", {"type": "a"}), ("biker_2", {"type": "b"})], channel_layer=layer)
+
+        sent = [call.args for call in layer.group_send.call_args_list]
+        assert sent == [("biker_1", {"type": "a"}), ("biker_2", {"type": "b"})]
+
+    def test_one_failure_does_not_stop_the_batch(self):
+        """A failing group_send is logged and the other groups still receive the message."""
+        layer = MagicMock()
+        layer.group_send = AsyncMock(side_effect=[ConnectionError("down"), None])
+
+        send_to_groups([("biker_1", {}), ("biker_2", {})], channel_layer=layer)
+
+        assert layer.group_send.call_count == 2
+
+    @patch('deliveries.notifications.get_channel_layer')
+    def test_empty_batch_skips_channel_layer(self, mock_channel_layer):
+        """Nothing is sent and no channel layer is created for an empty batch."""
+        send_to_groups([])
+
+        mock_channel_layer.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestNotifyDeliveryRequest:
+    """Tests for the notify_delivery_request function."""
+
+    @patch('deliveries.notifications._executor')
+    @patch('deliveries.notifications.get_channel_layer')
+    def test_sends_after_commit(
+        self, mock_channel_layer, mock_executor, searching_delivery, multiple_bikers,
+        django_capture_on_commit_callbacks
+    ):
+        """Notifications are queued on commit and sent to each biker's group."""
+        mock_layer = MagicMock()
+        mock_layer.group_send = AsyncMock()
+        mock_channel_layer.return_value = mock_layer
+        mock_executor.submit.side_effect = _run_inline
+
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            notify_delivery_request(searching_delivery, multiple_bikers)
+
+        # Nothing is sent until the transaction commits
+        mock_layer.group_send.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+
+        groups = [call.args[0] for call in mock_layer.group_send.call_args_list]
+        assert groups == [f"biker_{biker.id}" for biker in multiple_bikers]
+        message = mock_layer.group_send.call_args.args[1]
+        assert message["type"] == "delivery_request"
+        assert message["delivery_id"] == searching_delivery.id
+
+    @patch('deliveries.notifications._executor')
+    def test_no_bikers_queues_nothing(self, mock_executor, searching_delivery, django_capture_on_commit_callbacks):
+        """No on-commit work is registered when there is nobody to notify."""
+        with django_capture_on_commit_callbacks() as callbacks:
+            notify_delivery_request(searching_delivery, [])
+
+        assert callbacks == []
@@ -0,0 +1,286 @@
+"""
+Tests for DeliveryLocation partition helpers and the location_partitions command.
+The PostgreSQL conversion tests run only with DB_ENGINE=postgresql; each rolls back its DDL.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from deliveries.models import DeliveryLocation
+from deliveries.partitions import (
+    LOCATION_TABLE,
+    DEFAULT_PARTITION,
+    add_months,
+    check_migration_plan,
+    expired_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    partition_month,
+    partition_name,
+    prune_expired_locations,
+    retention_cutoff,
+)
+
+
+class TestMonthHelpers:
+    """Tests for the month arithmetic used to name and bound partitions."""
+
+    def test_month_start(self):
+        assert month_start(datetime(2026, 10, 17, 12, 30)) == date(2026, 10, 1)
+
+    def test_add_months_crosses_years(self):
+        assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+        assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+    def test_partition_name_round_trip(self):
+        name = partition_name(date(2026, 3, 1))
+        assert name == f"{LOCATION_TABLE}_p202603"
+        assert partition_month(name) == date(2026, 3, 1)
+
+    def test_non_monthly_partitions_are_ignored(self):
+        assert partition_month(DEFAULT_PARTITION) is None
+
+
+class TestRetention:
+    """Tests for retention cutoffs and expired partition selection."""
+
+    def test_retention_disabled(self):
+        assert retention_cutoff(retention_days=0) is None
+
+    def test_retention_cutoff(self):
+        now = datetime(2026, 10, 17, tzinfo=dt_timezone.utc)
+        assert retention_cutoff(now=now, retention_days=30) == now - timedelta(days=30)
+
+    def test_only_fully_expired_partitions_are_dropped(self):
+        names = [partition_name(date(2026, month, 1)) for month in (9, 7, 8)] + [DEFAULT_PARTITION]
+        cutoff = datetime(2026, 9, 15, tzinfo=dt_timezone.utc)
+
+        # September still holds rows newer than the cutoff, so it is kept
+        assert expired_partitions(names, cutoff) == [
+            partition_name(date(2026, 7, 1)),
+            partition_name(date(2026, 8, 1)),
+        ]
+
+
+@pytest.mark.django_db
+class TestPruneLocations:
+    """Tests for row-by-row retention on unpartitioned tables."""
+
+    def _location(self, delivery, biker, age_days):
+        location = DeliveryLocation.objects.create(delivery=delivery, biker=biker, latitude=0, longitude=0)
+        DeliveryLocation.objects.filter(id=location.id).update(
+            recorded_at=timezone.now() - timedelta(days=age_days)
+        )
+        return location
+
+    def test_prune_deletes_in_batches(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        old = [self._location(assigned_delivery, biker, 100) for _ in range(5)]
+        recent = self._location(assigned_delivery, biker, 1)
+
+        deleted = prune_expired_locations(timezone.now() - timedelta(days=30), batch_size=2)
+
+        assert deleted == len(old)
+        assert list(DeliveryLocation.objects.values_list("id", flat=True)) == [recent.id]
+
+    def test_command_applies_retention(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        self._location(assigned_delivery, biker, 100)
+        self._location(assigned_delivery, biker, 1)
+        out = StringIO()
+
+        call_command("location_partitions", "--retention-days=30", stdout=out)
+
+        assert DeliveryLocation.objects.count() == 1
+        assert "Deleted 1 location rows" in out.getvalue()
+
+    def test_command_dry_run_changes_nothing(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        self._location(assigned_delivery, biker, 100)
+        out = StringIO()
+
+        call_command("location_partitions", "--retention-days=30", "--dry-run", stdout=out)
+
+        assert DeliveryLocation.objects.count() == 1
+        assert "Would delete 1 location rows" in out.getvalue()
+
+    def test_command_without_retention_keeps_everything(self, assigned_delivery, biker_user, settings):
+        _, biker = biker_user
+        settings.LOCATION_RETENTION_DAYS = 0
+        self._location(assigned_delivery, biker, 1000)
+
+        call_command("location_partitions", stdout=StringIO())
+
+        assert DeliveryLocation.objects.count() == 1
+
+    @pytest.mark.skipif(connection.vendor == "postgresql", reason="Checks the non-PostgreSQL error")
+    def test_convert_requires_postgresql(self):
+        with pytest.raises(CommandError):
+            call_command("location_partitions", "--convert", stdout=StringIO())
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="Partitioning requires PostgreSQL")
+class TestConvertToPartitioned:
+    """Runs the --convert DDL against a populated PostgreSQL table (rolled back after each test)."""
+
+    @pytest.fixture
+    def populated(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        now = timezone.now()
+        ages = [0, 1, 40, 75, 400]
+        locations = DeliveryLocation.objects.bulk_create([
+            DeliveryLocation(
+                delivery=assigned_delivery, biker=biker, latitude=-26.2 + i * 0.001, longitude=28.0,
+                recorded_at=now - timedelta(days=age)
+            )
+            for i, age in enumerate(ages)
+        ])
+        with connection.cursor() as cursor:
+            # Fire the deferred FK checks now: PostgreSQL refuses ALTER TABLE on a
+            # table with pending trigger events in the same transaction
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        return assigned_delivery, biker, locations
+
+    def test_convert_keeps_rows_and_partitions_by_month(self, populated):
+        delivery, biker, locations = populated
+
+        call_command("location_partitions", "--convert", stdout=StringIO())
+
+        assert is_partitioned()
+        partitions = list_partitions()
+        assert DEFAULT_PARTITION in partitions
+        for location in locations:
+            assert partition_name(month_start(location.recorded_at)) in partitions
+        assert DeliveryLocation.objects.count() == len(locations)
+        assert sorted(DeliveryLocation.objects.values_list("id", flat=True)) == sorted(l.id for l in locations)
+
+    def test_inserts_after_convert_get_new_ids_and_land_in_their_partition(self, populated):
+        delivery, biker, locations = populated
+        call_command("location_partitions", "--convert", stdout=StringIO())
+
+        created = DeliveryLocation.objects.create(delivery=delivery, biker=biker, latitude=-26.3, longitude=28.1)
+        far_future = DeliveryLocation.objects.create(
+            delivery=delivery, biker=biker, latitude=-26.3, longitude=28.1,
+            recorded_at=timezone.now() + timedelta(days=3650)
+        )
+
+        assert created.id > max(location.id for location in locations)
+        assert far_future.id > created.id
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, tableoid::regclass::text FROM "{LOCATION_TABLE}" WHERE id IN (%s, %s)',
+                [created.id, far_future.id]
+            )
+            placed = dict(cursor.fetchall())
+        assert placed[created.id] == partition_name(month_start(created.recorded_at))
+        assert placed[far_future.id] == DEFAULT_PARTITION
+
+    def test_foreign_keys_and_indexes_survive_convert(self, populated):
+        delivery, biker, locations = populated
+        call_command("location_partitions", "--convert", stdout=StringIO())
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            DeliveryLocation.objects.create(delivery_id=delivery.id + 1000, biker=biker, latitude=0, longitude=0)
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, LOCATION_TABLE)
+        foreign_keys = {c["columns"][0]: c["foreign_key"][0] for c in constraints.values() if c["foreign_key"]}
+        assert foreign_keys == {"delivery_id": "deliveries_delivery", "biker_id": "deliveries_biker"}
+        for index in DeliveryLocation._meta.indexes:
+            assert index.name in constraints
+
+        # Django-side cascades still reach every partition
+        delivery.delete()
+        assert DeliveryLocation.objects.count() == 0
+
+    def test_convert_twice_is_a_no_op(self, populated):
+        call_command("location_partitions", "--convert", stdout=StringIO())
+        out = StringIO()
+
+        call_command("location_partitions", "--convert", stdout=out)
+
+        assert "already partitioned" in out.getvalue()
+        assert DeliveryLocation.objects.count() == len(populated[2])
+
+    def test_retention_drops_expired_partitions_after_convert(self, populated):
+        _, _, locations = populated
+        call_command("location_partitions", "--convert", stdout=StringIO())
+        oldest = partition_name(month_start(locations[-1].recorded_at))   # 400 days old
+
+        call_command("location_partitions", "--retention-days=365", stdout=StringIO())
+
+        assert oldest not in list_partitions()
+        assert DeliveryLocation.objects.count() == len(locations) - 1
+
+    def _insert(self, delivery, biker, recorded_at):
+        location = DeliveryLocation.objects.create(
+            delivery=delivery, biker=biker, latitude=-26.3, longitude=28.1, recorded_at=recorded_at
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        return location
+
+    def _placed_in(self, location):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM "{LOCATION_TABLE}" WHERE id = %s', [location.id])
+            return cursor.fetchone()[0]
+
+    def test_retention_prunes_expired_rows_in_default_partition(self, populated):
+        delivery, biker, locations = populated
+        call_command("location_partitions", "--convert", stdout=StringIO())
+        # Older than every monthly partition, so it sits in the default partition
+        stray = self._insert(delivery, biker, timezone.now() - timedelta(days=800))
+        assert self._placed_in(stray) == DEFAULT_PARTITION
+
+        out = StringIO()
+        call_command("location_partitions", "--retention-days=365", stdout=out)
+
+        assert not DeliveryLocation.objects.filter(id=stray.id).exists()
+        assert DeliveryLocation.objects.count() == len(locations) - 1
+        assert f"Deleted 1 rows from {DEFAULT_PARTITION}" in out.getvalue()
+
+    def test_lapsed_run_moves_default_rows_into_new_partition(self, populated, settings):
+        delivery, biker, locations = populated
+        call_command("location_partitions", "--convert", stdout=StringIO())
+        # A month past LOCATION_PARTITION_MONTHS_AHEAD: the default partition takes it
+        months_ahead = settings.LOCATION_PARTITION_MONTHS_AHEAD + 2
+        month = add_months(month_start(timezone.now()), months_ahead)
+        late = self._insert(delivery, biker, datetime(month.year, month.month, 10, tzinfo=dt_timezone.utc))
+        assert self._placed_in(late) == DEFAULT_PARTITION
+
+        call_command("location_partitions", f"--months-ahead={months_ahead}", stdout=StringIO())
+
+        assert self._placed_in(late) == partition_name(month)
+        assert DEFAULT_PARTITION in list_partitions()
+        assert DeliveryLocation.objects.count() == len(locations) + 1
+
+    def test_migrations_altering_the_table_are_refused(self, populated, settings):
+        from django.db import migrations, models
+
+        call_command("location_partitions", "--convert", stdout=StringIO())
+
+        def plan(*operations):
+            migration = migrations.Migration("9999_test", "deliveries")
+            migration.operations = list(operations)
+            return [(migration, False)]
+
+        alter = migrations.AlterField("deliverylocation", "latitude", models.FloatField(null=True))
+        add_index = migrations.AddIndex(
+            "deliverylocation", models.Index(fields=["biker"], name="location_biker_test_idx")
+        )
+
+        with pytest.raises(CommandError, match="deliveries.9999_test"):
+            check_migration_plan(plan(alter))
+        check_migration_plan(plan(add_index))
+
+        settings.LOCATION_PARTITION_MIGRATION_GUARD = False
+        check_migration_plan(plan(alter))
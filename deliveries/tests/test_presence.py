@@ -0,0 +1,203 @@
+"""
+Tests for biker presence tracking and its effect on find_nearby_bikers.
+"""
+import json
+import threading
+import time
+from unittest.mock import MagicMock, AsyncMock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+
+from deliveries.consumers import BikerConsumer
+from deliveries.models import Biker
+from deliveries.presence import (
+    MemoryPresenceStore,
+    RedisPresenceStore,
+    mark_absent,
+    mark_present,
+    only_present,
+    present_biker_ids,
+)
+from deliveries.services import find_nearby_bikers, MIN_BIKERS_TO_NOTIFY
+
+User = get_user_model()
+
+
+class TestPresenceSet:
+    """Tests for the presence helpers."""
+
+    def test_mark_present_and_absent(self):
+        mark_present(1, "a")
+        mark_present(2, "b")
+        mark_absent(2, "b")
+
+        assert present_biker_ids([1, 2, 3]) == {1}
+
+    def test_reconnect_keeps_biker_present(self):
+        """The old socket closing after the new one connected leaves the biker present."""
+        mark_present(1, "old")
+        mark_present(1, "new")
+        mark_absent(1, "old")
+
+        assert present_biker_ids([1]) == {1}
+
+        mark_absent(1, "new")
+
+        assert present_biker_ids([1]) == set()
+
+    def test_each_connection_expires_on_its_own(self, settings):
+        settings.BIKER_PRESENCE_TTL_SECONDS = 0.05
+        mark_present(1, "stale")
+        time.sleep(0.1)
+        settings.BIKER_PRESENCE_TTL_SECONDS = 60
+        mark_present(1, "live")
+        mark_absent(1, "live")
+
+        assert present_biker_ids([1]) == set()
+
+    def test_presence_expires(self, settings):
+        settings.BIKER_PRESENCE_TTL_SECONDS = 0.01
+        mark_present(1, "a")
+
+        time.sleep(0.05)
+
+        assert present_biker_ids([1]) == set()
+
+    def test_concurrent_connects_and_disconnects_keep_live_connections(self):
+        """Each update is per connection, so racing sockets never drop each other's entries."""
+        mark_present(1, "stays")
+        start = threading.Barrier(8)
+
+        def churn(index):
+            start.wait()
+            for _ in range(50):
+                mark_present(1, f"socket-{index}")
+                mark_absent(1, f"socket-{index}")
+
+        threads = [threading.Thread(target=churn, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert present_biker_ids([1]) == {1}
+        mark_absent(1, "stays")
+        assert present_biker_ids([1]) == set()
+
+    def test_only_present_is_a_no_op_when_not_required(self, settings):
+        settings.BIKER_PRESENCE_REQUIRED = False
+        pairs = [(0.1, 1), (0.2, 2)]
+
+        assert only_present(pairs) == pairs
+
+
+@pytest.fixture(params=["memory", "redis"])
+def presence_store(request, settings):
+    """Each presence store; the Redis one is skipped when no Redis server is reachable."""
+    if request.param == "memory":
+        yield MemoryPresenceStore()
+        return
+    import redis
+    store = RedisPresenceStore(settings.REDIS_URL)
+    try:
+        store.clear()
+    except redis.ConnectionError:
+        pytest.skip("Redis server not available")
+    yield store
+    store.clear()
+
+
+class TestPresenceStores:
+    """Tests for the presence store backends."""
+
+    def test_connections_are_tracked_separately(self, presence_store):
+        now = time.time()
+        presence_store.add(1, "old", now + 60, 60)
+        presence_store.add(1, "new", now + 60, 60)
+        presence_store.add(2, "only", now + 60, 60)
+        presence_store.remove(1, "old")
+        presence_store.remove(2, "only")
+
+        assert presence_store.present([1, 2, 3], now) == {1}
+
+    def test_expired_connections_do_not_count(self, presence_store):
+        now = time.time()
+        presence_store.add(1, "stale", now - 1, 60)
+
+        assert presence_store.present([1], now) == set()
+
+
+@pytest.mark.django_db
+class TestNearbyBikersRequirePresence:
+    """find_nearby_bikers skips offline bikers when BIKER_PRESENCE_REQUIRED is on."""
+
+    @pytest.fixture(autouse=True, params=[True, False], ids=["grid_index", "database"])
+    def search_backend(self, request, settings):
+        settings.BIKER_SPATIAL_INDEX = request.param
+        settings.BIKER_PRESENCE_REQUIRED = True
+
+    def test_offline_bikers_are_skipped(self, searching_delivery, multiple_bikers):
+        online = multiple_bikers[:MIN_BIKERS_TO_NOTIFY]
+        for biker in online:
+            mark_present(biker.id, f"channel-{biker.id}")
+
+        nearby = find_nearby_bikers(searching_delivery)
+
+        assert {biker.id for biker in nearby} == {biker.id for biker in online}
+
+    def test_search_widens_to_find_present_bikers(self, searching_delivery, multiple_bikers):
+        # Pretoria, ~55 km away — outside the first ring, but online
+        user = User.objects.create_user(email="far@test.com", password="test123", role="biker")
+        far = Biker.objects.create(user=user, status="AVAILABLE", current_latitude=-25.7479, current_longitude=28.2293)
+        mark_present(multiple_bikers[0].id, "near")
+        mark_present(far.id, "far")
+
+        nearby = find_nearby_bikers(searching_delivery)
+
+        assert [biker.id for biker in nearby] == [multiple_bikers[0].id, far.id]
+
+    def test_nobody_online(self, searching_delivery, multiple_bikers):
+        assert find_nearby_bikers(searching_delivery) == []
+
+
+@pytest.mark.django_db
+class TestBikerConsumerPresence:
+    """Tests for presence updates from BikerConsumer."""
+
+    def _consumer(self, biker):
+        consumer = BikerConsumer()
+        consumer.biker = biker
+        consumer.group_name = f"biker_{biker.id}"
+        consumer.channel_name = "test-channel"
+        consumer.channel_layer = MagicMock()
+        consumer.channel_layer.group_discard = AsyncMock()
+        consumer.send = AsyncMock()
+        return consumer
+
+    def test_heartbeat_renews_presence(self, biker):
+        consumer = self._consumer(biker)
+
+        async_to_sync(consumer.receive)(json.dumps({"type": "heartbeat"}))
+
+        assert present_biker_ids([biker.id]) == {biker.id}
+        consumer.send.assert_awaited_once_with(json.dumps({"type": "heartbeat_ack"}))
+
+    def test_disconnect_marks_absent(self, biker):
+        mark_present(biker.id, "test-channel")
+        consumer = self._consumer(biker)
+
+        async_to_sync(consumer.disconnect)(1000)
+
+        assert present_biker_ids([biker.id]) == set()
+
+    def test_disconnect_of_old_socket_after_reconnect(self, biker):
+        """Only the disconnecting channel is removed; the reconnected one keeps the biker present."""
+        consumer = self._consumer(biker)
+        async_to_sync(consumer.receive)(json.dumps({"type": "heartbeat"}))
+        mark_present(biker.id, "reconnected-channel")
+
+        async_to_sync(consumer.disconnect)(1006)
+
+        assert present_biker_ids([biker.id]) == {biker.id}
@@ -0,0 +1,267 @@
+"""
+Tests for the route archive: polyline encoding, Douglas–Peucker simplification,
+archive_delivery_route and the archive_routes command.
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from deliveries.models import DeliveryLocation, DeliveryRoute
+from deliveries.routes import (
+    archive_delivery_route,
+    archive_on_delivery,
+    decode_integers,
+    decode_polyline,
+    decode_route,
+    encode_integers,
+    encode_polyline,
+    route_points,
+    route_replay,
+    simplify,
+    simplify_to_budget,
+)
+
+
+def _trail(delivery, biker, points, start=None):
+    """Create one DeliveryLocation per (lat, lon), one second apart."""
+    start = start or timezone.now() - timedelta(hours=1)
+    DeliveryLocation.objects.bulk_create([
+        DeliveryLocation(
+            delivery=delivery, biker=biker, latitude=lat, longitude=lon,
+            recorded_at=start + timedelta(seconds=i)
+        )
+        for i, (lat, lon) in enumerate(points)
+    ])
+    return start
+
+
+class TestEncoding:
+    """Tests for polyline and delta encoding."""
+
+    def test_polyline_matches_reference_encoding(self):
+        """Test against the published reference example for encoded polylines."""
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        encoded = encode_polyline(points)
+
+        assert encoded == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+        assert decode_polyline(encoded) == points
+
+    def test_integers_round_trip(self):
+        values = [0, 1500, 1499, 100000, -3]
+        assert decode_integers(encode_integers(values)) == values
+
+    def test_empty_inputs(self):
+        assert decode_polyline(encode_polyline([])) == []
+        assert decode_integers(encode_integers([])) == []
+
+
+class TestSimplify:
+    """Tests for Douglas–Peucker simplification."""
+
+    def test_straight_line_keeps_endpoints_only(self):
+        points = [(-26.2, 28.0 + i * 0.001) for i in range(50)]
+        assert simplify(points, tolerance_m=5) == [0, 49]
+
+    def test_corner_is_kept(self):
+        # East along a street, then north — the corner is ~1 km from the start-end line
+        points = [(-26.2, 28.0 + i * 0.001) for i in range(11)]
+        points += [(-26.2 + i * 0.001, 28.01) for i in range(1, 11)]
+
+        assert simplify(points, tolerance_m=5) == [0, 10, 20]
+
+    def test_zero_tolerance_keeps_everything(self):
+        points = [(-26.2, 28.0 + i * 0.001) for i in range(5)]
+        assert simplify(points, tolerance_m=0) == [0, 1, 2, 3, 4]
+
+    def test_stationary_trail(self):
+        points = [(-26.2, 28.0)] * 5
+        assert simplify(points, tolerance_m=5) == [0, 4]
+
+
+class TestSimplifyToBudget:
+    """Tests for budget-bounded simplification."""
+
+    def test_short_trail_is_untouched(self):
+        points = [(-26.2, 28.0 + i * 0.001) for i in range(5)]
+        assert simplify_to_budget(points, 10) == [0, 1, 2, 3, 4]
+
+    def test_budget_keeps_most_significant_points(self):
+        # A straight road with one big detour in the middle
+        points = [(-26.2, 28.0 + i * 0.001) for i in range(41)]
+        points[20] = (-26.1, 28.02)
+
+        assert simplify_to_budget(points, 3) == [0, 20, 40]
+
+    def test_budget_is_respected(self):
+        points = [(-26.2 + (i % 7) * 0.001, 28.0 + i * 0.001) for i in range(1000)]
+        kept = simplify_to_budget(points, 50)
+
+        assert len(kept) == 50
+        assert kept[0] == 0 and kept[-1] == 999
+        assert kept == sorted(kept)
+
+
+@pytest.mark.django_db
+class TestArchiveDeliveryRoute:
+    """Tests for archive_delivery_route."""
+
+    def test_archive_packs_rows_into_one_route(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        points = [(-26.2041 + i * 0.0001, 28.0473 + i * 0.0002) for i in range(20)]
+        start = _trail(assigned_delivery, biker, points)
+
+        route = archive_delivery_route(assigned_delivery.id, tolerance_m=0)
+
+        assert DeliveryLocation.objects.filter(delivery=assigned_delivery).count() == 0
+        assert route.point_count == route.raw_point_count == 20
+        assert route.started_at == start
+        assert route.ended_at == start + timedelta(seconds=19)
+
+        decoded = decode_route(route)
+        assert [lat for lat, _, _ in decoded] == pytest.approx([lat for lat, _ in points], abs=1e-5)
+        assert [lon for _, lon, _ in decoded] == pytest.approx([lon for _, lon in points], abs=1e-5)
+        assert [t for _, _, t in decoded] == [start + timedelta(seconds=i) for i in range(20)]
+
+    def test_archive_simplifies_straight_trail(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        _trail(assigned_delivery, biker, [(-26.2, 28.0 + i * 0.0005) for i in range(100)])
+
+        route = archive_delivery_route(assigned_delivery.id, tolerance_m=5)
+
+        assert route.raw_point_count == 100
+        assert route.point_count == 2
+
+    def test_late_rows_are_merged(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        start = _trail(assigned_delivery, biker, [(-26.2, 28.0), (-26.3, 28.0)])
+        archive_delivery_route(assigned_delivery.id, tolerance_m=0)
+
+        _trail(assigned_delivery, biker, [(-26.3, 28.1)], start=start + timedelta(seconds=2))
+        route = archive_delivery_route(assigned_delivery.id, tolerance_m=0)
+
+        assert route.raw_point_count == 3
+        assert [(lat, lon) for lat, lon, _ in decode_route(route)] == [(-26.2, 28.0), (-26.3, 28.0), (-26.3, 28.1)]
+        assert DeliveryRoute.objects.count() == 1
+
+    def test_no_history(self, assigned_delivery):
+        assert archive_delivery_route(assigned_delivery.id) is None
+
+    def test_route_points_combine_archive_and_raw_rows(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        start = _trail(assigned_delivery, biker, [(-26.2, 28.0), (-26.3, 28.0)])
+        archive_delivery_route(assigned_delivery.id, tolerance_m=0)
+        _trail(assigned_delivery, biker, [(-26.3, 28.1)], start=start + timedelta(seconds=2))
+
+        assigned_delivery.refresh_from_db()
+        points = route_points(assigned_delivery)
+
+        assert [(lat, lon) for lat, lon, _ in points] == [(-26.2, 28.0), (-26.3, 28.0), (-26.3, 28.1)]
+
+    def test_archive_on_delivery_runs_after_commit(self, assigned_delivery, biker_user, django_capture_on_commit_callbacks):
+        _, biker = biker_user
+        _trail(assigned_delivery, biker, [(-26.2, 28.0), (-26.3, 28.0)])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            archive_on_delivery(assigned_delivery.id)
+
+        assert DeliveryRoute.objects.filter(delivery=assigned_delivery).exists()
+
+    def test_archive_on_delivery_can_be_disabled(self, assigned_delivery, biker_user, settings, django_capture_on_commit_callbacks):
+        settings.ROUTE_ARCHIVE_ON_DELIVERY = False
+        _, biker = biker_user
+        _trail(assigned_delivery, biker, [(-26.2, 28.0)])
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            archive_on_delivery(assigned_delivery.id)
+
+        assert callbacks == []
+        assert DeliveryLocation.objects.filter(delivery=assigned_delivery).count() == 1
+
+
+@pytest.mark.django_db
+class TestRouteReplay:
+    """Tests for route_replay downsampling and caching."""
+
+    def test_replay_downsamples_to_budget(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        _trail(assigned_delivery, biker, [(-26.2 + (i % 5) * 0.001, 28.0 + i * 0.001) for i in range(200)])
+
+        payload = route_replay(assigned_delivery, max_points=20)
+
+        assert payload["total_points"] == 200
+        assert payload["point_count"] == len(payload["points"]) == 20
+        assert len(decode_polyline(payload["polyline"])) == 20
+
+    def test_delivered_archived_route_is_cached(self, assigned_delivery, biker_user, django_assert_num_queries):
+        _, biker = biker_user
+        _trail(assigned_delivery, biker, [(-26.2, 28.0), (-26.3, 28.0)])
+        assigned_delivery.status = "DELIVERED"
+        assigned_delivery.save()
+        archive_delivery_route(assigned_delivery.id, tolerance_m=0)
+        assigned_delivery.refresh_from_db()
+
+        first = route_replay(assigned_delivery, max_points=10)
+
+        assigned_delivery.refresh_from_db()
+        # Only the route row is loaded to build the cache key
+        with django_assert_num_queries(1):
+            assert route_replay(assigned_delivery, max_points=10) == first
+
+    def test_delivered_unarchived_route_is_cached(self, assigned_delivery, biker_user, settings):
+        """With archiving off, a DELIVERED trail is cached too, and a late ping still shows up."""
+        from unittest.mock import patch
+
+        settings.ROUTE_ARCHIVE_ON_DELIVERY = False
+        _, biker = biker_user
+        _trail(assigned_delivery, biker, [(-26.2, 28.0), (-26.3, 28.0)])
+        assigned_delivery.status = "DELIVERED"
+        assigned_delivery.save()
+
+        first = route_replay(assigned_delivery, max_points=10)
+        with patch("deliveries.routes.route_points") as route_points:
+            assert route_replay(assigned_delivery, max_points=10) == first
+        route_points.assert_not_called()
+
+        _trail(assigned_delivery, biker, [(-26.4, 28.0)], start=timezone.now())
+        assert route_replay(assigned_delivery, max_points=10)["point_count"] == 3
+
+    def test_in_progress_route_is_not_cached(self, delivery_with_location, biker_user):
+        _, biker = biker_user
+        route_replay(delivery_with_location)
+        _trail(delivery_with_location, biker, [(-26.3, 28.1)], start=timezone.now())
+
+        assert route_replay(delivery_with_location)["point_count"] == 2
+
+
+@pytest.mark.django_db
+class TestArchiveRoutesCommand:
+    """Tests for the archive_routes management command."""
+
+    def test_archives_only_delivered(self, assigned_delivery, delivery_with_location, biker_user):
+        _, biker = biker_user
+        assigned_delivery.status = "DELIVERED"
+        assigned_delivery.save()
+        _trail(assigned_delivery, biker, [(-26.2, 28.0), (-26.3, 28.0)])
+        out = StringIO()
+
+        call_command("archive_routes", stdout=out)
+
+        assert DeliveryRoute.objects.filter(delivery=assigned_delivery).exists()
+        # Still IN_TRANSIT — its raw rows are left alone
+        assert DeliveryLocation.objects.filter(delivery=delivery_with_location).count() == 1
+        assert "Archived 1 delivery routes" in out.getvalue()
+
+    def test_dry_run(self, assigned_delivery, biker_user):
+        _, biker = biker_user
+        assigned_delivery.status = "DELIVERED"
+        assigned_delivery.save()
+        _trail(assigned_delivery, biker, [(-26.2, 28.0)])
+        out = StringIO()
+
+        call_command("archive_routes", "--dry-run", stdout=out)
+
+        assert not DeliveryRoute.objects.exists()
+        assert "Would archive 1 delivery routes" in out.getvalue()
@@ -5,10 +5,12 @@ Tests find_nearby_bikers, accept_delivery, and _notify_delivery_taken functions.
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from django.contrib.auth import get_user_model
+from django.db import connection
 from deliveries.models import Biker, Delivery, DeliveryAssignment
 from deliveries.services import (
     find_nearby_bikers, 
     accept_delivery, 
+    biker_delivery_feed,
     _notify_delivery_taken,
     SEARCH_RADIUS_KM,
     MIN_BIKERS_TO_NOTIFY
@@ -20,6 +22,11 @@ User = get_user_model()
 @pytest.mark.django_db
 class TestFindNearbyBikers:
     """Tests for the find_nearby_bikers function."""
+
+    @pytest.fixture(autouse=True, params=[True, False], ids=["grid_index", "database"])
+    def search_backend(self, request, settings):
+        """Run every test against both the grid index and the bounding-box query."""
+        settings.BIKER_SPATIAL_INDEX = request.param
     
     def test_find_bikers_within_radius(self, searching_delivery, multiple_bikers):
         """Test that bikers within search radius are found."""
@@ -116,6 +123,194 @@ class TestFindNearbyBikers:
             )
             assert d1 <= d2
 
+    def test_limit_returns_closest_bikers(self, searching_delivery, multiple_bikers):
+        """Test that limit keeps only the closest bikers, in distance order."""
+        nearby = find_nearby_bikers(searching_delivery, limit=2)
+
+        assert [b.id for b in nearby] == [multiple_bikers[0].id, multiple_bikers[1].id]
+
+    def test_delivery_without_pickup_location_returns_empty(self, delivery, multiple_bikers):
+        """Test that deliveries without pickup coordinates match no bikers."""
+        delivery.pickup_latitude = None
+        delivery.pickup_longitude = None
+
+        assert find_nearby_bikers(delivery) == []
+
+
+@pytest.mark.django_db
+class TestFindNearbyBikersDatabaseSearch:
+    """Tests for the bounding-box database search used when the grid index is off."""
+
+    @pytest.fixture(autouse=True)
+    def database_backend(self, settings):
+        settings.BIKER_SPATIAL_INDEX = False
+
+    def test_query_is_limited_to_bounding_box(self, searching_delivery, multiple_bikers):
+        """Test that bikers far outside the radius are never loaded when enough are nearby."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            nearby = find_nearby_bikers(searching_delivery)
+
+        assert len(nearby) == len(multiple_bikers)
+        assert len(queries) == 1
+        assert "current_latitude" in queries[0]["sql"]
+        assert "BETWEEN" in queries[0]["sql"]
+
+    def test_ring_search_stops_once_enough_bikers_found(self, searching_delivery):
+        """Test that the widening ring returns the closest MIN_BIKERS_TO_NOTIFY bikers."""
+        # Pretoria (~58 km), Durban (~500 km), Cape Town (~1270 km), New York
+        locations = [(-25.7479, 28.2293), (-29.8587, 31.0218), (-33.9249, 18.4241), (40.7128, -74.0060)]
+        bikers = []
+        for i, (lat, lon) in enumerate(locations):
+            user = User.objects.create_user(email=f"ring{i}@test.com", password="test123", role="biker")
+            bikers.append(Biker.objects.create(
+                user=user, status="AVAILABLE", current_latitude=lat, current_longitude=lon
+            ))
+
+        nearby = find_nearby_bikers(searching_delivery)
+
+        assert [b.id for b in nearby] == [b.id for b in bikers[:MIN_BIKERS_TO_NOTIFY]]
+
+
+@pytest.mark.django_db
+class TestBikerDeliveryFeed:
+    """Tests for the biker_delivery_feed function."""
+
+    def test_feed_contains_searching_and_own_assignments(self, client_user, biker_user):
+        """Test that the feed holds open jobs and the biker's own assignments only."""
+        _, biker = biker_user
+        other_user = User.objects.create_user(email="other@test.com", password="test123", role="biker")
+        other_biker = Biker.objects.create(user=other_user, status="AVAILABLE")
+
+        def create(status):
+            return Delivery.objects.create(
+                client=client_user, pickup_address="A", dropoff_address="B",
+                package_description="Package", status=status
+            )
+
+        searching = create("SEARCHING")
+        mine = create("ASSIGNED")
+        DeliveryAssignment.objects.create(delivery=mine, biker=biker, accepted=True)
+        theirs = create("ASSIGNED")
+        DeliveryAssignment.objects.create(delivery=theirs, biker=other_biker, accepted=True)
+        create("PENDING")
+
+        feed = biker_delivery_feed(biker)
+
+        assert sorted(feed.values_list("id", flat=True)) == sorted([searching.id, mine.id])
+
+    def test_feed_radius_limits_searching_jobs(self, client_user, biker_with_location):
+        """Test that radius_km drops far SEARCHING jobs but keeps assignments and unlocated jobs."""
+        biker = biker_with_location
+
+        def create(status, lat=None, lon=None):
+            return Delivery.objects.create(
+                client=client_user, pickup_address="A", dropoff_address="B",
+                package_description="Package", status=status,
+                pickup_latitude=lat, pickup_longitude=lon
+            )
+
+        near = create("SEARCHING", -26.2041, 28.0473)       # Johannesburg, ~100 m away
+        far = create("SEARCHING", -33.9249, 18.4241)        # Cape Town
+        unlocated = create("SEARCHING")
+        assigned_far = create("ASSIGNED", -33.9249, 18.4241)
+        DeliveryAssignment.objects.create(delivery=assigned_far, biker=biker, accepted=True)
+
+        scoped = set(biker_delivery_feed(biker, radius_km=SEARCH_RADIUS_KM).values_list("id", flat=True))
+        unscoped = set(biker_delivery_feed(biker).values_list("id", flat=True))
+
+        assert scoped == {near.id, unlocated.id, assigned_far.id}
+        assert far.id in unscoped
+
+    def test_feed_radius_ignored_without_biker_location(self, client_user, biker_user):
+        """Test that a biker with no known position still sees every SEARCHING job."""
+        _, biker = biker_user
+        far = Delivery.objects.create(
+            client=client_user, pickup_address="A", dropoff_address="B",
+            package_description="Package", status="SEARCHING",
+            pickup_latitude=-33.9249, pickup_longitude=18.4241
+        )
+
+        feed = biker_delivery_feed(biker, radius_km=SEARCH_RADIUS_KM)
+
+        assert list(feed.values_list("id", flat=True)) == [far.id]
+
+    def test_feed_radius_is_exact_and_one_query(self, client_user, biker_with_location):
+        """Test that the radius is checked exactly in SQL: a job in the bounding-box corner is dropped."""
+        import math
+        from django.test.utils import CaptureQueriesContext
+        from deliveries.distance import KM_PER_DEGREE, haversine
+
+        biker = biker_with_location
+        lat, lon = biker.current_latitude, biker.current_longitude
+        # 4 km north and 4 km east: inside the 5 km bounding box, ~5.7 km away
+        corner_lat = lat + 4 / KM_PER_DEGREE
+        corner_lon = lon + 4 / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+        assert haversine(lat, lon, corner_lat, corner_lon) > SEARCH_RADIUS_KM
+
+        def create(lat, lon):
+            return Delivery.objects.create(
+                client=client_user, pickup_address="A", dropoff_address="B",
+                package_description="Package", status="SEARCHING",
+                pickup_latitude=lat, pickup_longitude=lon
+            )
+
+        near = create(lat + 0.01, lon)
+        create(corner_lat, corner_lon)
+
+        with CaptureQueriesContext(connection) as queries:
+            ids = list(biker_delivery_feed(biker, radius_km=SEARCH_RADIUS_KM).values_list("id", flat=True))
+
+        assert ids == [near.id]
+        assert len(queries) == 1
+
+    def test_feed_radius_uses_live_position(self, client_user, biker_with_location):
+        """Test that the live store position wins over the stale Biker row."""
+        from deliveries.live_locations import get_live_location_store
+
+        biker = biker_with_location
+        in_cape_town = Delivery.objects.create(
+            client=client_user, pickup_address="A", dropoff_address="B",
+            package_description="Package", status="SEARCHING",
+            pickup_latitude=-33.9249, pickup_longitude=18.4241
+        )
+        get_live_location_store().update(biker.id, -33.9250, 18.4240)
+
+        feed = biker_delivery_feed(biker, radius_km=SEARCH_RADIUS_KM)
+
+        assert list(feed.values_list("id", flat=True)) == [in_cape_town.id]
+
+    def test_feed_query_has_no_join_or_distinct(self, biker_user):
+        """Test that the feed uses a subquery instead of an outer join plus DISTINCT."""
+        _, biker = biker_user
+
+        sql = str(biker_delivery_feed(biker).query).upper()
+
+        assert "DISTINCT" not in sql
+        assert "JOIN" not in sql
+
+    def test_feed_plan_fetches_deliveries_by_primary_key(self, biker_user):
+        """Test that the planner serves the feed from the two id sets instead of scanning Delivery."""
+        _, biker = biker_user
+        feed = biker_delivery_feed(biker)
+
+        if connection.vendor == "sqlite":
+            plan = feed.explain()
+            assert "SEARCH deliveries_delivery USING INTEGER PRIMARY KEY" in plan
+            assert "SCAN deliveries_delivery" not in plan
+        elif connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                # Test tables are tiny, so a sequential scan always looks cheapest;
+                # disabling it shows whether an index-only plan exists at all
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = feed.explain()
+            assert "Seq Scan on deliveries_delivery" not in plan
+            assert "Index Cond: (id = " in plan
+        else:
+            pytest.skip(f"No plan assertions for {connection.vendor}")
+
 
 @pytest.mark.django_db
 class TestAcceptDelivery:
@@ -201,6 +396,36 @@ class TestAcceptDelivery:
         # Verify only one assignment exists
         assert DeliveryAssignment.objects.filter(delivery=searching_delivery).count() == 1
     
+    @patch('deliveries.services.get_channel_layer')
+    def test_losing_accept_is_a_single_query(self, mock_channel_layer, assigned_delivery, biker_with_location):
+        """Test that a biker losing the race fails fast with one conditional UPDATE."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            assignment = accept_delivery(assigned_delivery.id, biker_with_location)
+
+        assert assignment is None
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        assert len(updates) == 1
+        assert not any(q["sql"].startswith(("SELECT", "INSERT")) for q in queries)
+        mock_channel_layer.assert_not_called()
+
+    @patch('deliveries.services.get_channel_layer')
+    def test_stale_assignment_rolls_back_claim(self, mock_channel_layer, searching_delivery, biker_with_location):
+        """Test that an existing assignment makes the accept fail without changing the delivery."""
+        user = User.objects.create_user(email="stale@test.com", password="test123", role="biker")
+        other_biker = Biker.objects.create(user=user, status="AVAILABLE")
+        DeliveryAssignment.objects.create(delivery=searching_delivery, biker=other_biker)
+
+        assignment = accept_delivery(searching_delivery.id, biker_with_location)
+
+        assert assignment is None
+        searching_delivery.refresh_from_db()
+        assert searching_delivery.status == "SEARCHING"
+        biker_with_location.refresh_from_db()
+        assert biker_with_location.status == "AVAILABLE"
+
     @patch('deliveries.services.get_channel_layer')
     def test_accept_delivery_notifies_other_bikers(self, mock_channel_layer, searching_delivery, multiple_bikers):
         """Test that accepting delivery notifies other nearby bikers."""
@@ -289,3 +514,24 @@ class TestNotifyDeliveryTaken:
             assert "delivery_id" in message
             assert "message" in message
             assert message["type"] == "delivery_taken"
+
+    @patch('deliveries.services.find_nearby_bikers')
+    @patch('deliveries.services.get_channel_layer')
+    def test_notify_uses_recorded_bikers(self, mock_channel_layer, mock_find_bikers, searching_delivery, multiple_bikers):
+        """Test that the bikers recorded at request time are notified without a new search."""
+        from deliveries.notifications import record_notified_bikers, get_notified_bikers
+
+        mock_layer = MagicMock()
+        mock_layer.group_send = AsyncMock()
+        mock_channel_layer.return_value = mock_layer
+
+        accepting_biker, *others = multiple_bikers[:3]
+        record_notified_bikers(searching_delivery.id, [b.id for b in multiple_bikers[:3]])
+
+        _notify_delivery_taken(searching_delivery, accepted_by_biker=accepting_biker)
+
+        mock_find_bikers.assert_not_called()
+        groups = [call.args[0] for call in mock_layer.group_send.call_args_list]
+        assert groups == [f"biker_{b.id}" for b in others]
+        # The record is cleared once the delivery is taken
+        assert get_notified_bikers(searching_delivery.id) is None
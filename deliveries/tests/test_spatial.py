@@ -0,0 +1,98 @@
+"""
+Tests for the deliveries spatial module.
+Tests the BikerGridIndex used by find_nearby_bikers.
+"""
+import pytest
+from django.contrib.auth import get_user_model
+from deliveries.models import Biker
+from deliveries.spatial import BikerGridIndex, get_biker_index
+
+User = get_user_model()
+
+# Johannesburg
+JNB = (-26.2041, 28.0473)
+
+
+class TestBikerGridIndex:
+    """Tests for the BikerGridIndex class."""
+
+    def test_within_returns_only_bikers_in_radius(self):
+        """Bikers outside the radius are not returned."""
+        index = BikerGridIndex()
+        index.update(1, JNB[0] + 0.001, JNB[1])         # ~100 m
+        index.update(2, JNB[0] + 0.03, JNB[1])          # ~3 km
+        index.update(3, -33.9249, 18.4241)              # Cape Town
+
+        found = {biker_id for _, biker_id in index.within(*JNB, 5)}
+
+        assert found == {1, 2}
+
+    def test_update_moves_biker_between_cells(self):
+        """Moving a biker removes it from its previous cell."""
+        index = BikerGridIndex()
+        index.update(1, *JNB)
+        index.update(1, -33.9249, 18.4241)
+
+        assert index.within(*JNB, 5) == []
+        assert len(index) == 1
+
+    def test_remove(self):
+        """Removed bikers are no longer returned."""
+        index = BikerGridIndex()
+        index.update(1, *JNB)
+        index.remove(1)
+        index.remove(1)  # No-op when missing
+
+        assert index.within(*JNB, 5) == []
+        assert 1 not in index
+
+    def test_nearest_widens_until_k_found(self):
+        """nearest() returns the k closest bikers even far outside the start radius."""
+        index = BikerGridIndex()
+        index.update(1, -25.7479, 28.2293)   # Pretoria (~58 km)
+        index.update(2, -29.8587, 31.0218)   # Durban (~500 km)
+        index.update(3, -33.9249, 18.4241)   # Cape Town (~1270 km)
+
+        nearest = index.nearest(*JNB, 2, start_radius_km=5)
+
+        assert [biker_id for _, biker_id in nearest] == [1, 2]
+        assert nearest[0][0] <= nearest[1][0]
+
+    def test_nearest_returns_everyone_when_fewer_than_k(self):
+        """nearest() stops once every indexed biker has been found."""
+        index = BikerGridIndex()
+        index.update(1, 40.7128, -74.0060)   # New York
+
+        assert [biker_id for _, biker_id in index.nearest(*JNB, 3, 5)] == [1]
+
+    def test_rebuild_replaces_contents_and_resets_age(self):
+        """rebuild() swaps in the given rows and marks the index fresh."""
+        index = BikerGridIndex()
+        index.update(1, *JNB)
+        assert index.is_stale()
+
+        index.rebuild([(2, JNB[0], JNB[1])])
+
+        assert 1 not in index
+        assert 2 in index
+        assert not index.is_stale()
+
+
+@pytest.mark.django_db
+class TestBikerIndexSignals:
+    """Tests that Biker saves and deletes keep the process-wide index in sync."""
+
+    def test_available_biker_with_location_is_indexed(self, biker_with_location):
+        assert biker_with_location.id in get_biker_index()
+
+    def test_biker_removed_when_on_delivery(self, biker_with_location):
+        biker_with_location.status = "ON_DELIVERY"
+        biker_with_location.save()
+
+        assert biker_with_location.id not in get_biker_index()
+
+    def test_biker_removed_on_delete(self, biker_with_location):
+        biker_id = biker_with_location.id
+        biker_with_location.delete()
+
+        assert biker_id not in get_biker_index()
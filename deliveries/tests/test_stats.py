@@ -0,0 +1,95 @@
+"""
+Tests for the deliveries stats module.
+Tests delivery_stats and the cached per-user snapshots used by my_deliveries.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from deliveries.models import Delivery
+from deliveries.stats import delivery_stats, cached_delivery_stats, invalidate_delivery_stats
+
+
+def _create_deliveries(client, statuses):
+    for status in statuses:
+        Delivery.objects.create(
+            client=client, pickup_address='A', dropoff_address='B',
+            package_description='P', status=status
+        )
+
+
+@pytest.mark.django_db
+class TestDeliveryStats:
+    """Tests for the delivery_stats function."""
+
+    def test_counts_every_status_in_one_query(self, client_user):
+        _create_deliveries(client_user, ['PENDING', 'SEARCHING', 'SEARCHING', 'DELIVERED'])
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = delivery_stats(Delivery.objects.filter(client=client_user))
+
+        assert len(queries) == 1
+        assert stats == {
+            'total': 4,
+            'pending': 1,
+            'searching': 2,
+            'assigned': 0,
+            'in_transit': 0,
+            'delivered': 1,
+        }
+
+    def test_distinct_queryset_is_not_double_counted(self, assigned_delivery, biker_user):
+        """Bikers' OR-joined querysets still count each delivery once."""
+        from django.db.models import Q
+        _, biker = biker_user
+        queryset = Delivery.objects.filter(
+            Q(status='SEARCHING') | Q(assignment__biker=biker)
+        ).distinct()
+
+        assert delivery_stats(queryset)['total'] == 1
+
+
+@pytest.mark.django_db
+class TestCachedDeliveryStats:
+    """Tests for cached_delivery_stats and invalidate_delivery_stats."""
+
+    def test_disabled_by_default(self, client_user, settings):
+        settings.DELIVERY_STATS_CACHE_SECONDS = 0
+        queryset = Delivery.objects.filter(client=client_user)
+        cached_delivery_stats(client_user, queryset)
+
+        with CaptureQueriesContext(connection) as queries:
+            cached_delivery_stats(client_user, queryset)
+
+        assert len(queries) == 1
+
+    def test_snapshot_reused_until_status_change(self, client_user, settings):
+        settings.DELIVERY_STATS_CACHE_SECONDS = 60
+        queryset = Delivery.objects.filter(client=client_user)
+        _create_deliveries(client_user, ['PENDING'])
+        cached_delivery_stats(client_user, queryset)
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = cached_delivery_stats(client_user, queryset)
+        assert len(queries) == 0
+        assert stats['pending'] == 1
+
+        # Saving a delivery invalidates every snapshot
+        delivery = queryset.get()
+        delivery.status = 'SEARCHING'
+        delivery.save()
+
+        stats = cached_delivery_stats(client_user, queryset)
+        assert stats['pending'] == 0
+        assert stats['searching'] == 1
+
+    def test_explicit_invalidation(self, client_user, settings):
+        """Transitions done with queryset.update() invalidate explicitly."""
+        settings.DELIVERY_STATS_CACHE_SECONDS = 60
+        queryset = Delivery.objects.filter(client=client_user)
+        _create_deliveries(client_user, ['SEARCHING'])
+        cached_delivery_stats(client_user, queryset)
+
+        queryset.update(status='ASSIGNED')
+        invalidate_delivery_stats()
+
+        assert cached_delivery_stats(client_user, queryset)['assigned'] == 1
@@ -0,0 +1,72 @@
+"""
+Tests for the deliveries throttling module.
+Tests the LocationBroadcastThrottle used by TrackingConsumer.
+"""
+from deliveries.throttling import LocationBroadcastThrottle
+
+# Johannesburg, and a point ~110 m north of it
+JNB = (-26.2041, 28.0473)
+NEAR = (-26.2031, 28.0473)
+
+
+class FakeClock:
+    """Manually advanced replacement for time.monotonic."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLocationBroadcastThrottle:
+    """Tests for the LocationBroadcastThrottle class."""
+
+    def _throttle(self, min_interval=1, min_distance_m=10):
+        clock = FakeClock()
+        return LocationBroadcastThrottle(min_interval, min_distance_m, clock=clock), clock
+
+    def test_first_position_is_sent(self):
+        throttle, _ = self._throttle()
+        assert throttle.offer(*JNB) is True
+
+    def test_position_within_interval_is_held(self):
+        """Positions arriving too soon become pending instead of being sent."""
+        throttle, clock = self._throttle()
+        throttle.offer(*JNB)
+
+        clock.now = 0.5
+        assert throttle.offer(*NEAR) is False
+        assert throttle.pending == NEAR
+        assert throttle.seconds_until_next() == 0.5
+
+    def test_trailing_edge_sends_latest_pending(self):
+        """take_pending returns the latest held position once the interval is over."""
+        throttle, clock = self._throttle()
+        throttle.offer(*JNB)
+        clock.now = 0.3
+        throttle.offer(JNB[0] + 0.0005, JNB[1])
+        clock.now = 0.6
+        throttle.offer(*NEAR)
+
+        assert throttle.take_pending() is None  # Still inside the interval
+
+        clock.now = 1.0
+        assert throttle.take_pending() == NEAR
+        assert throttle.last_sent == NEAR
+        assert throttle.pending is None
+
+    def test_small_moves_are_dropped(self):
+        """Positions within min_distance_m of the last broadcast are not sent."""
+        throttle, clock = self._throttle(min_distance_m=200)
+        throttle.offer(*JNB)
+
+        clock.now = 5
+        assert throttle.offer(*NEAR) is False
+        assert throttle.pending is None
+
+    def test_thresholds_of_zero_disable_throttling(self):
+        """With both thresholds at 0 every position is sent."""
+        throttle, _ = self._throttle(min_interval=0, min_distance_m=0)
+
+        assert all(throttle.offer(*JNB) for _ in range(3))
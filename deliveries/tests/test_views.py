@@ -9,6 +9,9 @@ from deliveries.models import Delivery, Biker, DeliveryAssignment, DeliveryLocat
 
 User = get_user_model()
 
+# Every request in this module must stay within its QUERY_BUDGETS entry
+pytestmark = pytest.mark.usefixtures("query_budgets")
+
 
 @pytest.mark.django_db
 class TestDeliveryViewSetList:
@@ -40,7 +43,7 @@ class TestDeliveryViewSetList:
         
         response = api_client.get('/api/deliveries/')
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2
+        assert len(response.data['results']) == 2
     
     def test_client_sees_only_own_deliveries(self, client_api_client, client_user):
         """Client can only see their own deliveries"""
@@ -69,8 +72,8 @@ class TestDeliveryViewSetList:
         
         response = api_client.get('/api/deliveries/')
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
-        assert response.data[0]['pickup_address'] == 'My Address'
+        assert len(response.data['results']) == 1
+        assert response.data['results'][0]['pickup_address'] == 'My Address'
     
     def test_biker_sees_searching_and_assigned_deliveries(self, biker_client, biker_user, client_user):
         """Biker sees SEARCHING deliveries and their assigned deliveries"""
@@ -107,7 +110,128 @@ class TestDeliveryViewSetList:
         
         response = api_client.get('/api/deliveries/')
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2
+        assert len(response.data['results']) == 2
+
+
+    def test_biker_list_is_scoped_to_nearby_searching_deliveries(self, biker_client, biker_with_location, client_user):
+        """Biker listing hides SEARCHING deliveries far from the biker, but they can still be opened"""
+        api_client, _ = biker_client
+        near = Delivery.objects.create(
+            client=client_user, pickup_address='Near', dropoff_address='Dest',
+            package_description='Package', status='SEARCHING',
+            pickup_latitude=-26.2041, pickup_longitude=28.0473
+        )
+        far = Delivery.objects.create(
+            client=client_user, pickup_address='Far', dropoff_address='Dest',
+            package_description='Package', status='SEARCHING',
+            pickup_latitude=-33.9249, pickup_longitude=18.4241
+        )
+
+        response = api_client.get('/api/deliveries/')
+        assert [d['id'] for d in response.data['results']] == [near.id]
+
+        response = api_client.get(f'/api/deliveries/{far.id}/')
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestDeliveryViewSetPagination:
+    """Test cursor pagination and streaming of delivery listings"""
+
+    def _create(self, client, count):
+        for i in range(count):
+            Delivery.objects.create(
+                client=client, pickup_address=f'Address {i}', dropoff_address='Dest',
+                package_description='Package'
+            )
+
+    def test_list_is_cursor_paginated_newest_first(self, client_api_client):
+        """Pages follow 'next' links and never repeat a delivery"""
+        api_client, user = client_api_client
+        self._create(user, 5)
+
+        response = api_client.get('/api/deliveries/', {'page_size': 2})
+        first_page = response.data['results']
+        assert len(first_page) == 2
+        assert first_page[0]['created_at'] >= first_page[1]['created_at']
+        assert response.data['next'] is not None
+
+        seen = [d['id'] for d in first_page]
+        next_url = response.data['next']
+        while next_url:
+            response = api_client.get(next_url)
+            seen += [d['id'] for d in response.data['results']]
+            next_url = response.data['next']
+
+        assert sorted(seen) == sorted(Delivery.objects.values_list('id', flat=True))
+
+    def test_my_deliveries_is_paginated(self, client_api_client):
+        """my_deliveries pages its list but still counts everything in stats"""
+        api_client, user = client_api_client
+        self._create(user, 3)
+
+        response = api_client.get('/api/deliveries/my_deliveries/', {'page_size': 2})
+
+        assert len(response.data['deliveries']) == 2
+        assert response.data['stats']['total'] == 3
+        assert response.data['next'] is not None
+
+    def test_stream_returns_full_json_array(self, client_api_client):
+        """?stream=true streams every delivery as one JSON array"""
+        import json
+        api_client, user = client_api_client
+        self._create(user, 3)
+
+        response = api_client.get('/api/deliveries/', {'stream': 'true'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        data = json.loads(b''.join(response.streaming_content))
+        assert len(data) == 3
+        assert {d['pickup_address'] for d in data} == {'Address 0', 'Address 1', 'Address 2'}
+
+    def test_stream_respects_queryset_scope(self, client_api_client, client_user):
+        """Streaming only returns what the user could list anyway"""
+        import json
+        api_client, user = client_api_client
+        other_user = User.objects.create_user(email='other@example.com', password='pass123', role='CLIENT')
+        self._create(other_user, 2)
+
+        response = api_client.get('/api/deliveries/', {'stream': 'true'})
+
+        assert json.loads(b''.join(response.streaming_content)) == []
+
+    def test_stream_under_asgi_is_async_and_chunked(self, client_user, monkeypatch):
+        """Under ASGI the export is an async iterator, sent chunk by chunk rather than buffered"""
+        import json
+        import warnings
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from deliveries import streaming
+
+        monkeypatch.setattr(streaming, 'STREAM_CHUNK_SIZE', 2)
+        self._create(client_user, 5)
+        token = RefreshToken.for_user(client_user).access_token
+
+        async def export():
+            response = await AsyncClient().get(
+                '/api/deliveries/', {'stream': 'true'}, headers={'Authorization': f'Bearer {token}'}
+            )
+            return response, [chunk async for chunk in response]
+
+        with warnings.catch_warnings():
+            # Django warns when it has to buffer a sync iterator for an ASGI response
+            warnings.simplefilter('error')
+            response, chunks = async_to_sync(export)()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.is_async
+        # "[", three chunks of at most two rows, "]"
+        assert len(chunks) == 5
+        data = json.loads(b''.join(chunks))
+        assert sorted(d['pickup_address'] for d in data) == [f'Address {i}' for i in range(5)]
+
 
 
 @pytest.mark.django_db
@@ -330,6 +454,24 @@ class TestDeliveryViewSetMarkDelivered:
         
         assert DeliveryLog.objects.filter(delivery=delivery).exists()
     
+    @patch('deliveries.views.delivery_views.get_channel_layer')
+    def test_mark_delivered_archives_route(self, mock_channel_layer, biker_client, delivery_with_location,
+                                           django_capture_on_commit_callbacks):
+        """Marking a delivery as delivered packs its trail into a route"""
+        mock_channel_layer.return_value.group_send = AsyncMock()
+        api_client, _ = biker_client
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/api/deliveries/{delivery_with_location.id}/mark_delivered/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not DeliveryLocation.objects.filter(delivery=delivery_with_location).exists()
+
+        response = api_client.get(f'/api/deliveries/{delivery_with_location.id}/route/')
+        assert response.data['archived'] is True
+        assert response.data['point_count'] == 1
+        assert response.data['points'][0]['latitude'] == pytest.approx(-26.2045)
+    
     def test_unassigned_delivery_returns_error(self, biker_client, client_user):
         """Marking unassigned delivery returns error"""
         api_client, _ = biker_client
@@ -392,6 +534,59 @@ class TestDeliveryViewSetMarkDelivered:
         assert response.status_code in [status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND]
 
 
+@pytest.mark.django_db
+class TestDeliveryViewSetRoute:
+    """Test route endpoint"""
+
+    def test_route_from_raw_locations(self, client_api_client, client_user, delivery_with_location):
+        """The client can replay the route before it is archived"""
+        api_client, _ = client_api_client
+
+        response = api_client.get(f'/api/deliveries/{delivery_with_location.id}/route/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['archived'] is False
+        assert response.data['point_count'] == 1
+        assert response.data['polyline']
+
+    def test_route_is_downsampled_to_max_points(self, client_api_client, delivery_with_location, biker_user):
+        """?max_points caps the returned trail"""
+        api_client, _ = client_api_client
+        _, biker = biker_user
+        DeliveryLocation.objects.bulk_create([
+            DeliveryLocation(delivery=delivery_with_location, biker=biker,
+                             latitude=-26.2 + (i % 3) * 0.001, longitude=28.0 + i * 0.001)
+            for i in range(50)
+        ])
+
+        response = api_client.get(f'/api/deliveries/{delivery_with_location.id}/route/', {'max_points': 10})
+
+        assert response.data['total_points'] == 51
+        assert response.data['point_count'] == 10
+
+    @pytest.mark.parametrize('params', [
+        {'max_points': 'many'}, {'max_points': 1}, {'tolerance_m': -5},
+        {'tolerance_m': 'nan'}, {'tolerance_m': 'inf'}, {'tolerance_m': '-inf'},
+    ])
+    def test_route_rejects_invalid_params(self, client_api_client, delivery_with_location, params):
+        """Invalid downsampling parameters return 400"""
+        api_client, _ = client_api_client
+
+        response = api_client.get(f'/api/deliveries/{delivery_with_location.id}/route/', params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_route_of_other_clients_delivery_is_hidden(self, api_client, delivery_with_location):
+        """Users cannot replay deliveries they cannot see"""
+        from rest_framework_simplejwt.tokens import RefreshToken
+        other = User.objects.create_user(email='other@example.com', password='pass123', role='CLIENT')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+
+        response = api_client.get(f'/api/deliveries/{delivery_with_location.id}/route/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 @pytest.mark.django_db
 class TestDeliveryViewSetMyDeliveries:
     """Test my_deliveries endpoint"""
@@ -422,6 +617,20 @@ class TestDeliveryViewSetMyDeliveries:
         assert response.data['stats']['delivered'] == 1
         assert len(response.data['deliveries']) == 3
 
+    def test_my_deliveries_stats_cover_every_status(self, client_api_client):
+        """Stats include a count for every delivery status"""
+        api_client, user = client_api_client
+
+        Delivery.objects.create(
+            client=user, pickup_address='A', dropoff_address='B',
+            package_description='P', status='SEARCHING'
+        )
+
+        response = api_client.get('/api/deliveries/my_deliveries/')
+
+        assert response.data['stats']['searching'] == 1
+        assert response.data['stats']['assigned'] == 0
+
 
 @pytest.mark.django_db
 class TestAssignmentViewSet:
@@ -462,4 +671,4 @@ class TestLocationViewSet:
         
         response = api_client.get('/api/locations/')
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
+        assert len(response.data['results']) == 1
@@ -0,0 +1,78 @@
+import time
+
+from .distance import haversine
+
+
+# -------------------------
+# LOCATION BROADCAST THROTTLE
+# -------------------------
+class LocationBroadcastThrottle:
+    """
+    Decides which biker positions are re-broadcast to a delivery group.
+    - A position is sent if at least min_interval seconds have passed since the
+      last broadcast and the biker moved at least min_distance_m meters.
+    - Positions arriving too soon are held as pending; the consumer sends the
+      latest pending position on the trailing edge, once the interval is over.
+    - Positions within min_distance_m of the last broadcast are dropped, so
+      watchers are never more than min_distance_m behind the biker.
+    - Setting either threshold to 0 disables that check.
+    """
+
+    def __init__(self, min_interval, min_distance_m, clock=time.monotonic):
+        self.min_interval = min_interval
+        self.min_distance_m = min_distance_m
+        self.clock = clock
+        self.last_sent = None       # (latitude, longitude) of the last broadcast
+        self.last_sent_at = None
+        self.pending = None         # Latest position held back by the interval
+
+    def offer(self, latitude, longitude):
+        """
+        Register a new position. Returns True if it should be broadcast now;
+        otherwise it is either held as pending or dropped.
+        """
+        if self.last_sent is None:
+            return self._mark_sent(latitude, longitude)
+
+        if self.seconds_until_next() > 0:
+            self.pending = (latitude, longitude)
+            return False
+
+        self.pending = None
+        if not self._moved_enough(latitude, longitude):
+            return False
+
+        return self._mark_sent(latitude, longitude)
+
+    def take_pending(self):
+        """
+        Returns the pending position if it is now due and far enough from the last
+        broadcast (marking it as sent), or None. Called on the trailing edge.
+        """
+        if self.pending is None or self.seconds_until_next() > 0:
+            return None
+
+        latitude, longitude = self.pending
+        self.pending = None
+        if not self._moved_enough(latitude, longitude):
+            return None
+
+        self._mark_sent(latitude, longitude)
+        return latitude, longitude
+
+    def seconds_until_next(self):
+        """Seconds left before another broadcast is allowed (0 if allowed now)."""
+        if self.last_sent_at is None:
+            return 0
+        return max(0, self.min_interval - (self.clock() - self.last_sent_at))
+
+    def _moved_enough(self, latitude, longitude):
+        if not self.min_distance_m:
+            return True
+        moved_m = haversine(self.last_sent[0], self.last_sent[1], latitude, longitude) * 1000
+        return moved_m >= self.min_distance_m
+
+    def _mark_sent(self, latitude, longitude):
+        self.last_sent = (latitude, longitude)
+        self.last_sent_at = self.clock()
+        return True
@@ -1,25 +1,8 @@
-import math
+from .distance import haversine
 
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
     Returns distance in kilometers using Haversine formula
     """
-
-    R = 6371  # Earth radius in KM
-
-    lat1 = math.radians(lat1)
-    lon1 = math.radians(lon1)
-    lat2 = math.radians(lat2)
-    lon2 = math.radians(lon2)
-
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-
-    a = math.sin(dlat / 2) ** 2 + \
-        math.cos(lat1) * math.cos(lat2) * \
-        math.sin(dlon / 2) ** 2
-
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    return R * c
\ No newline at end of file
+    return haversine(lat1, lon1, lat2, lon2)
@@ -1,11 +1,15 @@
+import math
+
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import models
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from ..services import find_nearby_bikers, accept_delivery
+from ..services import find_nearby_bikers, accept_delivery, biker_delivery_feed, SEARCH_RADIUS_KM
+from ..notifications import notify_delivery_request
+from ..stats import cached_delivery_stats
+from ..routes import archive_on_delivery, route_replay, ROUTE_DEFAULT_MAX_POINTS, ROUTE_MAX_POINTS_LIMIT
 
 from ..models import (
     Delivery,
@@ -15,28 +19,33 @@ from ..models import (
 )
 from ..serializers import DeliverySerializer
 from ..permissions import IsAdmin
+from ..pagination import DeliveryCursorPagination
+from ..streaming import StreamingListMixin
 
 
 # =====================================
 # DELIVERY VIEWSET
 # =====================================
-class DeliveryViewSet(viewsets.ModelViewSet):
+class DeliveryViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     Handles all CRUD operations for Deliveries.
     - Clients can create and view their own deliveries.
     - Bikers can view deliveries assigned to them.
     - Admins can view and manage all deliveries.
+    - Listings are cursor-paginated (newest first); ?stream=true streams the full list.
     """
     queryset = Delivery.objects.all()
     serializer_class = DeliverySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DeliveryCursorPagination
 
     def perform_create(self, serializer):
         """
         Called when a client creates a new delivery.
         - Saves the delivery with the current user as the client and sets status to SEARCHING.
         - Finds nearby available bikers using the haversine distance calculation.
-        - Notifies each nearby biker via WebSocket (Django Channels) with the delivery details.
+        - Queues one batched WebSocket (Django Channels) notification for all of them,
+          sent after the delivery is committed so the response does not wait on Redis.
         """
         # Save delivery, auto-assigning the logged-in user as the client
         delivery = serializer.save(client=self.request.user, status="SEARCHING")
@@ -44,26 +53,16 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         # Find bikers within the search radius of the pickup location
         nearby_bikers = find_nearby_bikers(delivery)
 
-        # Get the channel layer for WebSocket communication
-        channel_layer = get_channel_layer()
-
-        # Send a real-time delivery request notification to each nearby biker
-        for biker in nearby_bikers:
-            async_to_sync(channel_layer.group_send)(
-                f"biker_{biker.id}",  # Each biker listens on their own group channel
-                {
-                    "type": "delivery_request",  # Maps to a consumer handler method
-                    "delivery_id": delivery.id,
-                    "pickup_address": delivery.pickup_address,
-                    "dropoff_address": delivery.dropoff_address,
-                }
-            )
+        # Fan out delivery_request notifications in the background
+        notify_delivery_request(delivery, nearby_bikers)
 
     def get_queryset(self):
         """
         Returns a filtered queryset based on who is making the request:
         - Admins (is_staff) see all deliveries.
         - Bikers see deliveries assigned to them AND deliveries in SEARCHING status.
+          When listing, SEARCHING jobs are limited to those within SEARCH_RADIUS_KM
+          of the biker's last known position.
         - Regular clients see only their own deliveries.
         """
         user = self.request.user
@@ -74,10 +73,10 @@ class DeliveryViewSet(viewsets.ModelViewSet):
 
         # Bikers see SEARCHING deliveries and their own assigned deliveries
         if hasattr(user, "biker_profile"):
-            return Delivery.objects.filter(
-                models.Q(status="SEARCHING") |
-                models.Q(assignment__biker__user=user)
-            ).distinct()
+            # Detail actions (accept, mark_delivered, ...) are not distance-scoped,
+            # so a biker who has moved can still act on a job they were offered
+            radius_km = SEARCH_RADIUS_KM if self.action == "list" else None
+            return biker_delivery_feed(user.biker_profile, radius_km=radius_km)
 
         # Clients see only their own deliveries
         return Delivery.objects.filter(client=user)
@@ -86,22 +85,22 @@ class DeliveryViewSet(viewsets.ModelViewSet):
     def my_deliveries(self, request):
         """
         Custom endpoint: GET /deliveries/my_deliveries/
-        Returns the current user's deliveries along with summary stats.
+        Returns the current user's deliveries along with summary stats
+        (total plus a count per status), computed in a single query.
+        Deliveries are cursor-paginated; follow 'next' for older ones.
         """
         deliveries = self.get_queryset()
 
         # Build a summary of delivery counts by status
-        stats = {
-            'total': deliveries.count(),
-            'pending': deliveries.filter(status='PENDING').count(),
-            'in_transit': deliveries.filter(status='IN_TRANSIT').count(),
-            'delivered': deliveries.filter(status='DELIVERED').count(),
-        }
-
-        serializer = self.get_serializer(deliveries, many=True)
+        stats = cached_delivery_stats(request.user, deliveries)
+
+        page = self.paginate_queryset(deliveries)
+        serializer = self.get_serializer(page, many=True)
         return Response({
             'stats': stats,
-            'deliveries': serializer.data
+            'deliveries': serializer.data,
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
         })
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsAdmin])
@@ -181,7 +180,7 @@ class DeliveryViewSet(viewsets.ModelViewSet):
 
         # Free up the biker to take new deliveries
         assignment.biker.status = "AVAILABLE"
-        assignment.biker.save()
+        assignment.biker.save(update_fields=["status"])
 
         # Create a log entry for the completion event
         DeliveryLog.objects.create(
@@ -189,6 +188,9 @@ class DeliveryViewSet(viewsets.ModelViewSet):
             message="Delivery completed"
         )
 
+        # Pack the GPS trail into a compact route once the status change is committed
+        archive_on_delivery(delivery.id)
+
         # Notify all listeners on this delivery's WebSocket group
         channel_layer = get_channel_layer()
         async_to_sync(channel_layer.group_send)(
@@ -198,4 +200,35 @@ class DeliveryViewSet(viewsets.ModelViewSet):
             }
         )
 
-        return Response({"message": "Delivery marked as DELIVERED"})
\ No newline at end of file
+        return Response({"message": "Delivery marked as DELIVERED"})
+
+    @action(detail=True, methods=["get"])
+    def route(self, request, pk=None):
+        """
+        Custom endpoint: GET /deliveries/{id}/route/
+        Returns the delivery's GPS trail for route replay, oldest point first,
+        both as points and as an encoded polyline for map clients.
+        - ?max_points=N caps the number of points (default ROUTE_DEFAULT_MAX_POINTS).
+        - ?tolerance_m=M drops points within M meters of the simplified line
+          (a finite, non-negative number).
+        Downsampling keeps the most significant points (Douglas–Peucker), and the
+        result is cached once the delivery is DELIVERED.
+        """
+        delivery = self.get_object()
+
+        try:
+            max_points = int(request.query_params.get("max_points", ROUTE_DEFAULT_MAX_POINTS))
+            tolerance_m = request.query_params.get("tolerance_m")
+            tolerance_m = float(tolerance_m) if tolerance_m is not None else None
+        except ValueError:
+            return Response({"error": "max_points and tolerance_m must be numbers"}, status=400)
+
+        if not 2 <= max_points <= ROUTE_MAX_POINTS_LIMIT:
+            return Response(
+                {"error": f"max_points must be between 2 and {ROUTE_MAX_POINTS_LIMIT}"},
+                status=400
+            )
+        if tolerance_m is not None and not (math.isfinite(tolerance_m) and tolerance_m >= 0):
+            return Response({"error": "tolerance_m must be a finite, non-negative number"}, status=400)
+
+        return Response(route_replay(delivery, max_points=max_points, tolerance_m=tolerance_m))
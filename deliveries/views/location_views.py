@@ -4,18 +4,22 @@ from rest_framework.permissions import IsAuthenticated
 from ..models import DeliveryLocation
 from ..serializers import DeliveryLocationSerializer
 from ..permissions import IsAssignedBiker
+from ..pagination import LocationCursorPagination
+from ..streaming import StreamingListMixin
 
 
 # =====================================
 # LOCATION VIEWSET
 # =====================================
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     Handles CRUD operations for DeliveryLocations (real-time location tracking).
     Only the biker assigned to the delivery can access or update location data.
+    Listings are cursor-paginated (newest first); ?stream=true streams the full history.
     """
     serializer_class = DeliveryLocationSerializer
     permission_classes = [IsAuthenticated, IsAssignedBiker]
+    pagination_class = LocationCursorPagination
 
     def get_queryset(self):
         """
@@ -34,10 +34,59 @@ class Config:
     REDIS_DB = int(os.getenv('REDIS_DB', 0))
     REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
     
+    # Cache — locmem (per process) or redis (shared between processes)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+    
     # JWT
     JWT_ACCESS_TOKEN_LIFETIME_MINUTES = int(os.getenv('JWT_ACCESS_TOKEN_LIFETIME_MINUTES', 60))
     JWT_REFRESH_TOKEN_LIFETIME_DAYS = int(os.getenv('JWT_REFRESH_TOKEN_LIFETIME_DAYS', 1))
     
+    # Biker matching — use the in-memory grid index instead of bounding-box queries
+    BIKER_SPATIAL_INDEX = os.getenv('BIKER_SPATIAL_INDEX', 'True').lower() in ('true', '1', 'yes')
+    
+    # Biker presence — only bikers with the app connected (heartbeat within the TTL)
+    # are matched when BIKER_PRESENCE_REQUIRED is on
+    BIKER_PRESENCE_REQUIRED = os.getenv('BIKER_PRESENCE_REQUIRED', 'False').lower() in ('true', '1', 'yes')
+    BIKER_PRESENCE_TTL_SECONDS = int(os.getenv('BIKER_PRESENCE_TTL_SECONDS', 90))
+    # memory (per process) or redis (shared); follows CACHE_BACKEND unless set
+    BIKER_PRESENCE_BACKEND = os.getenv(
+        'BIKER_PRESENCE_BACKEND', 'redis' if CACHE_BACKEND == 'redis' else 'memory'
+    )
+    
+    # Live biker positions — memory (per process) or redis (shared), written
+    # back to the Biker table every LIVE_LOCATION_WRITE_BACK_SECONDS
+    LIVE_LOCATION_BACKEND = os.getenv('LIVE_LOCATION_BACKEND', 'memory')
+    LIVE_LOCATION_WRITE_BACK_SECONDS = float(os.getenv('LIVE_LOCATION_WRITE_BACK_SECONDS', 10))
+    
+    # Location pings — buffered and written in bulk
+    LOCATION_BUFFER_MAX_SIZE = int(os.getenv('LOCATION_BUFFER_MAX_SIZE', 200))
+    LOCATION_BUFFER_FLUSH_SECONDS = float(os.getenv('LOCATION_BUFFER_FLUSH_SECONDS', 5))
+    
+    # Location broadcasts — per-delivery throttling (0 disables a check)
+    LOCATION_BROADCAST_MIN_INTERVAL = float(os.getenv('LOCATION_BROADCAST_MIN_INTERVAL', 1))
+    LOCATION_BROADCAST_MIN_DISTANCE_M = float(os.getenv('LOCATION_BROADCAST_MIN_DISTANCE_M', 10))
+    
+    # Location history — retention in days (0 keeps everything) and monthly
+    # partitions created ahead of time on PostgreSQL
+    LOCATION_RETENTION_DAYS = int(os.getenv('LOCATION_RETENTION_DAYS', 0))
+    LOCATION_PARTITION_MONTHS_AHEAD = int(os.getenv('LOCATION_PARTITION_MONTHS_AHEAD', 2))
+    # Block schema migrations of the location table once it is partitioned
+    # (turn off only for the `migrate --fake` run after applying one by hand)
+    LOCATION_PARTITION_MIGRATION_GUARD = os.getenv('LOCATION_PARTITION_MIGRATION_GUARD', 'True').lower() in ('true', '1', 'yes')
+    
+    # Route archive — pack a delivered trail into one row, simplified to this
+    # tolerance in meters (0 keeps every point)
+    ROUTE_ARCHIVE_ON_DELIVERY = os.getenv('ROUTE_ARCHIVE_ON_DELIVERY', 'True').lower() in ('true', '1', 'yes')
+    ROUTE_SIMPLIFY_TOLERANCE_M = float(os.getenv('ROUTE_SIMPLIFY_TOLERANCE_M', 5))
+    
+    # Delivery dashboard stats — per-user snapshot lifetime in seconds (0 disables)
+    DELIVERY_STATS_CACHE_SECONDS = int(os.getenv('DELIVERY_STATS_CACHE_SECONDS', 0))
+    
+    # Request metrics — bearer token required by /metrics (empty leaves it open),
+    # and the query budget for views without their own entry in QUERY_BUDGETS
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    QUERY_BUDGET_DEFAULT = int(os.getenv('QUERY_BUDGET_DEFAULT', 50)) or None
+    
     # Cors
     CORS_ALLOWED_ORIGINS = os.getenv(
         'CORS_ALLOWED_ORIGINS',
@@ -76,6 +125,9 @@ class TestingConfig(Config):
     CORS_ALLOWED_ORIGINS = ['http://127.0.0.1', 'http://localhost']
     DB_ENGINE = 'sqlite3'
     DB_NAME = ':memory:'
+    CACHE_BACKEND = 'locmem'
+    BIKER_PRESENCE_BACKEND = 'memory'
+    LIVE_LOCATION_BACKEND = 'memory'
     EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
 
@@ -0,0 +1,216 @@
+"""
+Process-wide metrics in the Prometheus text exposition format.
+- Counters, gauges and histograms are kept in memory, keyed by name and labels.
+- MetricsView serves them at /metrics for Prometheus to scrape. Each process
+  keeps its own values, so scrape every worker (or run a single ASGI process).
+"""
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+# Histogram buckets for durations (seconds), query counts and payload sizes (bytes)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# -------------------------
+# METRIC TYPES
+# -------------------------
+class _Metric:
+    """A metric family: one value per distinct set of label values."""
+    type = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+    def _samples(self):
+        """Yield (sample_name, labels, value) for every stored value."""
+        raise NotImplementedError
+
+    def render(self):
+        """The family in Prometheus text format, as a list of lines."""
+        with self._lock:
+            samples = list(self._samples())
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ] + [
+            f"{name}{_format_labels(labels)} {_format_value(value)}"
+            for name, labels, value in samples
+        ]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name, key, value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into cumulative buckets, plus their sum and count.
+    Each stored value is [bucket_counts, sum, count].
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def sum(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0
+
+    def _samples(self):
+        for key, (counts, total, observations) in self._values.items():
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", key + (("le", _format_value(bound)),), count
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), observations
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, observations
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# -------------------------
+# REGISTRY
+# -------------------------
+class MetricsRegistry:
+    """
+    Holds every metric family of the process.
+    counter()/gauge()/histogram() return the existing family when the name is
+    already registered, so modules can declare their metrics at import time.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name, documentation):
+        return self._register(Counter, name, documentation)
+
+    def gauge(self, name, documentation):
+        return self._register(Gauge, name, documentation)
+
+    def histogram(self, name, documentation, buckets=DURATION_BUCKETS):
+        return self._register(Histogram, name, documentation, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def clear(self):
+        """Reset every value, keeping the registered families. Used by tests."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def render(self):
+        """Every family in Prometheus text format."""
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry():
+    """Return the process-wide metrics registry."""
+    return _registry
+
+
+# -------------------------
+# METRICS ENDPOINT
+# -------------------------
+def metrics_view(request):
+    """
+    Serves the registry for Prometheus.
+    - When METRICS_TOKEN is set, scrapers must send it as a Bearer token.
+    - Without a token the endpoint is only open when DEBUG is on; in production
+      it answers 403 until METRICS_TOKEN is configured.
+    """
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponse("Forbidden: METRICS_TOKEN is not set", status=403, content_type="text/plain")
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse("Unauthorized", status=401, content_type="text/plain")
+
+    return HttpResponse(get_metrics_registry().render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,147 @@
+"""
+Per-request instrumentation for the HTTP API.
+RequestMetricsMiddleware records, for every view: DB query count, DB time,
+render (serialization) time, response size and total duration. The numbers go
+to the metrics registry (served at /metrics) and to a structured log line, and
+query counts are checked against QUERY_BUDGETS.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import QUERY_COUNT_BUCKETS, SIZE_BUCKETS, get_metrics_registry
+
+logger = logging.getLogger("force_backend.requests")
+
+_registry = get_metrics_registry()
+REQUESTS = _registry.counter(
+    "http_requests_total", "HTTP requests by view, method and status code")
+REQUEST_DURATION = _registry.histogram(
+    "http_request_duration_seconds", "Time spent handling the request")
+DB_QUERIES = _registry.histogram(
+    "http_request_db_queries", "Database queries per request", QUERY_COUNT_BUCKETS)
+DB_DURATION = _registry.histogram(
+    "http_request_db_duration_seconds", "Time spent in database queries per request")
+RENDER_DURATION = _registry.histogram(
+    "http_response_render_seconds", "Time spent rendering (serializing) the response body")
+RESPONSE_SIZE = _registry.histogram(
+    "http_response_size_bytes", "Response body size", SIZE_BUCKETS)
+BUDGET_EXCEEDED = _registry.counter(
+    "http_request_query_budget_exceeded_total", "Requests that ran more queries than their budget")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in QUERY_BUDGET_ASSERT mode when a view runs more queries than its budget."""
+
+
+class QueryCollector:
+    """
+    connection.execute_wrapper hook counting queries and their total time.
+    Keeps the SQL of each query when keep_sql is set, for budget failure reports.
+    """
+
+    def __init__(self, keep_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.keep_sql = keep_sql
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            if self.keep_sql:
+                self.statements.append(sql)
+
+
+def query_budget(view_name):
+    """The query budget for a URL name: QUERY_BUDGETS, else QUERY_BUDGET_DEFAULT (None = no budget)."""
+    return settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+class RequestMetricsMiddleware:
+    """
+    Instruments every request. Place it first in MIDDLEWARE so the queries of
+    other middleware (sessions, auth) are counted too.
+    - Views are labelled by URL name (e.g. deliveries-list), which keeps the
+      number of label values bounded; unresolved URLs are labelled "unmatched".
+    - Streaming responses are measured up to the point they start streaming;
+      their size is not known and is not recorded.
+    - Over-budget requests are logged as warnings, or fail with
+      QueryBudgetExceeded when QUERY_BUDGET_ASSERT is on (tests opt in with the
+      query_budgets fixture).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector(keep_sql=settings.QUERY_BUDGET_ASSERT)
+        request._render_seconds = 0.0
+        started = time.perf_counter()
+
+        with connection.execute_wrapper(collector):
+            response = self.get_response(request)
+
+        duration = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match and match.view_name else "unmatched"
+        method = request.method
+        size = None if response.streaming else len(response.content)
+
+        REQUESTS.inc(view=view, method=method, status=response.status_code)
+        REQUEST_DURATION.observe(duration, view=view, method=method)
+        DB_QUERIES.observe(collector.count, view=view, method=method)
+        DB_DURATION.observe(collector.duration, view=view, method=method)
+        RENDER_DURATION.observe(request._render_seconds, view=view, method=method)
+        if size is not None:
+            RESPONSE_SIZE.observe(size, view=view, method=method)
+
+        logger.info(
+            "view=%s method=%s status=%s duration_ms=%.1f queries=%d db_ms=%.1f render_ms=%.1f bytes=%s",
+            view, method, response.status_code, duration * 1000, collector.count,
+            collector.duration * 1000, request._render_seconds * 1000, size,
+            extra={
+                "request_metrics": {
+                    "view": view,
+                    "method": method,
+                    "status": response.status_code,
+                    "duration_ms": round(duration * 1000, 3),
+                    "queries": collector.count,
+                    "db_ms": round(collector.duration * 1000, 3),
+                    "render_ms": round(request._render_seconds * 1000, 3),
+                    "bytes": size,
+                }
+            }
+        )
+
+        self.check_budget(view, method, collector)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the render of DRF (template) responses, which happens after the view returns."""
+        render_started = time.perf_counter()
+
+        def record_render(rendered):
+            request._render_seconds = time.perf_counter() - render_started
+
+        response.add_post_render_callback(record_render)
+        return response
+
+    def check_budget(self, view, method, collector):
+        budget = query_budget(view)
+        if budget is None or collector.count <= budget:
+            return
+
+        BUDGET_EXCEEDED.inc(view=view)
+        message = f"{method} {view} ran {collector.count} queries (budget {budget})"
+        if settings.QUERY_BUDGET_ASSERT:
+            raise QueryBudgetExceeded(
+                message + ":\n" + "\n".join(f"  {sql}" for sql in collector.statements)
+            )
+        logger.warning(message)
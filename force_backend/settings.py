@@ -55,8 +55,63 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Biker matching
+BIKER_SPATIAL_INDEX = config.BIKER_SPATIAL_INDEX
+
+# Biker presence (connected app + heartbeat) required for matching, and its TTL
+BIKER_PRESENCE_REQUIRED = config.BIKER_PRESENCE_REQUIRED
+BIKER_PRESENCE_TTL_SECONDS = config.BIKER_PRESENCE_TTL_SECONDS
+BIKER_PRESENCE_BACKEND = config.BIKER_PRESENCE_BACKEND
+
+# Live biker positions (updated on every ping) and their batched write-back to Biker rows
+LIVE_LOCATION_BACKEND = config.LIVE_LOCATION_BACKEND
+LIVE_LOCATION_WRITE_BACK_SECONDS = config.LIVE_LOCATION_WRITE_BACK_SECONDS
+REDIS_URL = config.REDIS_URL
+
+# Location pings are buffered per process and flushed with bulk_create
+LOCATION_BUFFER_MAX_SIZE = config.LOCATION_BUFFER_MAX_SIZE
+LOCATION_BUFFER_FLUSH_SECONDS = config.LOCATION_BUFFER_FLUSH_SECONDS
+
+# Location broadcasts are throttled per delivery (minimum interval and distance)
+LOCATION_BROADCAST_MIN_INTERVAL = config.LOCATION_BROADCAST_MIN_INTERVAL
+LOCATION_BROADCAST_MIN_DISTANCE_M = config.LOCATION_BROADCAST_MIN_DISTANCE_M
+
+# Location history retention (days, 0 keeps everything) and PostgreSQL partitioning
+LOCATION_RETENTION_DAYS = config.LOCATION_RETENTION_DAYS
+LOCATION_PARTITION_MONTHS_AHEAD = config.LOCATION_PARTITION_MONTHS_AHEAD
+LOCATION_PARTITION_MIGRATION_GUARD = config.LOCATION_PARTITION_MIGRATION_GUARD
+
+# Delivered routes are archived into one compact row (tolerance in meters, 0 keeps every point)
+ROUTE_ARCHIVE_ON_DELIVERY = config.ROUTE_ARCHIVE_ON_DELIVERY
+ROUTE_SIMPLIFY_TOLERANCE_M = config.ROUTE_SIMPLIFY_TOLERANCE_M
+
+# Per-user my_deliveries stats snapshots (seconds, 0 disables)
+DELIVERY_STATS_CACHE_SECONDS = config.DELIVERY_STATS_CACHE_SECONDS
+
+# Request metrics served at /metrics (Bearer METRICS_TOKEN; required when DEBUG is off)
+METRICS_TOKEN = config.METRICS_TOKEN
+
+# Maximum DB queries per request, by URL name; QUERY_BUDGET_DEFAULT applies to the
+# rest (None = unlimited). Over-budget requests log a warning, or fail when
+# QUERY_BUDGET_ASSERT is on (tests opt in with the query_budgets fixture)
+QUERY_BUDGETS = {
+    "health_check": 1,
+    "deliveries-list": 6,
+    "deliveries-detail": 4,
+    "deliveries-my-deliveries": 5,
+    "deliveries-assign": 12,
+    "deliveries-accept": 12,
+    "deliveries-mark-delivered": 10,
+    "deliveries-route": 6,
+    "assignments-list": 3,
+    "locations-list": 3,
+}
+QUERY_BUDGET_DEFAULT = config.QUERY_BUDGET_DEFAULT
+QUERY_BUDGET_ASSERT = False
+
 
 MIDDLEWARE = [
+    'force_backend.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -111,6 +166,25 @@ DATABASES = {
     'default': _get_database_config()
 }
 
+# Cache configuration - locmem by default, Redis when shared state is needed
+def _get_cache_config():
+    """Build cache config based on environment"""
+    if config.CACHE_BACKEND == 'locmem':
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    elif config.CACHE_BACKEND == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config.REDIS_URL,
+        }
+    else:
+        raise ValueError(f"Unsupported cache backend: {config.CACHE_BACKEND}")
+
+CACHES = {
+    'default': _get_cache_config()
+}
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -179,6 +253,18 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'force_backend': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # One line per request from RequestMetricsMiddleware; console only, so
+        # request volume (and test runs) never fill logs/django.log
+        'force_backend.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -5,10 +5,14 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from .health import HealthCheckView
+from .metrics import metrics_view
 
 urlpatterns = [
     # Health check
     path("health/", HealthCheckView.as_view(), name="health_check"),
+
+    # Prometheus metrics
+    path("metrics", metrics_view, name="metrics"),
     
     path("admin/", admin.site.urls),
 